@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from common.profiling import add_profile_arguments, profiling
+from common.registry import REPO_ROOT, load_scanner_module
+from common.sinks import CSVSink
+from common.transport import close_transport
+
+SCENARIOS = ['evm_in', 'evm_out', 'solana_in', 'sui_in', 'sui_out', 'pairing']
+MODES = ['serial', 'concurrent']
+
+
+# Worker side: runs one scenario in its own process so peak RSS is per scenario
+
+class EventClock:
+    """Per-event latency: wall time between consecutive events of one stream (the first from when the stream starts)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = []
+
+    def stream(self):
+        last = [time.perf_counter()]
+
+        def tick():
+            now = time.perf_counter()
+            self.latencies.append(now - last[0])
+            last[0] = now
+        return tick
+
+
+class LineClock(io.TextIOBase):
+    """stdout replacement that ticks a clock whenever a line starts with `marker`."""
+
+    def __init__(self, marker, tick):
+        self.marker = marker
+        self.tick = tick
+        self.events = 0
+
+    def write(self, text):
+        for line in text.splitlines():
+            if line.startswith(self.marker):
+                self.tick()
+                self.events += 1
+        return len(text)
+
+
+def split_range(start, end, parts):
+    step = -(-(end - start + 1) // parts)
+    return [(s, min(s + step - 1, end)) for s in range(start, end + 1, step)]
+
+async def drain(rows, sink, tick):
+    count = 0
+    async for row in rows:
+        sink.write(row)
+        tick()
+        count += 1
+    return count
+
+async def run_ranges(make_rows, start, end, sink, clock, mode, concurrency):
+    # serial: one pass over the range, like get_cctp_transfers*; concurrent: the range split across tasks
+    ranges = [(start, end)] if mode == 'serial' else split_range(start, end, concurrency)
+    counts = await asyncio.gather(*(drain(make_rows(s, e), sink, clock.stream()) for s, e in ranges))
+    return sum(counts)
+
+async def run_scenario(scenario, base_url, manifest, mode, concurrency, output_file):
+    clock = EventClock()
+    chains = manifest['chains']
+
+    with contextlib.redirect_stdout(io.StringIO()) as captured, contextlib.ExitStack() as stack:
+        if scenario in ('evm_in', 'evm_out'):
+            direction = scenario[-3:].strip('_')
+            module = load_scanner_module('ethereum', f"transfers_{direction}")
+            w3 = module.setup_web3_provider(f"{base_url}/ethereum")
+            iter_rows = module.iter_cctp_transfers_in if direction == 'in' else module.iter_cctp_transfers
+            sink = stack.enter_context(CSVSink(output_file, module.CSV_HEADER))
+            events = await run_ranges(lambda s, e: iter_rows(s, e, w3), chains['ethereum']['start'],
+                                      chains['ethereum']['end'], sink, clock, mode, concurrency)
+
+        elif scenario == 'solana_in':
+            module = load_scanner_module('solana', 'transfers_in')
+            sink = stack.enter_context(CSVSink(output_file, module.CSV_HEADER))
+            events = await run_ranges(lambda s, e: module.iter_cctp_transactions(None, f"{base_url}/solana", s, e),
+                                      chains['solana']['start'], chains['solana']['end'], sink, clock, mode, concurrency)
+
+        elif scenario in ('sui_in', 'sui_out'):
+            module = load_scanner_module('sui', 'transfers_in' if scenario == 'sui_in' else 'transfers_out')
+            querier = module.SuiCCTPEventQuerier() if scenario == 'sui_in' else module.SuiCCTPBurnQuerier()
+            querier.rpc_endpoint = f"{base_url}/sui"
+            querier.request_delay = querier.page_delay = 0
+            iter_events = querier.iter_cctp_transfers if scenario == 'sui_in' else querier.iter_cctp_burns
+            sink = stack.enter_context(CSVSink(output_file, module.CSV_FIELDS))
+            # Sui ranges are half-open millisecond windows
+            events = await run_ranges(lambda s, e: iter_events(time_range=(s, e + 1), descending=False),
+                                      chains['sui']['start'], chains['sui']['end'], sink, clock, mode, concurrency)
+
+        elif scenario == 'pairing':
+            module = load_scanner_module('x) example_outputs', 'example_pairing_source_destination')
+            module.w3_eth = module.setup_web3_provider(f"{base_url}/ethereum")
+            for chain in list(module.CHAIN_TO_W3):
+                module.CHAIN_TO_W3[chain] = module.setup_web3_provider(f"{base_url}/{chain}")
+            module.SOLANA_RPC_URL = f"{base_url}/solana"
+            # The pairing flow only prints and walks its source range serially in every mode;
+            # every transfer starts with this header line
+            counter = LineClock('CCTP Transfer #', clock.stream())
+            with contextlib.redirect_stdout(counter):
+                await module.get_cctp_transfers(chains['ethereum']['start'], chains['ethereum']['end'])
+            events = counter.events
+
+        else:
+            raise ValueError(f"unknown scenario {scenario}")
+
+    elapsed = time.perf_counter() - clock.started
+    await close_transport()
+    return {
+        'events': events,
+        'seconds': elapsed,
+        'latencies': clock.latencies,
+        'errors': captured.getvalue().count('Error'),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    }
+
+
+# Driver side: dataset, stand-in server, one worker process per scenario
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def http_json(url, method='GET'):
+    request = urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+def start_standin(fixtures_dir, port, server_args):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'standin', 'server.py'), '--port', str(port), '--fixtures', fixtures_dir, *server_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            http_json(f"http://127.0.0.1:{port}/stats")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise Exception('stand-in server did not start')
+
+def rpc_totals(stats, chains):
+    totals = {'rpc_calls': 0, 'bytes_in': 0, 'bytes_out': 0}
+    for key, counters in stats['methods'].items():
+        if key.split('.')[0] in chains:
+            totals['rpc_calls'] += counters.get('requests', 0)
+            totals['bytes_in'] += counters.get('bytes_in', 0)
+            totals['bytes_out'] += counters.get('bytes_out', 0)
+    return totals
+
+SCENARIO_CHAINS = {
+    'evm_in': ['ethereum'], 'evm_out': ['ethereum'], 'solana_in': ['solana'],
+    'sui_in': ['sui'], 'sui_out': ['sui'],
+    'pairing': ['ethereum', 'avalanche', 'optimism', 'arbitrum', 'base', 'polygon', 'solana'],
+}
+
+def run_benchmarks(sizes, scenarios, mode, concurrency, label, server_args, seed, rate, keep_dir=None,
+                   profile=None, profile_prefix='benchmark'):
+    from standin.generator import CCTPGenerator
+
+    results = []
+    work_dir = keep_dir or tempfile.mkdtemp(prefix='cctp_bench_')
+    try:
+        for size in sizes:
+            fixtures_dir = os.path.join(work_dir, f"fixtures_{size}")
+            generator = CCTPGenerator(seed=seed)
+            generator.generate(size, rate=rate)
+            generator.write(fixtures_dir)
+            manifest = generator.manifest()
+
+            port = free_port()
+            server = start_standin(fixtures_dir, port, server_args)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                for scenario in scenarios:
+                    http_json(f"{base_url}/stats/reset", 'POST')
+                    result_file = os.path.join(work_dir, f"{scenario}_{size}.json")
+                    subprocess.run([
+                        sys.executable, os.path.abspath(__file__), '--worker', scenario, '--url', base_url,
+                        '--manifest', os.path.join(fixtures_dir, 'manifest.json'), '--mode', mode,
+                        '--concurrency', str(concurrency), '--result', result_file,
+                        '--csv', os.path.join(work_dir, f"{scenario}_{size}.csv")
+                    ] + (['--profile', profile, '--profile-out', f"{profile_prefix}_{scenario}_{size}"] if profile else []),
+                        check=True)
+                    with open(result_file) as f:
+                        worker = json.load(f)
+                    totals = rpc_totals(http_json(f"{base_url}/stats"), SCENARIO_CHAINS[scenario])
+
+                    events = worker['events']
+                    results.append({
+                        'scenario': scenario, 'size': size, 'mode': mode, 'concurrency': concurrency if mode != 'serial' else 1,
+                        'label': label, 'events': events, 'seconds': round(worker['seconds'], 4),
+                        'events_per_sec': round(events / worker['seconds'], 2) if worker['seconds'] else None,
+                        'rpc_calls': totals['rpc_calls'],
+                        'rpc_calls_per_event': round(totals['rpc_calls'] / events, 2) if events else None,
+                        'bytes_in': totals['bytes_in'], 'bytes_out': totals['bytes_out'],
+                        'bytes_per_event': round((totals['bytes_in'] + totals['bytes_out']) / events) if events else None,
+                        'peak_rss_mb': round(worker['peak_rss_mb'], 1),
+                        'latency_p50_ms': round(percentile(worker['latencies'], 0.50) * 1000, 3) if worker['latencies'] else None,
+                        'latency_p99_ms': round(percentile(worker['latencies'], 0.99) * 1000, 3) if worker['latencies'] else None,
+                        'errors': worker['errors'],
+                    })
+                    print_row(results[-1])
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        if not keep_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def print_row(row):
+    print(f"{row['scenario']:<10} n={row['size']:<7} {row['mode']:<10} events={row['events']:<7} "
+          f"{row['events_per_sec'] or 0:>9.1f} ev/s  {row['rpc_calls_per_event'] or 0:>6.2f} calls/ev  "
+          f"p50={row['latency_p50_ms'] or 0:.1f}ms p99={row['latency_p99_ms'] or 0:.1f}ms  rss={row['peak_rss_mb']}MB")
+
+def compare(baseline_file, results):
+    with open(baseline_file) as f:
+        baseline = {(row['scenario'], row['size']): row for row in json.load(f)['results']}
+    print(f"\nvs {baseline_file}:")
+    for row in results:
+        before = baseline.get((row['scenario'], row['size']))
+        if not before or not before['events_per_sec'] or not row['events_per_sec']:
+            continue
+        print(f"  {row['scenario']:<10} n={row['size']:<7} events/sec x{row['events_per_sec'] / before['events_per_sec']:.2f}  "
+              f"calls/event {before['rpc_calls_per_event']} -> {row['rpc_calls_per_event']}  "
+              f"p99 {before['latency_p99_ms']} -> {row['latency_p99_ms']} ms")
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end throughput benchmarks for the scanners against the local stand-in RPC')
+    parser.add_argument('--sizes', default='100,1000', help='comma separated dataset sizes (transfers generated)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--mode', choices=MODES, default='serial')
+    parser.add_argument('--concurrency', type=int, default=8, help='tasks per scenario in concurrent mode')
+    parser.add_argument('--label', default='', help='free-form tag stored with the results, e.g. a branch name')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, default=1.0, help='generated transfers per second of chain time')
+    parser.add_argument('--latency', type=float, default=0.0, help='stand-in latency per request, seconds')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--keep', help='keep fixtures, worker CSVs and results in this directory')
+    # Profiles each worker; throughput numbers of a profiled run are not comparable to plain ones
+    add_profile_arguments(parser)
+    # Worker mode (internal)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--manifest', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--profile-out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        with profiling(args.profile_out or args.csv, args.profile, args.profile_top):
+            result = asyncio.run(run_scenario(args.worker, args.url, manifest, args.mode, args.concurrency, args.csv))
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    scenarios = args.scenarios.split(',')
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    server_args = ['--latency', str(args.latency)] if args.latency else []
+    results = run_benchmarks([int(size) for size in args.sizes.split(',')], scenarios, args.mode, args.concurrency,
+                             args.label, server_args, args.seed, args.rate, args.keep,
+                             args.profile, os.path.splitext(args.output)[0])
+
+    report = {
+        'label': args.label, 'mode': args.mode, 'revision': git_revision(), 'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'stand_in_latency': args.latency,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
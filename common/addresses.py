@@ -0,0 +1,39 @@
+from eth_utils import keccak
+
+from common.caches import LRUCache
+
+# ~250 bytes per entry; the addresses that repeat (routers, USDC, market makers) are far fewer than this
+ADDRESS_CACHE_SIZE = 50000
+
+# Raw 20-byte address -> EIP-55 checksummed string, shared by every scanner in the process
+_checksums = LRUCache(ADDRESS_CACHE_SIZE)
+
+
+def encode_checksum(raw):
+    """EIP-55 checksum of a raw 20-byte address, straight from the bytes."""
+    hex_address = raw.hex()
+    digest = keccak(hex_address.encode()).hex()
+    return '0x' + ''.join(char.upper() if digest[i] >= '8' else char for i, char in enumerate(hex_address))
+
+
+def checksum_address(value):
+    """Checksummed address from the last 20 bytes of a 32-byte topic or ABI word.
+
+    Takes bytes, HexBytes, memoryview or a hex string (with or without 0x) of 20 or 32 bytes;
+    anything else raises ValueError. Lookups are keyed by the raw bytes, so the keccak only
+    runs the first time an address is seen.
+    """
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value[:2] in ('0x', '0X') else value)
+    if len(value) not in (20, 32):
+        raise ValueError(f"not an address or 32-byte word: {len(value)} bytes")
+    raw = bytes(value[-20:])
+    address = _checksums.get(raw)
+    if address is None:
+        address = encode_checksum(raw)
+        _checksums.put(raw, address)
+    return address
+
+
+def address_cache_stats():
+    return _checksums.stats()
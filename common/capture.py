@@ -0,0 +1,287 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+
+from eth_abi import decode, encode
+
+from common.multicall import AGGREGATE3, MULTICALL3
+
+# Segment record: key length, value length, the request key (compact JSON [method, params])
+# and the zlib-compressed compact JSON response. Keys stay uncompressed so an index can be
+# built by reading them and seeking past the values.
+RECORD = struct.Struct('>II')
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+class NotCaptured(Exception):
+    def __init__(self, chain, method, params):
+        super().__init__(f"{chain} {method} {json.dumps(params, default=_jsonable)[:200]} is not in the capture")
+        self.chain = chain
+        self.method = method
+        self.params = params
+
+
+def _jsonable(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '0x' + bytes(value).hex()
+    raise TypeError(f"can't capture an RPC param of type {type(value).__name__}")
+
+
+def request_key(method, params):
+    return json.dumps([method, params or []], sort_keys=True, separators=(',', ':'), default=_jsonable)
+
+
+def iter_segment(path, values=True):
+    """(key, value bytes or value offset, value length) per record; stops at a torn last record."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            key_length, value_length = RECORD.unpack(head)
+            key = f.read(key_length)
+            if values:
+                value = f.read(value_length)
+                if len(value) < value_length:
+                    return
+                yield key.decode(), value, value_length
+            else:
+                offset = f.tell()
+                if offset + value_length > size:
+                    return
+                f.seek(value_length, os.SEEK_CUR)
+                yield key.decode(), offset, value_length
+
+
+def segment_files(path, chain='*'):
+    return sorted(glob.glob(os.path.join(path, chain, '*.seg')))
+
+
+class Capture:
+    """Appends every successful RPC response to per-chain segment files under `path`.
+
+    Files are path/<chain>/<start>-<pid>-<n>.seg, rolled over at `segment_bytes`, so any number
+    of processes (backfill shards) can capture into one directory. A request this process
+    already wrote for the same chain is not written again.
+    """
+
+    def __init__(self, path, segment_bytes=SEGMENT_BYTES):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.started = time.strftime('%Y%m%dT%H%M%S')
+        self.records = 0
+        self.bytes = 0
+        self._files = {}
+        self._segments = {}
+        self._seen = set()
+
+    def record(self, chain, method, params, response):
+        if not isinstance(response, dict) or 'error' in response or response.get('result') is None:
+            return
+        key = request_key(method, params).encode()
+        digest = hashlib.blake2b(chain.encode() + b'\0' + key, digest_size=16).digest()
+        if digest in self._seen:
+            return
+        self._seen.add(digest)
+        value = zlib.compress(json.dumps(response.get('result'), separators=(',', ':')).encode())
+        f = self._file(chain)
+        f.write(RECORD.pack(len(key), len(value)))
+        f.write(key)
+        f.write(value)
+        self.records += 1
+        self.bytes += RECORD.size + len(key) + len(value)
+
+    def _file(self, chain):
+        f = self._files.get(chain)
+        if f is None or f.tell() >= self.segment_bytes:
+            if f is not None:
+                f.close()
+            n = self._segments.get(chain, 0)
+            self._segments[chain] = n + 1
+            os.makedirs(os.path.join(self.path, chain), exist_ok=True)
+            f = self._files[chain] = open(os.path.join(self.path, chain, f"{self.started}-{os.getpid()}-{n:04d}.seg"), 'ab')
+        return f
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def stats(self):
+        return {'path': self.path, 'records': self.records, 'bytes': self.bytes}
+
+
+class Replay:
+    """Answers RPC requests from a capture directory instead of the network.
+
+    Each chain's index (request key -> segment, offset, length) is read on first use; values
+    are decompressed per request. Multicall3 aggregate3 batches depend on what else was
+    pending, so they are answered call by call from every eth_call and aggregate3 captured.
+    An eth_getLogs for part of a captured range (same filter) is answered from that range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {}
+        self._subcalls = {}
+        self._log_queries = {}
+
+    def index(self, chain):
+        index = self._indexes.get(chain)
+        if index is None:
+            index = self._indexes[chain] = {}
+            for segment in segment_files(self.path, chain):
+                for key, offset, length in iter_segment(segment, values=False):
+                    index[key] = (segment, offset, length)
+        return index
+
+    def _load(self, location):
+        segment, offset, length = location
+        with open(segment, 'rb') as f:
+            f.seek(offset)
+            return json.loads(zlib.decompress(f.read(length)))
+
+    def result(self, chain, method, params):
+        location = self.index(chain).get(request_key(method, params))
+        if location is not None:
+            self.hits += 1
+            return self._load(location)
+        if method == 'eth_call' and _is_aggregate3(params[0]):
+            result = self._aggregate3(chain, params)
+            if result is not None:
+                self.hits += 1
+                return result
+        if method == 'eth_getLogs':
+            result = self._logs_within(chain, params[0])
+            if result is not None:
+                self.hits += 1
+                return result
+        self.misses += 1
+        raise NotCaptured(chain, method, params)
+
+    def response(self, chain, payload):
+        """JSON-RPC response to a raw payload; a miss is answered with a JSON-RPC error, as a node would."""
+        try:
+            result = self.result(chain, payload['method'], payload.get('params'))
+        except NotCaptured as e:
+            return {'jsonrpc': '2.0', 'id': payload.get('id'), 'error': {'code': -32000, 'message': str(e)}}
+        return {'jsonrpc': '2.0', 'id': payload.get('id'), 'result': result}
+
+    def _log_filters(self, chain):
+        queries = self._log_queries.get(chain)
+        if queries is None:
+            queries = self._log_queries[chain] = {}
+            for key, location in self.index(chain).items():
+                method, params = json.loads(key)
+                if method != 'eth_getLogs':
+                    continue
+                query = dict(params[0])
+                start, end = _quantity(query.pop('fromBlock', None)), _quantity(query.pop('toBlock', None))
+                if start is not None and end is not None:
+                    queries.setdefault(json.dumps(query, sort_keys=True), []).append((start, end, location))
+        return queries
+
+    def _logs_within(self, chain, query):
+        """The logs of a block range inside a captured eth_getLogs with the same filter, cut out of its answer."""
+        query = json.loads(request_key('eth_getLogs', [query]))[1][0]
+        start, end = _quantity(query.pop('fromBlock', None)), _quantity(query.pop('toBlock', None))
+        if start is None or end is None:
+            return None
+        for captured_start, captured_end, location in self._log_filters(chain).get(json.dumps(query, sort_keys=True), ()):
+            if captured_start <= start and end <= captured_end:
+                return [log for log in self._load(location) if start <= int(log['blockNumber'], 16) <= end]
+        return None
+
+    def _subcall_results(self, chain):
+        subcalls = self._subcalls.get(chain)
+        if subcalls is None:
+            subcalls = self._subcalls[chain] = {}
+            for key, location in self.index(chain).items():
+                method, params = json.loads(key)
+                if method != 'eth_call':
+                    continue
+                call = params[0]
+                result = bytes.fromhex(self._load(location)[2:])
+                if not _is_aggregate3(call):
+                    subcalls[(_hex(call['to']), _hex(call['data']))] = (True, result)
+                    continue
+                requested = decode(['(address,bool,bytes)[]'], bytes.fromhex(_hex(call['data'])[10:]))[0]
+                for (target, _, data), answer in zip(requested, decode(['(bool,bytes)[]'], result)[0]):
+                    subcalls.setdefault((target.lower(), '0x' + data.hex()), answer)
+        return subcalls
+
+    def _aggregate3(self, chain, params):
+        subcalls = self._subcall_results(chain)
+        answers = []
+        for target, _, data in decode(['(address,bool,bytes)[]'], bytes.fromhex(_hex(params[0]['data'])[10:]))[0]:
+            answer = subcalls.get((target.lower(), '0x' + data.hex()))
+            if answer is None:
+                return None
+            answers.append(answer)
+        return '0x' + encode(['(bool,bytes)[]'], [answers]).hex()
+
+    def stats(self):
+        return {'path': self.path, 'hits': self.hits, 'misses': self.misses}
+
+
+def _hex(value):
+    return _jsonable(value) if isinstance(value, (bytes, bytearray, memoryview)) else (value or '0x').lower()
+
+
+def _quantity(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith('0x'):
+        return int(value, 16)
+    return None
+
+
+def _is_aggregate3(call):
+    return _hex(call.get('to')) == MULTICALL3.lower() and _hex(call.get('data')).startswith('0x' + AGGREGATE3.hex())
+
+
+_capture = None
+_replay = None
+
+
+def get_capture():
+    return _capture
+
+
+def get_replay():
+    return _replay
+
+
+def enable_capture(path):
+    """Capture in this process and, through the environment, its child processes."""
+    global _capture
+    os.environ['CCTP_CAPTURE'] = path
+    _capture = Capture(path)
+    atexit.register(_capture.close)
+    return _capture
+
+
+def enable_replay(path):
+    global _replay
+    os.environ['CCTP_REPLAY'] = path
+    _replay = Replay(path)
+    return _replay
+
+
+# CCTP_CAPTURE=<dir> records the RPC responses of any entry point; CCTP_REPLAY=<dir> serves them back
+if os.environ.get('CCTP_REPLAY'):
+    enable_replay(os.environ['CCTP_REPLAY'])
+elif os.environ.get('CCTP_CAPTURE'):
+    enable_capture(os.environ['CCTP_CAPTURE'])
@@ -0,0 +1,30 @@
+import json
+import os
+
+
+def load_cursor(path, default=None):
+    if not path or not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cursor(path, cursor):
+    # Write to a temp file and rename so a crash never leaves a half-written cursor
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cursor, f)
+    os.replace(tmp_path, path)
+
+
+def load_resume_point(path):
+    """(cursor, sink offset) saved by save_resume_point; the offset is None for a bare cursor."""
+    saved = load_cursor(path)
+    if isinstance(saved, dict) and 'offset' in saved:
+        return saved['cursor'], saved['offset']
+    return saved, None
+
+
+def save_resume_point(path, cursor, offset=None):
+    # The offset is where the output ended when `cursor` was reached; a resume truncates back to it
+    save_cursor(path, {'cursor': cursor, 'offset': offset})
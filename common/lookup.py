@@ -0,0 +1,222 @@
+import time
+
+from common.caches import LRUCache
+from common.message import parse_message_received
+from common.nonces import BURNS
+from common.registry import load_scanner_module
+from common.tracing import span
+
+# get_logs probes a burn search may spend before giving up
+MAX_PROBES = 256
+# Block timestamp guesses block_at may spend before giving up
+MAX_STEPS = 64
+# How long after its burn a mint is looked for on the destination chain
+DEFAULT_MINT_WINDOW = 24 * 3600
+
+
+class SearchExhausted(Exception):
+    pass
+
+
+def nonce_topic(nonce):
+    return '0x' + nonce.to_bytes(32, 'big').hex()
+
+
+class NonceLookup:
+    """Finds one transfer by (source chain, nonce): its burn, then its mint.
+
+    Burn nonces grow with block height on their source chain, so the DepositForBurn log is
+    found by binary search: each step reads the burns of one `chunk_size` window (a get_logs
+    the provider accepts) in the middle of the remaining range and keeps the half the nonce
+    must be in, until one window is left; that one is read filtered on the (indexed) nonce.
+    When the middle window has no burns, the windows next to it are read, alternating sides,
+    until one has: the blocks in between are then known to hold none, so the half is still
+    certain. The search starts at the TokenMessenger's deployment block, or, with a
+    NonceIndex, between the blocks of the indexed nonces around the one looked for.
+
+    The mint is looked for on the destination chain by its indexed nonce and source domain,
+    from the block at the burn's time forward, `mint_window` seconds at most.
+    """
+
+    def __init__(self, registry, index=None, mint_window=DEFAULT_MINT_WINDOW, cache=None):
+        self.registry = registry
+        self.index = index
+        self.mint_window = mint_window
+        self.cache = cache if cache is not None else LRUCache(10000)
+        self.calls = 0
+        self._chains = {}
+        self._deployed = {}
+
+    def _chain(self, chain, direction):
+        key = (chain, direction)
+        if key not in self._chains:
+            config = self.registry[chain]
+            module = load_scanner_module(config['package'], f"transfers_{direction}")
+            self._chains[key] = (module, module.setup_web3_provider(config['rpc_url']), config)
+        return self._chains[key]
+
+    async def _get_logs(self, w3, chain, address, start, end, topics):
+        self.calls += 1
+        with span('get_logs', chain, from_block=start, to_block=end):
+            return await w3.eth.get_logs({'address': address, 'fromBlock': start, 'toBlock': end, 'topics': topics})
+
+    async def _get_block(self, w3, chain, number):
+        self.calls += 1
+        with span('get_block', chain, block=number):
+            return await w3.eth.get_block(number)
+
+    def _bounds(self, chain, nonce):
+        if self.index is None:
+            return None, None
+        return self.index.bitmap(self.registry[chain]['domain'], BURNS).locate(nonce, nonce)
+
+    async def deployed_at(self, chain, w3, address, head):
+        """First block holding `address`'s code, by binary search on eth_getCode; no burn is older.
+        0 when the node can't serve code at old blocks (not an archive node)."""
+        if chain not in self._deployed:
+            low, high = 0, head
+            try:
+                while low < high:
+                    middle = (low + high) // 2
+                    self.calls += 1
+                    if len(await w3.eth.get_code(address, middle)):
+                        high = middle
+                    else:
+                        low = middle + 1
+            except Exception as e:
+                print(f"Can't read {chain} contract code at old blocks ({str(e)}), searching from block 0")
+                low = 0
+            self._deployed[chain] = low
+        return self._deployed[chain]
+
+    async def find_burn(self, chain, nonce):
+        """DepositForBurn log of `nonce` on `chain`, or None when the chain has no such burn.
+
+        Raises SearchExhausted when MAX_PROBES probes could not settle where the nonce is.
+        """
+        module, w3, config = self._chain(chain, 'out')
+        size = config['chunk_size']
+        address, event = module.CIRCLE_TOKEN_MESSENGER, module.MESSAGE_SENT_EVENT
+        low, high = self._bounds(chain, nonce)
+        if high is None:
+            self.calls += 1
+            high = await w3.eth.block_number
+        if low is None:
+            low = await self.deployed_at(chain, w3, address, high)
+
+        probes = 0
+        while high - low + 1 > size:
+            # Read outward from the middle, a window at a time on alternating sides, until one
+            # has burns; [below, above) is what was read, so it holds no other burns
+            below = above = (low + high) // 2
+            window = None
+            while window is None and (below > low or above <= high):
+                for start, end in ((above, min(above + size - 1, high)), (max(low, below - size), below - 1)):
+                    if start > end or not low <= start <= high:
+                        continue
+                    if probes == MAX_PROBES:
+                        raise SearchExhausted(f"{chain} nonce {nonce}: no answer after {probes} probes, "
+                                              f"still between blocks {low} and {high}")
+                    probes += 1
+                    below, above = min(below, start), max(above, end + 1)
+                    logs = await self._get_logs(w3, chain, address, start, end, [event])
+                    if logs:
+                        window = logs
+                        break
+            if window is None:
+                return None
+
+            nonces = [int.from_bytes(log['topics'][1], 'big') for log in window]
+            if nonce in nonces:
+                return window[nonces.index(nonce)]
+            if nonce > nonces[-1]:
+                low = above
+            elif nonce < nonces[0]:
+                high = below - 1
+            else:
+                # Between two burns of the window: the nonce went to a message that is not a burn
+                return None
+        if low > high:
+            return None
+        logs = await self._get_logs(w3, chain, address, low, high, [event, nonce_topic(nonce)])
+        return logs[0] if logs else None
+
+    async def block_at(self, chain, timestamp, direction='in'):
+        """Last block at or before `timestamp` (to within chunk_size blocks below it), by
+        interpolating between block timestamps, every other step halving instead."""
+        _, w3, config = self._chain(chain, direction)
+        high = await self._get_block(w3, chain, 'latest')
+        if timestamp >= high['timestamp']:
+            return high['number']
+        low = await self._get_block(w3, chain, 0)
+        if timestamp <= low['timestamp']:
+            return 0
+        for step in range(MAX_STEPS):
+            if high['number'] - low['number'] <= config['chunk_size']:
+                break
+            if step % 2:
+                guess = (low['number'] + high['number']) // 2
+            else:
+                guess = low['number'] + (timestamp - low['timestamp']) * (high['number'] - low['number']) \
+                    // (high['timestamp'] - low['timestamp'])
+            guess = min(max(guess, low['number'] + 1), high['number'] - 1)
+            block = await self._get_block(w3, chain, guess)
+            if block['timestamp'] <= timestamp:
+                low = block
+            else:
+                high = block
+        else:
+            raise SearchExhausted(f"{chain}: no block for timestamp {timestamp} after {MAX_STEPS} steps")
+        return low['number']
+
+    async def find_mint(self, chain, source_domain, nonce, after_timestamp):
+        """MessageReceived log of (source_domain, nonce) on `chain`, or None."""
+        module, w3, config = self._chain(chain, 'in')
+        size = config['chunk_size']
+        start = await self.block_at(chain, after_timestamp)
+        end = await self.block_at(chain, after_timestamp + self.mint_window) + size
+        self.calls += 1
+        end = min(end, await w3.eth.block_number)
+        topics = [module.MESSAGE_RECEIVED_EVENT, None, nonce_topic(nonce)]
+        for chunk_start in range(start, end + 1, size):
+            logs = await self._get_logs(w3, chain, module.MESSAGE_TRANSMITTER, chunk_start, min(chunk_start + size - 1, end), topics)
+            for log in logs:
+                # Every source domain counts its own nonces
+                if parse_message_received(log['data']).source_domain == source_domain:
+                    return log
+        return None
+
+    async def lookup(self, chain, nonce):
+        """{'burn': row, 'mint': row, 'destination_chain', 'error', 'calls', 'seconds'} of one transfer:
+        rows are dicts in the scanners' columns (None when not found, or when the search gave up
+        with `error` set), calls the search RPC calls."""
+        started = time.perf_counter()
+        calls = self.calls
+        result = {'source_chain': chain, 'nonce': nonce, 'burn': None, 'destination_chain': None, 'mint': None,
+                  'error': None}
+        source, source_w3, _ = self._chain(chain, 'out')
+        try:
+            log = await self.find_burn(chain, nonce)
+        except SearchExhausted as e:
+            log = None
+            result['error'] = str(e)
+        if log is not None:
+            burn = await source.process_log(log, source_w3, self.cache)
+            result['burn'] = dict(zip(source.DEFAULT_PLAN.columns, burn))
+            destination = result['destination_chain'] = result['burn']['destination_chain']
+            if self.registry.get(destination, {}).get('kind') == 'evm':
+                timestamp = (await self._get_block(source_w3, chain, log['blockNumber']))['timestamp']
+                try:
+                    mint_log = await self.find_mint(destination, self.registry[chain]['domain'], nonce, timestamp)
+                except SearchExhausted as e:
+                    mint_log = None
+                    result['error'] = str(e)
+                if mint_log is not None:
+                    module, w3, _ = self._chain(destination, 'in')
+                    mint = await module.process_log(mint_log, w3, self.cache)
+                    result['mint'] = dict(zip(module.DEFAULT_PLAN.columns, mint))
+            else:
+                print(f"Mints on {destination} are not looked up")
+        result['calls'] = self.calls - calls
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        return result
@@ -0,0 +1,91 @@
+import struct
+from collections import namedtuple
+
+# CCTP v1 message: version, source domain, destination domain, nonce, sender, recipient,
+# destination caller, then the body (a BurnMessage for USDC transfers)
+HEADER = struct.Struct('>IIIQ')
+HEADER_SIZE = 116
+# BurnMessage: version, burn token, mint recipient, amount, message sender
+BURN_MESSAGE_SIZE = 132
+# Fixed ABI words of the log data: MessageReceived sourceDomain, sender, body offset;
+# DepositForBurn amount, mintRecipient, destinationDomain, destinationTokenMessenger, destinationCaller
+MESSAGE_RECEIVED_SIZE = 96
+DEPOSIT_FOR_BURN_SIZE = 160
+
+MessageHeader = namedtuple('MessageHeader', [
+    'version', 'source_domain', 'destination_domain', 'nonce', 'sender', 'recipient', 'destination_caller'
+])
+BurnMessage = namedtuple('BurnMessage', ['version', 'burn_token', 'mint_recipient', 'amount', 'message_sender'])
+MessageReceived = namedtuple('MessageReceived', ['source_domain', 'sender', 'body'])
+DepositForBurn = namedtuple('DepositForBurn', [
+    'amount', 'mint_recipient', 'destination_domain', 'destination_token_messenger', 'destination_caller'
+])
+
+# The bytes32 fields (sender, recipient, tokens, callers) come back as memoryview slices of
+# the input: nothing is copied or hex-encoded until a caller asks for it, e.g.
+# checksum_address(burn.mint_recipient) or bytes(header.sender).
+
+
+def _view(data):
+    # HexBytes and bytes both expose the buffer protocol; a memoryview passes through
+    return data if isinstance(data, memoryview) else memoryview(data)
+
+
+def _uint(view, start, end):
+    return int.from_bytes(view[start:end], 'big')
+
+
+def _abi_bytes(view, head):
+    """The dynamic `bytes` argument whose offset is in the ABI word at `head`."""
+    if head + 32 > len(view):
+        raise ValueError(f"ABI data too short: {len(view)} bytes")
+    offset = _uint(view, head, head + 32)
+    if offset + 32 > len(view):
+        raise ValueError(f"ABI bytes offset {offset} past the end of {len(view)} bytes")
+    length = _uint(view, offset, offset + 32)
+    if offset + 32 + length > len(view):
+        raise ValueError(f"ABI bytes of {length} bytes at {offset} past the end of {len(view)} bytes")
+    return view[offset + 32:offset + 32 + length]
+
+
+def parse_header(message):
+    """MessageHeader and the body that follows it, from a full CCTP message."""
+    view = _view(message)
+    if len(view) < HEADER_SIZE:
+        raise ValueError(f"CCTP message too short: {len(view)} bytes")
+    version, source_domain, destination_domain, nonce = HEADER.unpack_from(view)
+    header = MessageHeader(version, source_domain, destination_domain, nonce, view[20:52], view[52:84], view[84:116])
+    return header, view[HEADER_SIZE:]
+
+
+def parse_burn_message(body):
+    view = _view(body)
+    if len(view) < BURN_MESSAGE_SIZE:
+        raise ValueError(f"BurnMessage too short: {len(view)} bytes")
+    return BurnMessage(_uint(view, 0, 4), view[4:36], view[36:68], _uint(view, 68, 100), view[100:132])
+
+
+def parse_message_received(data):
+    """MessageTransmitter MessageReceived(caller, sourceDomain, nonce, sender, messageBody) log data.
+
+    caller and nonce are indexed, so only sourceDomain, sender and the body are in the data.
+    """
+    view = _view(data)
+    if len(view) < MESSAGE_RECEIVED_SIZE:
+        raise ValueError(f"MessageReceived data too short: {len(view)} bytes")
+    return MessageReceived(_uint(view, 0, 32), view[32:64], _abi_bytes(view, 64))
+
+
+def parse_message_sent(data):
+    """MessageTransmitter MessageSent(message) log data -> (MessageHeader, BurnMessage)."""
+    header, body = parse_header(_abi_bytes(_view(data), 0))
+    return header, parse_burn_message(body)
+
+
+def parse_deposit_for_burn(data):
+    """TokenMessenger DepositForBurn log data; nonce, burn token and depositor are topics."""
+    view = _view(data)
+    if len(view) < DEPOSIT_FOR_BURN_SIZE:
+        raise ValueError(f"DepositForBurn data too short: {len(view)} bytes")
+    return DepositForBurn(_uint(view, 0, 32), view[32:64], _uint(view, 64, 96), view[96:128], view[128:160])
+
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name: (type, help)
+METRICS = {
+    'cctp_rpc_requests_total': ('counter', 'JSON-RPC requests issued (one per call, however many attempts it took)'),
+    'cctp_rpc_attempts_total': ('counter', 'HTTP attempts per endpoint host, including failovers and hedges'),
+    'cctp_rpc_errors_total': ('counter', 'Requests that failed, by kind: HTTP status, timeout, rpc (error in the response body) or exception name'),
+    'cctp_rpc_attempt_errors_total': ('counter', 'Failed HTTP attempts per endpoint host, by kind'),
+    'cctp_rpc_rate_limited_total': ('counter', 'HTTP 429 responses and rate limit errors in response bodies'),
+    'cctp_rpc_retries_total': ('counter', 'Extra attempts, by reason: failover, hedge or backoff (caller retry loops)'),
+    'cctp_rpc_request_bytes_total': ('counter', 'Request body bytes sent'),
+    'cctp_rpc_response_bytes_total': ('counter', 'Response body bytes received'),
+    'cctp_rpc_cache_hits_total': ('counter', 'Requests answered from the on-disk RPC response cache instead of the node'),
+    'cctp_rpc_in_flight': ('gauge', 'Requests currently waiting for a response'),
+    'cctp_rpc_latency_seconds': ('histogram', 'Request latency, including failovers and hedges'),
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Counters, gauges and histograms keyed by metric name and labels.
+
+    Updates come from the event loop, reads from the metrics server thread, so both take
+    the same lock; it is uncontended outside of a scrape.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(dict)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def add(self, name, delta, **labels):
+        # Gauges move both ways; same storage as counters
+        self.inc(name, delta, **labels)
+
+    def observe(self, name, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values[name]
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                kind, help_text = METRICS.get(name, ('untyped', ''))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._values[name].items()):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets + (float('inf'),), value.counts):
+                            cumulative += count
+                            le = '+Inf' if bound == float('inf') else repr(bound)
+                            lines.append(f"{name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+                        lines.append(f"{name}_sum{format_labels(key)} {value.sum}")
+                        lines.append(f"{name}_count{format_labels(key)} {value.count}")
+                    else:
+                        lines.append(f"{name}{format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Plain dict of every series, with p50/p99 estimates for histograms."""
+        snapshot = {}
+        with self._lock:
+            for name, series in self._values.items():
+                entries = []
+                for key, value in sorted(series.items()):
+                    entry = dict(key)
+                    if isinstance(value, Histogram):
+                        entry.update(count=value.count, sum=value.sum, p50=value.quantile(0.5), p99=value.quantile(0.99))
+                    else:
+                        entry['value'] = value
+                    entries.append(entry)
+                snapshot[name] = entries
+        return snapshot
+
+    def summary(self):
+        """Per chain/method totals, heaviest first: where the RPC budget goes."""
+        snapshot = self.snapshot()
+        rows = defaultdict(lambda: defaultdict(float))
+        for name, field in (('cctp_rpc_requests_total', 'requests'), ('cctp_rpc_errors_total', 'errors'),
+                            ('cctp_rpc_rate_limited_total', 'rate_limited'), ('cctp_rpc_retries_total', 'retries'),
+                            ('cctp_rpc_response_bytes_total', 'response_bytes')):
+            for entry in snapshot.get(name, []):
+                rows[(entry.get('chain'), entry.get('method'))][field] += entry['value']
+        for entry in snapshot.get('cctp_rpc_latency_seconds', []):
+            row = rows[(entry.get('chain'), entry.get('method'))]
+            row['latency_p50'] = entry['p50']
+            row['latency_p99'] = entry['p99']
+            row['seconds'] = entry['sum']
+        return sorted(
+            ({'chain': chain, 'method': method, 'requests': 0, 'errors': 0, 'rate_limited': 0, 'retries': 0,
+              'response_bytes': 0, 'latency_p50': None, 'latency_p99': None, 'seconds': 0.0, **values}
+             for (chain, method), values in rows.items()),
+            key=lambda row: row['requests'], reverse=True
+        )
+
+
+def format_labels(key):
+    if not key:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in key) + '}'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body = json.dumps({'series': get_metrics().snapshot(), 'summary': get_metrics().summary()}).encode()
+            content_type = 'application/json'
+        elif self.path.startswith('/metrics'):
+            body = get_metrics().render().encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics = None
+_server = None
+
+def get_metrics():
+    """The process-wide metrics; starts the endpoint on CCTP_METRICS_PORT when that is set."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+        port = os.environ.get('CCTP_METRICS_PORT')
+        if port:
+            start_metrics_server(int(port))
+    return _metrics
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread, so any event loop can keep running."""
+    global _server
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # e.g. the port is taken by the parent of a backfill worker process
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return _server
+
+def print_summary(limit=20):
+    rows = get_metrics().summary()[:limit]
+    if not rows:
+        return
+    print("RPC usage by chain/method:")
+    for row in rows:
+        p99 = row.get('latency_p99')
+        print(f"  {row['chain']:<10} {row['method']:<32} {int(row['requests']):>8} calls  {int(row['errors']):>5} errors  "
+              f"{int(row['rate_limited']):>5} 429s  {int(row['retries']):>5} retries  {row['response_bytes'] / 1e6:>8.2f} MB  "
+              f"p99<={p99 if p99 is not None else '-'}s")
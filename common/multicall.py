@@ -0,0 +1,164 @@
+import asyncio
+import weakref
+
+from eth_abi import decode, encode
+
+from common.caches import LRUCache
+
+# Multicall3 is deployed at the same address on every EVM chain we scan
+MULTICALL3 = '0xcA11bde05977b3631167028862bE2a173976CA11'
+# aggregate3((address target, bool allowFailure, bytes callData)[]) -> (bool success, bytes returnData)[]
+AGGREGATE3 = bytes.fromhex('82ad56cb')
+
+# ERC-20 selectors
+DECIMALS = bytes.fromhex('313ce567')
+SYMBOL = bytes.fromhex('95d89b41')
+
+# Token metadata never changes, so one entry per (chain, token) lives for the whole process
+TOKEN_CACHE_SIZE = 10000
+
+
+class CallFailed(Exception):
+    """One call inside an aggregate3 batch reverted (the rest of the batch is unaffected)."""
+
+    def __init__(self, to, data, return_data=b''):
+        super().__init__(f"eth_call to {to} (selector 0x{bytes(data[:4]).hex()}) reverted")
+        self.to = to
+        self.data = data
+        self.return_data = return_data
+
+
+class CallBatcher:
+    """Coalesces the eth_calls of one AsyncWeb3 into Multicall3 aggregate3 calls.
+
+    Calls issued within `window` seconds of the first pending one go out together, up to
+    `max_calls` per aggregate3; identical (to, data) pairs in the same window share one
+    slot. Every call is sent with allowFailure, so a reverting token fails only its own
+    callers with CallFailed. A single pending call goes out as a plain eth_call, and if the
+    aggregate3 call itself fails (no Multicall3 on the node, an RPC error) the batch is
+    retried call by call.
+    """
+
+    def __init__(self, w3, window=0.005, max_calls=200):
+        self.w3 = w3
+        self.window = window
+        self.max_calls = max_calls
+        self.pending = {}
+        self.calls = 0
+        self.requests = 0
+        self.fallbacks = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def call(self, to, data, output_types=None):
+        """Return data of `to`.call(`data`), ABI-decoded when `output_types` is given (one type -> its value)."""
+        key = (to, bytes(data))
+        future = self.pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.pending[key] = future
+            if len(self.pending) >= self.max_calls:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # Shielded: a cancelled caller must not cancel the result for the others sharing it
+        result = await asyncio.shield(future)
+        if output_types is None:
+            return result
+        values = decode(output_types, result)
+        return values[0] if len(output_types) == 1 else values
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        self.calls += len(batch)
+        if len(batch) == 1:
+            await self._send_each(batch)
+            return
+        items = list(batch.items())
+        try:
+            data = AGGREGATE3 + encode(['(address,bool,bytes)[]'], [[(to, True, call) for (to, call), _ in items]])
+            raw = await self.w3.eth.call({'to': MULTICALL3, 'data': data})
+            results = decode(['(bool,bytes)[]'], raw)[0]
+        except Exception:
+            self.fallbacks += 1
+            await self._send_each(batch)
+            return
+        self.requests += 1
+        for ((to, call), future), (success, return_data) in zip(items, results):
+            if future.done():
+                continue
+            if success:
+                future.set_result(return_data)
+            else:
+                future.set_exception(CallFailed(to, call, return_data))
+
+    async def _send_each(self, batch):
+        async def send(to, call, future):
+            try:
+                result = await self.w3.eth.call({'to': to, 'data': call})
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(bytes(result))
+        self.requests += len(batch)
+        await asyncio.gather(*(send(to, call, future) for (to, call), future in batch.items()))
+
+    def stats(self):
+        return {'calls': self.calls, 'requests': self.requests, 'fallbacks': self.fallbacks}
+
+
+# One batcher per AsyncWeb3, so calls for the same chain coalesce across scanners
+_batchers = weakref.WeakKeyDictionary()
+_token_info = LRUCache(TOKEN_CACHE_SIZE)
+
+
+def get_batcher(w3):
+    batcher = _batchers.get(w3)
+    if batcher is None:
+        batcher = _batchers[w3] = CallBatcher(w3)
+    return batcher
+
+
+async def get_token_info(w3, chain, token_address):
+    """(decimals, symbol) of an ERC-20 on `chain`, through the batcher, cached per token."""
+    key = (chain, token_address)
+    info = _token_info.get(key)
+    if info is None:
+        batcher = get_batcher(w3)
+        info = await asyncio.gather(
+            batcher.call(token_address, DECIMALS, ['uint8']),
+            batcher.call(token_address, SYMBOL, ['string'])
+        )
+        info = tuple(info)
+        _token_info.put(key, info)
+    return info
+
+
+async def prefetch_token_info(w3, chain, token_addresses):
+    """Look up every token of a get_logs page not cached yet, in as few aggregate3 calls as fit.
+
+    Failures are left for the per-event lookup to raise, so one bad token only drops its own rows.
+    """
+    missing = {token for token in token_addresses if (chain, token) not in _token_info}
+    if missing:
+        await asyncio.gather(*(get_token_info(w3, chain, token) for token in missing), return_exceptions=True)
+
+
+def multicall_stats():
+    stats = {'tokens': _token_info.stats()}
+    for batcher in list(_batchers.values()):
+        for name, value in batcher.stats().items():
+            stats[name] = stats.get(name, 0) + value
+    return stats
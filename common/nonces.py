@@ -0,0 +1,242 @@
+import mmap
+import os
+import re
+import struct
+
+from common.registry import CHAINS
+
+# CCTP domain of every chain name rows use; noble is a mint source only, it is not scanned
+CHAIN_DOMAINS = {**{name: config['domain'] for name, config in CHAINS.items()}, 'noble': 4}
+DOMAIN_CHAINS = {domain: name for name, domain in CHAIN_DOMAINS.items()}
+
+BURNS = 'burns'
+MINTS = 'mints'
+
+# Files grow in steps of this many bytes (a bitmap step covers 512k nonces)
+GROW_BYTES = 64 * 1024
+# Nonces sharing one (min, max) position entry
+BUCKET = 64
+POSITION = struct.Struct('<QQ')
+# CCTP v1 nonces are sequential per domain; anything past this is not a nonce we can index
+MAX_NONCE = 1 << 36
+
+_PARTIAL_OR_EMPTY = re.compile(rb'\x00+|[^\x00\xff]')
+
+
+class _GrowingMap:
+    """A file mapped into memory that is extended (and remapped) on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(GROW_BYTES)
+        self.map = mmap.mmap(self._file.fileno(), 0)
+
+    def __len__(self):
+        return len(self.map)
+
+    def ensure(self, size):
+        if size <= len(self.map):
+            return
+        self.map.close()
+        self._file.truncate(-(-size // GROW_BYTES) * GROW_BYTES)
+        self.map = mmap.mmap(self._file.fileno(), 0)
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self._file.close()
+
+
+class NonceBitmap:
+    """Which nonces of one source domain have been seen: one bit per nonce, memory-mapped.
+
+    `path` holds bit n % 8 of byte n // 8 for nonce n. Next to it, `path`.pos keeps the
+    smallest and largest position (block number, for burns) seen per BUCKET nonces, so a
+    missing nonce can be looked for between the positions of the nonces around it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.bits = _GrowingMap(path)
+        # Opened on the first position, so mint bitmaps (no positions) don't get one
+        self.positions = _GrowingMap(f"{path}.pos") if os.path.exists(f"{path}.pos") else None
+
+    def __contains__(self, nonce):
+        byte = nonce >> 3
+        return byte < len(self.bits) and bool(self.bits.map[byte] >> (nonce & 7) & 1)
+
+    def add(self, nonce, position=None):
+        if not 0 <= nonce < MAX_NONCE:
+            raise ValueError(f"nonce {nonce} is out of range")
+        byte = nonce >> 3
+        self.bits.ensure(byte + 1)
+        self.bits.map[byte] |= 1 << (nonce & 7)
+        if position is not None:
+            if self.positions is None:
+                self.positions = _GrowingMap(f"{self.path}.pos")
+            offset = (nonce // BUCKET) * POSITION.size
+            self.positions.ensure(offset + POSITION.size)
+            low, high = POSITION.unpack_from(self.positions.map, offset)
+            # Stored plus one, so 0 means no position seen in the bucket
+            low = position + 1 if not low else min(low, position + 1)
+            high = max(high, position + 1)
+            POSITION.pack_into(self.positions.map, offset, low, high)
+
+    def count(self):
+        return int.from_bytes(self.bits.map, 'little').bit_count()
+
+    def bounds(self):
+        """(first, last) nonce seen, or None when empty."""
+        data = self.bits.map
+        first_byte = next((match.start() for match in re.finditer(rb'[^\x00]', data)), None)
+        if first_byte is None:
+            return None
+        last_byte = len(data)
+        # Scan back a step at a time for the last non-zero byte
+        while True:
+            start = max(0, last_byte - GROW_BYTES)
+            chunk = data[start:last_byte].rstrip(b'\x00')
+            if chunk:
+                last_byte = start + len(chunk) - 1
+                break
+            last_byte = start
+        first = first_byte * 8 + (data[first_byte] & -data[first_byte]).bit_length() - 1
+        last = last_byte * 8 + data[last_byte].bit_length() - 1
+        return first, last
+
+    def gaps(self, start=None, end=None):
+        """Yield (first, last) of every run of missing nonces in [start, end] (default: the seen range)."""
+        if start is None or end is None:
+            bounds = self.bounds()
+            if bounds is None:
+                return
+            start = bounds[0] if start is None else start
+            end = bounds[1] if end is None else end
+        run_start = None
+        data = self.bits.map
+        first_byte, last_byte = start >> 3, end >> 3
+        window = data[first_byte:min(last_byte + 1, len(data))]
+        # Only empty runs and partly filled bytes need looking at; full bytes are skipped in C
+        for match in _PARTIAL_OR_EMPTY.finditer(window):
+            base = (first_byte + match.start()) * 8
+            if window[match.start()] == 0:
+                missing = [(base, (first_byte + match.end()) * 8 - 1)]
+            else:
+                byte = window[match.start()]
+                missing = [(base + bit, base + bit) for bit in range(8) if not byte >> bit & 1]
+            for low, high in missing:
+                low, high = max(low, start), min(high, end)
+                if low > high:
+                    continue
+                if run_start is not None and low == run_end + 1:
+                    run_end = high
+                    continue
+                if run_start is not None:
+                    yield run_start, run_end
+                run_start, run_end = low, high
+        # Past the end of the file nothing was seen
+        if (len(data) << 3) <= end:
+            low = max(start, len(data) << 3)
+            if run_start is not None and low == run_end + 1:
+                run_end = end
+            else:
+                if run_start is not None:
+                    yield run_start, run_end
+                run_start, run_end = low, end
+        if run_start is not None:
+            yield run_start, run_end
+
+    def _bucket_positions(self, nonce):
+        offset = (nonce // BUCKET) * POSITION.size
+        if self.positions is None or nonce < 0 or offset + POSITION.size > len(self.positions):
+            return None, None
+        low, high = POSITION.unpack_from(self.positions.map, offset)
+        return (low - 1 if low else None), (high - 1 if high else None)
+
+    def locate(self, first, last):
+        """Position range that must hold nonces first..last if positions grow with nonces (burns
+        on their source chain): from the bucket of the nonce before to that of the nonce after."""
+        low, _ = self._bucket_positions(first - 1)
+        _, high = self._bucket_positions(last + 1)
+        return low, high
+
+    def flush(self):
+        self.bits.flush()
+        if self.positions is not None:
+            self.positions.flush()
+
+    def close(self):
+        self.bits.close()
+        if self.positions is not None:
+            self.positions.close()
+
+
+class NonceIndex:
+    """A directory of NonceBitmaps, one per (source domain, burns or mints).
+
+    Burns (transfers_out rows) are indexed under the chain they were scanned on, with
+    their block number as position; mints (transfers_in rows) under their source chain.
+    Rows without a nonce or a known source domain (Solana mints) are skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.bitmaps = {}
+        os.makedirs(path, exist_ok=True)
+
+    def bitmap(self, domain, kind):
+        bitmap = self.bitmaps.get((domain, kind))
+        if bitmap is None:
+            bitmap = self.bitmaps[(domain, kind)] = NonceBitmap(os.path.join(self.path, f"{domain}-{kind}.bits"))
+        return bitmap
+
+    def existing(self):
+        """(domain, kind) of every bitmap in the directory."""
+        found = []
+        for name in sorted(os.listdir(self.path)):
+            match = re.fullmatch(r'(\d+)-(burns|mints)\.bits', name)
+            if match:
+                found.append((int(match.group(1)), match.group(2)))
+        return found
+
+    def record(self, chain, direction, row):
+        """Mark the nonce of one output row (a dict); returns whether it could be indexed."""
+        nonce = row.get('nonce')
+        if nonce in (None, ''):
+            return False
+        if direction == 'out':
+            domain, kind = CHAIN_DOMAINS.get(chain), BURNS
+            position = row.get('block_number')
+        else:
+            domain, kind = CHAIN_DOMAINS.get(row.get('source_chain')), MINTS
+            position = None
+        if domain is None:
+            return False
+        self.bitmap(domain, kind).add(int(nonce), int(position) if position not in (None, '') else None)
+        return True
+
+    def summary(self):
+        """{(domain, kind): (seen, first, last, missing)} of every bitmap in the directory."""
+        summary = {}
+        for domain, kind in self.existing():
+            bitmap = self.bitmap(domain, kind)
+            bounds = bitmap.bounds()
+            if bounds is None:
+                continue
+            missing = sum(last - first + 1 for first, last in bitmap.gaps())
+            summary[(domain, kind)] = (bitmap.count(), bounds[0], bounds[1], missing)
+        return summary
+
+    def flush(self):
+        for bitmap in self.bitmaps.values():
+            bitmap.flush()
+
+    def close(self):
+        for bitmap in self.bitmaps.values():
+            bitmap.close()
+        self.bitmaps = {}
@@ -0,0 +1,83 @@
+# What a scanner can fetch per event beyond the log itself: (RPC calls before caching, what they are)
+SOURCES = {
+    'block': (1, 'eth_getBlockByNumber, cached per block'),
+    'transaction': (1, 'eth_getTransactionByHash'),
+    'receipt': (1, 'eth_getTransactionReceipt'),
+    # decimals() + symbol() of every new token of a get_logs page share one aggregate3 call
+    'token_info': (0, 'Multicall3 aggregate3 per chunk for tokens not seen yet, cached per token'),
+}
+
+
+class Plan:
+    """Output columns of one run and the per-event RPC calls needed to fill them.
+
+    Scanners build the full row as usual, skipping every fetch whose source is not in
+    `sources` (those cells stay empty), and `project` cuts the row down to `columns`.
+    """
+
+    def __init__(self, header, columns, sources):
+        self.header = list(header)
+        self.columns = list(columns)
+        self.sources = set(sources)
+        self.full = self.columns == self.header
+        self.indexes = [self.header.index(column) for column in self.columns]
+
+    def needs(self, source):
+        return source in self.sources
+
+    def project(self, row):
+        return row if self.full else [row[i] for i in self.indexes]
+
+    def calls_per_event(self):
+        return sum(SOURCES[source][0] for source in self.sources)
+
+    def describe(self, name=''):
+        lines = [f"{name + '  ' if name else ''}columns: {', '.join(self.columns)}"]
+        for source in SOURCES:
+            if source in self.sources:
+                calls, what = SOURCES[source]
+                lines.append(f"  {source:<12} {calls} call{'s' if calls != 1 else ' '}  {what}")
+        skipped = [source for source in SOURCES if source not in self.sources]
+        if skipped:
+            lines.append(f"  skipped: {', '.join(skipped)}")
+        lines.append(f"  <= {self.calls_per_event()} RPC calls per event (plus eth_getLogs per chunk)")
+        return '\n'.join(lines)
+
+
+def plan_columns(header, column_sources, columns=None, optional=(), sources=()):
+    """Plan for `columns` (default: the whole header) of a scanner.
+
+    `column_sources` maps a column to the sources it needs; columns missing from it come from
+    the log. Without explicit columns, `optional` ones keep their place in the header but
+    are left empty rather than paid for. `sources` are fetched regardless of the columns.
+    """
+    if columns is None:
+        columns = header
+        wanted = [column for column in header if column not in optional]
+    else:
+        unknown = [column for column in columns if column not in header]
+        if unknown:
+            raise ValueError(f"unknown columns: {', '.join(unknown)} (available: {', '.join(header)})")
+        wanted = columns
+    needed = set(sources)
+    for column in wanted:
+        needed.update(column_sources.get(column, ()))
+    return Plan(header, columns, needed)
+
+
+def plan_for(module, direction, config):
+    """Plan of an EVM scanner module from its registry config: `columns` and `receipts`.
+
+    One columns list serves both directions, each scanner taking the columns it has.
+    """
+    columns = config.get('columns')
+    if columns is not None:
+        columns = [column for column in columns if column in module.CSV_HEADER]
+        if not columns:
+            raise ValueError(f"transfers_{direction} has none of the requested columns")
+    sources = ['receipt'] if direction == 'in' and config.get('receipts') else []
+    return module.make_plan(columns, sources)
+
+
+def parse_columns(value):
+    return [column.strip() for column in value.split(',') if column.strip()] if value else None
@@ -0,0 +1,281 @@
+import cProfile
+import linecache
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from common.registry import REPO_ROOT
+
+PROFILE_KINDS = ('cpu', 'sample', 'alloc')
+DEFAULT_PROFILE = 'cpu,alloc'
+
+
+def parse_profile(value):
+    """'cpu', 'sample', 'alloc' or a comma separated mix; cpu and sample are exclusive."""
+    kinds = {kind.strip() for kind in value.split(',') if kind.strip()}
+    unknown = kinds - set(PROFILE_KINDS)
+    if unknown:
+        raise ValueError(f"unknown profile kinds: {', '.join(sorted(unknown))} (expected {', '.join(PROFILE_KINDS)})")
+    if {'cpu', 'sample'} <= kinds:
+        raise ValueError("cpu and sample profiles can't be combined")
+    return kinds
+
+
+def profile_base(output_file):
+    # ethereum_transfers_in.csv -> ethereum_transfers_in.prof, .alloc, .profile.txt next to it
+    return os.path.splitext(output_file)[0]
+
+
+def _frame_name(filename, line, function):
+    if filename.startswith(REPO_ROOT):
+        filename = os.path.relpath(filename, REPO_ROOT)
+    elif filename == '~':
+        return function  # builtins, e.g. <method 'decode' of 'bytes' objects>
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{line}({function})"
+
+
+class Profiler:
+    """CPU profile and allocation tracking for one run of an entry point.
+
+    `cpu` is cProfile (exact call counts, adds per-call overhead to small hot functions),
+    `sample` walks the profiled thread's stack every `interval` seconds (cheap, statistical,
+    and shows time spent waiting in the event loop), `alloc` runs tracemalloc and keeps a
+    snapshot near the traced-memory peak. Allocations are charged to the innermost repository
+    line on the stack, so bytes allocated inside web3 or json show up against the decode or
+    write call that asked for them.
+
+    Files written next to `base`: base.prof (pstats, for snakeviz or `python -m pstats`) or
+    base.collapsed (folded stacks, for flamegraph.pl or speedscope), base.alloc (tracemalloc
+    snapshot) and base.profile.txt with the top-N summary.
+    """
+
+    def __init__(self, base, kinds=DEFAULT_PROFILE, top=25, interval=0.005, alloc_frames=16):
+        self.base = base
+        self.kinds = parse_profile(kinds) if isinstance(kinds, str) else set(kinds)
+        self.top = top
+        self.interval = interval
+        self.alloc_frames = alloc_frames
+        self.stats = None
+        self.samples = Counter()
+        self.snapshots = []
+        self.snapshot_bytes = 0
+        self.peak_bytes = 0
+        self.wall = 0.0
+        self._repo_frames = set()
+        self._profile = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # Recording
+
+    def start(self):
+        self._started = time.perf_counter()
+        if 'alloc' in self.kinds:
+            tracemalloc.start(self.alloc_frames)
+        if 'sample' in self.kinds or 'alloc' in self.kinds:
+            target = threading.get_ident()
+            self._thread = threading.Thread(target=self._watch, args=(target,), name='profiler', daemon=True)
+            self._thread.start()
+        if 'cpu' in self.kinds:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def _watch(self, target):
+        sampling = 'sample' in self.kinds
+        tracking = 'alloc' in self.kinds
+        interval = self.interval if sampling else 0.25
+        names = {}
+        next_check = 0.0
+        while not self._stop.wait(interval):
+            if sampling:
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code not in names:
+                        names[code] = _frame_name(code.co_filename, code.co_firstlineno, code.co_name)
+                        if code.co_filename.startswith(REPO_ROOT):
+                            self._repo_frames.add(names[code])
+                    stack.append(names[code])
+                    frame = frame.f_back
+                if stack:
+                    self.samples[tuple(reversed(stack))] += 1
+            if tracking and time.perf_counter() >= next_check:
+                next_check = time.perf_counter() + 0.25
+                self._check_memory()
+
+    def _check_memory(self, final=False):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak)
+        # Re-snapshot only after 10% growth: taking one copies every live trace
+        if current > self.snapshot_bytes * 1.1 or (final and not self.snapshots):
+            self.snapshots = [tracemalloc.take_snapshot()]
+            self.snapshot_bytes = current
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+            self.stats = pstats.Stats(self._profile)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if 'alloc' in self.kinds:
+            self._check_memory(final=True)
+            tracemalloc.stop()
+        self.wall = time.perf_counter() - self._started
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.write()
+        return False
+
+    # Folding in profiles written by other processes
+
+    def absorb(self, base):
+        """Add the profile files another process wrote at `base` (e.g. one backfill shard)."""
+        if os.path.exists(f"{base}.prof"):
+            if self.stats is None:
+                self.stats = pstats.Stats(f"{base}.prof")
+            else:
+                self.stats.add(f"{base}.prof")
+        if os.path.exists(f"{base}.collapsed"):
+            with open(f"{base}.collapsed") as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stack = tuple(stack.split(';'))
+                    self.samples[stack] += int(count)
+                    self._repo_frames.update(name for name in stack
+                                             if os.path.isfile(os.path.join(REPO_ROOT, name.split(':')[0])))
+        if os.path.exists(f"{base}.alloc"):
+            # Summed over processes: what they held at their worst, together
+            snapshot = tracemalloc.Snapshot.load(f"{base}.alloc")
+            self.snapshots.append(snapshot)
+            self.snapshot_bytes += sum(stat.size for stat in snapshot.statistics('filename'))
+            self.peak_bytes = max(self.peak_bytes, self.snapshot_bytes)
+
+    # Reports
+
+    def functions(self):
+        """(name, calls, own seconds, cumulative seconds, in repository) per function; calls is None when sampled."""
+        rows = []
+        if self.stats is not None:
+            for (filename, line, function), (_, calls, own, cumulative, _) in self.stats.stats.items():
+                rows.append((_frame_name(filename, line, function), calls, own, cumulative,
+                             filename.startswith(REPO_ROOT)))
+        elif self.samples:
+            own = Counter()
+            cumulative = Counter()
+            for stack, count in self.samples.items():
+                own[stack[-1]] += count
+                for name in set(stack):
+                    cumulative[name] += count
+            for name, count in cumulative.items():
+                rows.append((name, None, own[name] * self.interval, count * self.interval, name in self._repo_frames))
+        return rows
+
+    def allocations(self):
+        """Live bytes and blocks at the snapshot, per innermost repository line."""
+        totals = defaultdict(lambda: [0, 0])
+        # Module code and import state are paid once per process, not per event; the sampler's own stacks are ours
+        skip = [tracemalloc.Filter(False, '<frozen importlib._bootstrap>', all_frames=True),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>', all_frames=True),
+                tracemalloc.Filter(False, __file__)]
+        for snapshot in self.snapshots:
+            for stat in snapshot.filter_traces(skip).statistics('traceback'):
+                # Tracebacks are stored most recent call first
+                frame = next((frame for frame in stat.traceback if frame.filename.startswith(REPO_ROOT)), stat.traceback[0])
+                totals[(frame.filename, frame.lineno)][0] += stat.size
+                totals[(frame.filename, frame.lineno)][1] += stat.count
+        return sorted(((filename, line, size, count) for (filename, line), (size, count) in totals.items()),
+                      key=lambda row: row[2], reverse=True)
+
+    def summary(self, top=None):
+        top = top or self.top
+        lines = [f"Profile ({', '.join(sorted(self.kinds))}) over {self.wall:.1f}s wall"]
+        rows = self.functions()
+        if rows:
+            unit = 'calls' if self.stats is not None else 'samples'
+            for title, selected, key in (
+                ('own time', rows, 2),
+                ('cumulative time', rows, 3),
+                ('own time, repository code only', [row for row in rows if row[4]], 2),
+            ):
+                lines.append(f"\nTop {top} functions by {title}:")
+                lines.append(f"  {unit if unit == 'calls' else '':>10} {'own s':>9} {'cum s':>9} {'us/call':>9}  function")
+                for name, calls, own, cumulative, _ in sorted(selected, key=lambda row: row[key], reverse=True)[:top]:
+                    per_call = f"{own / calls * 1e6:.1f}" if calls else '-'
+                    lines.append(f"  {calls if calls is not None else '':>10} {own:>9.3f} {cumulative:>9.3f} {per_call:>9}  {name}")
+        allocations = self.allocations()
+        if allocations:
+            lines.append(f"\nTop {top} lines by live memory near the peak "
+                         f"(snapshot {self.snapshot_bytes / 1e6:.1f} MB, traced peak {self.peak_bytes / 1e6:.1f} MB):")
+            for filename, line, size, count in allocations[:top]:
+                source = linecache.getline(filename, line).strip()
+                lines.append(f"  {size / 1024:>10.1f} KiB {count:>8} blocks  {_frame_name(filename, line, '')[:-2]}  {source}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, quiet=False):
+        written = []
+        if self.stats is not None:
+            self.stats.dump_stats(f"{self.base}.prof")
+            written.append(f"{self.base}.prof")
+        if self.samples:
+            with open(f"{self.base}.collapsed", 'w') as f:
+                for stack, count in self.samples.items():
+                    f.write(f"{';'.join(stack)} {count}\n")
+            written.append(f"{self.base}.collapsed")
+        if len(self.snapshots) == 1:
+            self.snapshots[0].dump(f"{self.base}.alloc")
+            written.append(f"{self.base}.alloc")
+        if quiet:
+            return written
+        summary = self.summary()
+        with open(f"{self.base}.profile.txt", 'w') as f:
+            f.write(summary)
+        written.append(f"{self.base}.profile.txt")
+        # The console gets the short version; the file has every table at full length
+        print('\n' + self.summary(top=min(self.top, 10)))
+        print(f"Profile written to {', '.join(written)}")
+        return written
+
+
+class _NoProfile:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+def profiling(output_file, kinds=None, top=25):
+    """Context manager profiling its block when `kinds` (or CCTP_PROFILE) is set; files go next to `output_file`."""
+    kinds = kinds or os.environ.get('CCTP_PROFILE')
+    if not kinds:
+        return _NoProfile()
+    return Profiler(profile_base(output_file), kinds, top)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE, metavar='KINDS',
+                        help=f"profile the run: comma separated {', '.join(PROFILE_KINDS)} (default: {DEFAULT_PROFILE})")
+    parser.add_argument('--profile-top', type=int, default=25, help='rows per table in the profile summary')
+
+
+def profile_flag(argv=None):
+    """`--profile[=KINDS]` for the single-chain scripts, which take no other arguments."""
+    for arg in (sys.argv[1:] if argv is None else argv):
+        if arg == '--profile':
+            return DEFAULT_PROFILE
+        if arg.startswith('--profile='):
+            return arg.split('=', 1)[1]
+    return None
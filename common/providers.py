@@ -0,0 +1,346 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from common.capture import get_capture, get_replay
+from common.metrics import get_metrics
+from common.registry import chain_for_url
+from common.response_cache import HEAD_TTL, MISSING, get_response_cache, result_block
+from common.transport import get_transport
+
+
+class RPCHTTPError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"RPC call to {url} failed with status code: {status}")
+        self.url = url
+        self.status = status
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, then lets a single probe through
+    every `reset_timeout` seconds until one succeeds."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        if self.state == 'half_open':
+            # Restart the timer so only one probe goes out per reset window
+            self.opened_at = time.monotonic()
+            return True
+        return self.opened_at is None
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    def __init__(self, url, failure_threshold=5, reset_timeout=30.0):
+        self.url = url
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, latency, ok, alpha=0.2):
+        self.requests += 1
+        if ok:
+            self.latency_ewma = latency if self.latency_ewma is None else (1 - alpha) * self.latency_ewma + alpha * latency
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+        self.error_ewma = (1 - alpha) * self.error_ewma + alpha * (0.0 if ok else 1.0)
+
+    @property
+    def score(self):
+        # Lower is better; endpoints we have no latency for yet get tried first
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.0
+        return latency * (1 + 4 * self.error_ewma) + self.error_ewma
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'state': self.breaker.state,
+            'latency_ewma': self.latency_ewma,
+            'error_rate': self.error_ewma,
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
+
+class ProviderPool:
+    """Routes JSON-RPC requests over several endpoints for the same chain.
+
+    Requests go to the healthiest endpoint (latency EWMA weighted by error rate) whose
+    circuit breaker is closed. If it hasn't answered within the pool's recent p95
+    latency, a hedged duplicate goes to the next best endpoint and the first successful
+    answer wins. Failed or timed out attempts fail over until every endpoint was tried.
+    """
+
+    def __init__(self, urls, timeout=15.0, hedge=True, hedge_quantile=0.95, initial_hedge_delay=1.0,
+                 min_hedge_delay=0.05, failure_threshold=5, reset_timeout=30.0, chain=None):
+        if isinstance(urls, str):
+            urls = [urls]
+        # Metrics label; every URL in a pool serves the same chain
+        self.chain = chain or chain_for_url(urls[0])
+        self.endpoints = [Endpoint(url, failure_threshold, reset_timeout) for url in urls]
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = deque(maxlen=500)
+        self.hedged = 0
+        self.failovers = 0
+
+    def hedge_delay(self):
+        if len(self.latencies) < 20:
+            return self.initial_hedge_delay
+        ordered = sorted(self.latencies)
+        delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+        return min(max(delay, self.min_hedge_delay), self.timeout)
+
+    def _pick(self, tried):
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in tried]
+        if not candidates:
+            return None
+        for endpoint in sorted(candidates, key=lambda e: e.score):
+            if endpoint.breaker.allow():
+                return endpoint
+        if not tried:
+            # Everything is open: probing the longest-open endpoint beats failing outright
+            return min(candidates, key=lambda e: e.breaker.opened_at)
+        return None
+
+    async def _attempt(self, endpoint, send, labels):
+        metrics = get_metrics()
+        host = get_transport().host(endpoint.url)
+        metrics.inc('cctp_rpc_attempts_total', host=host, **labels)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(send(endpoint.url), self.timeout)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the endpoint's health
+            raise
+        except Exception as e:
+            endpoint.record(time.monotonic() - started, ok=False)
+            metrics.inc('cctp_rpc_attempt_errors_total', host=host, kind=error_kind(e), **labels)
+            if isinstance(e, RPCHTTPError) and e.status == 429:
+                metrics.inc('cctp_rpc_rate_limited_total', **labels)
+            raise
+        latency = time.monotonic() - started
+        endpoint.record(latency, ok=True)
+        self.latencies.append(latency)
+        return result
+
+    async def request(self, send, labels=None):
+        """Run `send(url)` against the pool and return the first successful result."""
+        labels = labels or {'chain': self.chain, 'method': 'unknown'}
+        tried = set()
+        pending = {}
+        last_error = None
+        can_hedge = self.hedge
+
+        def start(endpoint):
+            tried.add(endpoint)
+            pending[asyncio.ensure_future(self._attempt(endpoint, send, labels))] = endpoint
+
+        try:
+            while True:
+                if not pending:
+                    endpoint = self._pick(tried)
+                    if endpoint is None:
+                        raise last_error or Exception("No RPC endpoints available")
+                    if tried:
+                        self.failovers += 1
+                        get_metrics().inc('cctp_rpc_retries_total', reason='failover', **labels)
+                    start(endpoint)
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay() if can_hedge and len(tried) < len(self.endpoints) else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    endpoint = self._pick(tried)
+                    if endpoint is None:
+                        # Nobody healthy left to hedge to; just wait for what is in flight
+                        can_hedge = False
+                    else:
+                        self.hedged += 1
+                        get_metrics().inc('cctp_rpc_retries_total', reason='hedge', **labels)
+                        start(endpoint)
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def post(self, session, body, headers=None, method=None):
+        # Without an explicit session each endpoint uses the shared per-host session
+        headers = headers or {'Content-Type': 'application/json'}
+        metrics = get_metrics()
+        labels = {'chain': self.chain, 'method': method or 'unknown'}
+
+        async def send(url):
+            async with (session or get_transport().session_for(url)).post(url, data=body, headers=headers) as response:
+                raw = await response.read()
+                metrics.inc('cctp_rpc_response_bytes_total', len(raw), **labels)
+                if response.status != 200:
+                    raise RPCHTTPError(url, response.status)
+                return json.loads(raw)
+
+        metrics.inc('cctp_rpc_requests_total', **labels)
+        metrics.inc('cctp_rpc_request_bytes_total', len(body), **labels)
+        metrics.add('cctp_rpc_in_flight', 1, **labels)
+        started = time.monotonic()
+        try:
+            result = await self.request(send, labels)
+        except Exception as e:
+            metrics.inc('cctp_rpc_errors_total', kind=error_kind(e), **labels)
+            raise
+        finally:
+            metrics.add('cctp_rpc_in_flight', -1, **labels)
+            metrics.observe('cctp_rpc_latency_seconds', time.monotonic() - started, **labels)
+
+        for item in result if isinstance(result, list) else [result]:
+            error = item.get('error') if isinstance(item, dict) else None
+            if error:
+                metrics.inc('cctp_rpc_errors_total', kind='rpc', **labels)
+                if is_rate_limit(error):
+                    metrics.inc('cctp_rpc_rate_limited_total', **labels)
+        return result
+
+    async def post_json(self, session, payload, headers=None):
+        if get_replay() is not None:
+            return get_replay().response(self.chain, payload)
+        method = payload.get('method') if isinstance(payload, dict) else 'batch'
+        response = await self.post(session, json.dumps(payload), headers, method)
+        if get_capture() is not None and isinstance(payload, dict):
+            get_capture().record(self.chain, method, payload.get('params'), response)
+        return response
+
+    def stats(self):
+        return {
+            'hedge_delay': self.hedge_delay(),
+            'hedged': self.hedged,
+            'failovers': self.failovers,
+            'endpoints': [endpoint.stats() for endpoint in self.endpoints]
+        }
+
+
+def error_kind(error):
+    if isinstance(error, RPCHTTPError):
+        return str(error.status)
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    return type(error).__name__
+
+def is_rate_limit(error):
+    if isinstance(error, dict) and error.get('code') == 429:
+        return True
+    return 'rate limit' in str(error).lower() or 'too many requests' in str(error).lower()
+
+
+# Pools are keyed by their URL list and options so health state survives across callers;
+# a caller asking for other options (e.g. a longer timeout) gets a pool of its own
+_pools = {}
+
+def get_pool(urls, **kwargs):
+    if isinstance(urls, ProviderPool):
+        return urls
+    url_list = (urls,) if isinstance(urls, str) else tuple(urls)
+    key = (url_list, tuple(sorted(kwargs.items())))
+    if key not in _pools:
+        _pools[key] = ProviderPool(list(url_list), **kwargs)
+    return _pools[key]
+
+async def post_json(session, urls, payload, headers=None):
+    """POST a JSON-RPC payload through the pool for `urls` (a URL, list of URLs or a pool).
+
+    `session` may be None to use the shared per-host sessions from common.transport.
+    """
+    return await get_pool(urls).post_json(session, payload, headers)
+
+
+class PooledAsyncHTTPProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider that sends every request through a ProviderPool."""
+
+    def __init__(self, urls, session=None, **pool_kwargs):
+        super().__init__()
+        self.pool = get_pool(urls, **pool_kwargs)
+        self.endpoint_uri = self.pool.endpoints[0].url
+        self._session = session
+
+    async def cache_async_session(self, session):
+        self._session = session
+        return session
+
+    async def _send(self, method, params):
+        return await self.pool.post(self._session, self.encode_rpc_request(method, params), method=method)
+
+    async def make_request(self, method, params):
+        if get_replay() is not None:
+            return {'jsonrpc': '2.0', 'result': get_replay().result(self.pool.chain, method, params)}
+        response = await self._read_through(method, params)
+        if get_capture() is not None:
+            get_capture().record(self.pool.chain, method, params, response)
+        return response
+
+    async def _read_through(self, method, params):
+        cache = get_response_cache()
+        if cache is None:
+            return await self._send(method, params)
+        chain = self.pool.chain
+        if method == 'eth_blockNumber':
+            response = await self._send(method, params)
+            cache.note_head(chain, response.get('result'))
+            return response
+        if not cache.caches(chain, method):
+            return await self._send(method, params)
+
+        # Read-through: finalized results come from disk, everything else from the pool
+        key = cache.key(chain, method, params)
+        result = cache.get(key)
+        if result is not MISSING:
+            get_metrics().inc('cctp_rpc_cache_hits_total', chain=chain, method=method)
+            return {'jsonrpc': '2.0', 'result': result}
+        response = await self._send(method, params)
+        block = result_block(method, params, response.get('result'))
+        if block is not None and await self._is_final(cache, chain, block):
+            cache.put(key, response['result'])
+        return response
+
+    async def _is_final(self, cache, chain, block):
+        head, age = cache.head(chain)
+        # The head only moves forward, so a stale one can still prove a block final
+        if not cache.is_final(chain, block, head) and (head is None or age > HEAD_TTL):
+            response = await self._send('eth_blockNumber', [])
+            head = cache.note_head(chain, response.get('result'))
+        return cache.is_final(chain, block, head)
@@ -0,0 +1,117 @@
+import copy
+import importlib.util
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# rpc_url may be a single URL or a list of URLs for the same chain.
+# Scan ranges are in the chain's native unit: blocks for EVM, slots for Solana,
+# milliseconds for Sui (its events are only addressable by time or cursor).
+# finality_depth: blocks below the head after which EVM results can't change any more and
+# may be served from the on-disk response cache (common/response_cache.py).
+# confirmations: default depth at which tail.py writes a row as confirmed.
+# ws_url (optional, EVM only): WebSocket endpoint for tail.py --ws, e.g. wss://eth-mainnet.g.alchemy.com/v2/<API_KEY>.
+CHAINS = {
+    'ethereum': {
+        'kind': 'evm', 'package': 'ethereum', 'domain': 0,
+        'rpc_url': 'https://eth-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 1000, 'chunk_size': 250, 'max_connections': 8, 'finality_depth': 64, 'confirmations': 12
+    },
+    'avalanche': {
+        'kind': 'evm', 'package': 'avalanche', 'domain': 1,
+        'rpc_url': 'https://avax-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 10000, 'chunk_size': 2000, 'max_connections': 8, 'finality_depth': 1, 'confirmations': 1
+    },
+    'optimism': {
+        'kind': 'evm', 'package': 'optimism', 'domain': 2,
+        'rpc_url': 'https://opt-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 1000, 'chunk_size': 500, 'max_connections': 8, 'finality_depth': 1800, 'confirmations': 10
+    },
+    'arbitrum': {
+        'kind': 'evm', 'package': 'arbitrum', 'domain': 3,
+        'rpc_url': 'https://arb-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 10000, 'chunk_size': 2000, 'max_connections': 8, 'finality_depth': 7200, 'confirmations': 20
+    },
+    'solana': {
+        'kind': 'solana', 'package': 'solana', 'domain': 5, 'directions': ['in'],
+        'rpc_url': 'https://solana-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 1000, 'chunk_size': 50, 'max_connections': 8
+    },
+    'base': {
+        'kind': 'evm', 'package': 'base', 'domain': 6,
+        'rpc_url': 'https://base-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 10000, 'chunk_size': 2000, 'max_connections': 8, 'finality_depth': 1800, 'confirmations': 10
+    },
+    'polygon': {
+        'kind': 'evm', 'package': 'polygon_pos', 'domain': 7,
+        'rpc_url': 'https://polygon-mainnet.g.alchemy.com/v2/<API_KEY>',
+        'lookback': 1000, 'chunk_size': 500, 'max_connections': 8, 'finality_depth': 256, 'confirmations': 32
+    },
+    'sui': {
+        'kind': 'sui', 'package': 'sui', 'domain': 8,
+        'rpc_url': 'https://fullnode.mainnet.sui.io:443',
+        'lookback': 3_600_000, 'chunk_size': 600_000, 'max_connections': 4
+    },
+}
+
+DEFAULT_DIRECTIONS = ['in', 'out']
+
+def load_registry(path=None):
+    """Built-in chain registry, optionally overlaid with a JSON file and CCTP_RPC_<CHAIN> / CCTP_WS_<CHAIN> env vars."""
+    registry = copy.deepcopy(CHAINS)
+    if path:
+        with open(path) as f:
+            for name, overrides in json.load(f).items():
+                registry.setdefault(name, {}).update(overrides)
+
+    for name, config in registry.items():
+        # Comma separated URLs become a provider pool with failover and hedging
+        url = os.environ.get(f"CCTP_RPC_{name.upper()}")
+        if url:
+            config['rpc_url'] = url.split(',') if ',' in url else url
+        ws_url = os.environ.get(f"CCTP_WS_{name.upper()}")
+        if ws_url:
+            config['ws_url'] = ws_url
+        config.setdefault('directions', list(DEFAULT_DIRECTIONS))
+    return registry
+
+def load_scanner_module(package, name):
+    """Import <package>/<name>.py by path.
+
+    Chain directories such as `solana` and `sui` are not real packages and would be
+    shadowed by the PyPI SDKs of the same name if imported normally.
+    """
+    module_name = f"cctp_{package}_{name}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_ROOT, package, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+_url_chains = None
+
+def chain_for_url(url):
+    """Chain name an RPC URL belongs to, for labelling; falls back to the URL's host.
+
+    Matches the registry's rpc_url(s) (including CCTP_RPC_<CHAIN> overrides), then a
+    trailing /<chain> path such as the stand-in's routes.
+    """
+    global _url_chains
+    if _url_chains is None:
+        _url_chains = {}
+        for name, config in load_registry().items():
+            urls = config.get('rpc_url')
+            for candidate in urls if isinstance(urls, list) else [urls]:
+                if candidate:
+                    _url_chains.setdefault(candidate.rstrip('/'), name)
+    url = url.rstrip('/')
+    if url in _url_chains:
+        return _url_chains[url]
+    parts = urlsplit(url)
+    last = parts.path.rsplit('/', 1)[-1]
+    return last if last in CHAINS else parts.netloc
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+# Block hashes kept per chain: one per head poll, so the window spans this many polls
+DEFAULT_WINDOW = 128
+
+
+class ReorgDetected(Exception):
+    def __init__(self, chain, fork_block):
+        super().__init__(f"{chain} reorganized from block {fork_block}")
+        self.chain = chain
+        self.fork_block = fork_block
+
+
+class BlockWindow:
+    """Rolling window of recently seen (block number -> hash) for one chain.
+
+    Each check looks at one new block: the one right after the newest block in the window
+    (or, when the head went backwards, the head itself). If its parent hash does not match
+    the hash recorded for its parent, or its own hash changed, the chain reorganized; the
+    fork is then found by re-reading the recorded blocks newest first until one still
+    matches. A matching hash vouches for every block before it, so one block per check
+    is enough.
+    """
+
+    def __init__(self, chain, size=DEFAULT_WINDOW, blocks=None):
+        self.chain = chain
+        self.size = size
+        self.blocks = OrderedDict((int(number), block_hash) for number, block_hash in (blocks or []))
+        self.reorgs = 0
+
+    @property
+    def newest(self):
+        return next(reversed(self.blocks)) if self.blocks else None
+
+    @property
+    def oldest(self):
+        return next(iter(self.blocks)) if self.blocks else None
+
+    def add(self, number, block_hash):
+        self.blocks[number] = _hex(block_hash)
+        self.blocks.move_to_end(number)
+        while len(self.blocks) > self.size:
+            self.blocks.popitem(last=False)
+
+    def drop_from(self, number):
+        for stale in [n for n in self.blocks if n >= number]:
+            del self.blocks[stale]
+
+    def items(self):
+        return [[number, block_hash] for number, block_hash in self.blocks.items()]
+
+    async def check(self, w3, head_block):
+        """Record `head_block` (a full block header); raise ReorgDetected when the chain changed
+        under the window. The window is left trimmed to the blocks below the fork."""
+        newest = self.newest
+        if newest is None:
+            self.add(head_block['number'], head_block['hash'])
+            return
+        probe = head_block if head_block['number'] <= newest + 1 else await w3.eth.get_block(newest + 1)
+
+        number = probe['number']
+        mismatch = (number in self.blocks and self.blocks[number] != _hex(probe['hash'])) or \
+            (number - 1 in self.blocks and self.blocks[number - 1] != _hex(probe['parentHash']))
+        if mismatch:
+            fork_block = await self.find_fork(w3)
+            self.drop_from(fork_block)
+            self.reorgs += 1
+            raise ReorgDetected(self.chain, fork_block)
+        if number > newest:
+            self.add(number, probe['hash'])
+        if head_block['number'] > number:
+            self.add(head_block['number'], head_block['hash'])
+
+    async def find_fork(self, w3):
+        """First block that is no longer canonical: the block after the newest recorded one that
+        still matches (blocks between two recorded ones are assumed changed)."""
+        for number in reversed(list(self.blocks)):
+            block = await w3.eth.get_block(number)
+            if block is not None and _hex(block['hash']) == self.blocks[number]:
+                return number + 1
+        print(f"Reorg on {self.chain} is deeper than the block window (from before block {self.oldest})")
+        return self.oldest
+
+
+def _hex(value):
+    return '0x' + bytes(value).hex() if isinstance(value, (bytes, bytearray)) else value.lower()
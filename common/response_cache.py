@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from common.registry import CHAINS
+
+# Methods whose answer never changes once the block it comes from is final
+CACHEABLE_METHODS = {
+    'eth_getBlockByNumber', 'eth_getBlockByHash', 'eth_getTransactionByHash',
+    'eth_getTransactionReceipt', 'eth_getLogs'
+}
+DEFAULT_MAX_MB = 1024
+# A head older than this is refreshed before deciding a result is not final yet
+HEAD_TTL = 30.0
+
+MISSING = object()
+
+
+def _hex_int(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith('0x'):
+        return int(value, 16)
+    return None  # block tags ('latest', 'safe', ...) move
+
+
+def _jsonable(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '0x' + bytes(value).hex()
+    raise TypeError(f"can't key an RPC param of type {type(value).__name__}")
+
+
+def result_block(method, params, result):
+    """Newest block a result depends on, or None when it can't be cached at all."""
+    if result is None:
+        return None  # unknown or not yet mined
+    if method == 'eth_getBlockByNumber':
+        return _hex_int(params[0])
+    if method == 'eth_getLogs':
+        query = params[0]
+        if 'blockHash' in query:
+            return max((_hex_int(log['blockNumber']) for log in result), default=None)
+        return _hex_int(query.get('toBlock', 'latest'))
+    if method == 'eth_getBlockByHash':
+        return _hex_int(result.get('number'))
+    return _hex_int(result.get('blockNumber'))
+
+
+class ResponseCache:
+    """On-disk JSON-RPC result cache for EVM data below each chain's finality depth.
+
+    Entries are addressed by a blake2b hash of (chain, method, params) and stored as
+    zlib-compressed compact JSON under path/ab/cdef..., one file per result, written through
+    a temporary file so concurrent processes (backfill shards) can share a directory. Reads
+    touch the file's mtime; once the directory outgrows `max_bytes` the least recently
+    used entries are deleted down to 90% of it.
+
+    Only results whose block is at least `finality_depth` (per chain, see the registry)
+    below the chain head are stored; the head comes from the eth_blockNumber calls the
+    provider sees, refreshed when older than HEAD_TTL.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, depths=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.depths = depths or {name: config.get('finality_depth') for name, config in CHAINS.items()}
+        self.heads = {}
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(path, exist_ok=True)
+
+    def caches(self, chain, method):
+        return method in CACHEABLE_METHODS and self.depths.get(chain) is not None
+
+    def key(self, chain, method, params):
+        material = json.dumps([chain, method, params], sort_keys=True, separators=(',', ':'), default=_jsonable)
+        return hashlib.blake2b(material.encode(), digest_size=20).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def get(self, key):
+        file = self._file(key)
+        try:
+            with open(file, 'rb') as f:
+                result = json.loads(zlib.decompress(f.read()))
+            os.utime(file)
+        except (OSError, ValueError, zlib.error):
+            # Not cached, or evicted by another process mid-read
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        file = self._file(key)
+        data = zlib.compress(json.dumps(result, separators=(',', ':')).encode())
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmp = f"{file}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, file)
+        self.stores += 1
+        if self.size is None:
+            self.size = sum(size for _, _, size in self._entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue  # another process is writing it
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        # Re-measured from disk: other processes writing to the same directory count too
+        self.size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for file, _, size in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+    def note_head(self, chain, block):
+        block = _hex_int(block)
+        if block is not None and block >= self.heads.get(chain, (-1, 0))[0]:
+            self.heads[chain] = (block, time.monotonic())
+        return block
+
+    def head(self, chain):
+        """(head block, seconds since it was seen), or (None, None) before the first eth_blockNumber."""
+        block, seen = self.heads.get(chain, (None, None))
+        return block, None if seen is None else time.monotonic() - seen
+
+    def is_final(self, chain, block, head):
+        return head is not None and block <= head - self.depths[chain]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'bytes': self.size
+        }
+
+
+_cache = None
+
+
+def get_response_cache():
+    return _cache
+
+
+def enable_response_cache(path, max_mb=None, registry=None):
+    """Turn the cache on for this process and, through the environment, its child processes.
+
+    `registry` (see load_registry) supplies the finality depths; the built-in ones otherwise.
+    """
+    global _cache
+    max_mb = max_mb or DEFAULT_MAX_MB
+    os.environ['CCTP_RPC_CACHE'] = path
+    os.environ['CCTP_RPC_CACHE_MB'] = str(max_mb)
+    depths = {name: config.get('finality_depth') for name, config in registry.items()} if registry else None
+    _cache = ResponseCache(path, int(max_mb * 1024 * 1024), depths)
+    return _cache
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--rpc-cache', metavar='DIR', help='serve finalized EVM blocks, transactions, receipts and logs from this on-disk cache')
+    parser.add_argument('--rpc-cache-mb', type=float, default=DEFAULT_MAX_MB, help='size cap of the RPC cache directory')
+
+
+# CCTP_RPC_CACHE=<dir> (and optionally CCTP_RPC_CACHE_MB) turns the cache on for any entry point
+if os.environ.get('CCTP_RPC_CACHE'):
+    enable_response_cache(os.environ['CCTP_RPC_CACHE'], float(os.environ.get('CCTP_RPC_CACHE_MB') or DEFAULT_MAX_MB))
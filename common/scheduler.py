@@ -0,0 +1,50 @@
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+
+class FairScheduler:
+    """Hands out a fixed number of work slots in strict FIFO order.
+
+    Scanners take one slot per chunk and queue again at the back afterwards, so
+    slots rotate round-robin across chains and a slow chain only ever holds its own
+    share instead of starving the others.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.active = 0
+        self.granted = Counter()
+        self._waiters = deque()
+
+    async def acquire(self):
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before we were cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Pass the slot straight to the next waiter; `active` stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, name):
+        await self.acquire()
+        self.granted[name] += 1
+        try:
+            yield
+        finally:
+            self.release()
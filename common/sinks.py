@@ -0,0 +1,132 @@
+import csv
+import heapq
+import json
+import os
+import tempfile
+
+from common.tracing import span
+
+
+class CSVSink:
+    """Writes rows to a CSV file as they are produced instead of at the end of a run."""
+
+    def __init__(self, path, fieldnames, append=False):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.rows_written = 0
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, 'a' if append else 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        if write_header:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, row):
+        with span('csv_write'):
+            if not isinstance(row, dict):
+                row = dict(zip(self.fieldnames, row))
+            self._writer.writerow(row)
+            self._file.flush()
+        self.rows_written += 1
+
+    def tell(self):
+        return self._file.tell()
+
+    def truncate(self, offset):
+        """Drop every row written after `offset` (a value of tell())."""
+        self._file.flush()
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ExternalSorter:
+    """Sorts an unbounded stream of dict rows with bounded memory.
+
+    Rows are buffered up to `run_size`, sorted and spilled to a temporary JSON-lines
+    run file; iterating the sorter k-way merges the runs with heapq.merge.
+    """
+
+    def __init__(self, key, run_size=10000, tmp_dir=None):
+        self.key = key
+        self.run_size = run_size
+        self.tmp_dir = tmp_dir
+        self._buffer = []
+        self._runs = []
+
+    def add(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort(key=self.key)
+        fd, path = tempfile.mkstemp(prefix='cctp_run_', suffix='.jsonl', dir=self.tmp_dir)
+        with os.fdopen(fd, 'w') as f:
+            for row in self._buffer:
+                f.write(json.dumps(row) + '\n')
+        self._runs.append(path)
+        self._buffer = []
+
+    def _read_run(self, path):
+        with open(path) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __iter__(self):
+        self._spill()
+        try:
+            yield from heapq.merge(*(self._read_run(path) for path in self._runs), key=self.key)
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        for path in self._runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self._runs = []
+
+
+class JSONLSink:
+    """Append-only JSON-lines sink that any number of scanners can write tagged rows into."""
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, 'a' if append else 'w')
+
+    def write(self, row):
+        with span('jsonl_write'):
+            self._file.write(json.dumps(row, default=str) + '\n')
+            self._file.flush()
+        self.rows_written += 1
+
+    def tell(self):
+        return self._file.tell()
+
+    def truncate(self, offset):
+        """Drop every row written after `offset` (a value of tell())."""
+        self._file.flush()
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
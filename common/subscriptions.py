@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+import json
+from abc import ABC, abstractmethod
+
+import aiohttp
+from web3._utils.method_formatters import log_entry_formatter
+
+from common.transport import get_transport
+
+# Seconds before the first reconnect; doubled per failed attempt up to MAX_RECONNECT_DELAY
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30.0
+
+
+class SubscriptionError(Exception):
+    pass
+
+
+class Subscription(ABC):
+    """One JSON-RPC pub/sub subscription over a WebSocket that survives disconnects.
+
+    The socket is reconnected with backoff and the subscription made again whenever it
+    drops; `subscribed()` runs after every (re)subscription so subclasses can fill what
+    was missed in between. Notifications end up in `queue` through `received()`.
+    """
+
+    method = None
+    notification = None
+
+    def __init__(self, ws_url, name=None):
+        self.ws_url = ws_url
+        self.name = name
+        self.queue = asyncio.Queue()
+        self.notifications = 0
+        self.reconnects = 0
+        self._ids = itertools.count(1)
+        self._task = None
+
+    @abstractmethod
+    def params(self):
+        pass
+
+    async def subscribed(self):
+        pass
+
+    def received(self, result):
+        self.queue.put_nowait(result)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _subscribe(self, ws):
+        request_id = next(self._ids)
+        await ws.send_str(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': self.method, 'params': self.params()}))
+        while True:
+            message = await ws.receive_json()
+            if message.get('id') == request_id:
+                if 'error' in message:
+                    raise SubscriptionError(f"{self.method} failed: {message['error']}")
+                return message['result']
+
+    async def _run(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                session = get_transport().session_for(self.ws_url)
+                async with session.ws_connect(self.ws_url, heartbeat=30.0) as ws:
+                    subscription = await self._subscribe(ws)
+                    await self.subscribed()
+                    delay = RECONNECT_DELAY
+                    async for message in ws:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        payload = json.loads(message.data)
+                        params = payload.get('params') or {}
+                        if payload.get('method') == self.notification and params.get('subscription') == subscription:
+                            self.notifications += 1
+                            self.received(params['result'])
+                raise SubscriptionError('WebSocket closed')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                print(f"{self.method} subscription{f' on {self.name}' if self.name else ''} dropped "
+                      f"({str(e) or type(e).__name__}), reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def stats(self):
+        return {'notifications': self.notifications, 'reconnects': self.reconnects}
+
+
+class LogSubscription(Subscription):
+    """Pushes the logs of one contract event as they are mined, over eth_subscribe('logs').
+
+    `logs()` yields web3-formatted logs (the same shape get_logs returns) in arrival order.
+    Every (re)subscription is followed by a get_logs backfill from the last block delivered
+    (from `start_block` on the first one) to the head, so nothing mined while the socket
+    was down is lost. Logs are deduplicated by (transaction, log index); `rewind(block)`
+    forgets everything from `block` on and backfills it again (after a reorg rollback).
+    Logs the node flags `removed` are passed through for the consumer to handle.
+    """
+
+    method = 'eth_subscribe'
+    notification = 'eth_subscription'
+
+    def __init__(self, ws_url, w3, address, topics, start_block=None, chunk_size=2000, chain=None):
+        super().__init__(ws_url, chain)
+        self.w3 = w3
+        self.address = address
+        self.topics = topics
+        self.next_block = start_block
+        self.chunk_size = chunk_size
+        self.seen = {}
+        self.backfilled = 0
+
+    def params(self):
+        return ['logs', {'address': self.address, 'topics': self.topics}]
+
+    async def subscribed(self):
+        if self.next_block is not None:
+            await self.backfill(self.next_block)
+
+    def received(self, result):
+        self._deliver(log_entry_formatter(result))
+
+    async def logs(self):
+        self.start()
+        while True:
+            yield await self.queue.get()
+
+    def _deliver(self, log):
+        key = (bytes(log['transactionHash']), log['logIndex'])
+        if log.get('removed'):
+            self.seen.pop(key, None)
+        elif key in self.seen:
+            return
+        else:
+            self.seen[key] = log['blockNumber']
+            self.next_block = max(self.next_block or 0, log['blockNumber'])
+        self.queue.put_nowait(log)
+
+    async def backfill(self, from_block):
+        head = await self.w3.eth.block_number
+        for chunk_start in range(from_block, head + 1, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size - 1, head)
+            logs = await self.w3.eth.get_logs({
+                'address': self.address, 'fromBlock': chunk_start, 'toBlock': chunk_end, 'topics': self.topics
+            })
+            for log in logs:
+                self.backfilled += 1
+                self._deliver(log)
+        # The last block may have more logs still on their way over the socket: keep it open
+        self.next_block = max(self.next_block or 0, head)
+
+    def forget(self, below):
+        """Stop tracking logs of blocks below `below` (already handled for good)."""
+        for key in [key for key, block in self.seen.items() if block < below]:
+            del self.seen[key]
+
+    async def rewind(self, from_block):
+        for key in [key for key, block in self.seen.items() if block >= from_block]:
+            del self.seen[key]
+        await self.backfill(from_block)
+
+    def stats(self):
+        return {**super().stats(), 'backfilled': self.backfilled}
+
+
+# Put in a SuiEventSubscription's queue after every (re)subscription
+SUBSCRIBED = object()
+
+
+class SuiEventSubscription(Subscription):
+    """Pushes Sui events matching `event_filter` as they are emitted, over suix_subscribeEvent.
+
+    `events()` yields the events (the same shape suix_queryEvents pages hold) and SUBSCRIBED
+    after every (re)subscription; a consumer catches up with suix_queryEvents from its
+    cursor at that point, since events emitted while the socket was down are not replayed.
+    """
+
+    method = 'suix_subscribeEvent'
+    notification = 'suix_subscribeEvent'
+
+    def __init__(self, ws_url, event_filter, name='sui'):
+        super().__init__(ws_url, name)
+        self.event_filter = event_filter
+
+    def params(self):
+        return [self.event_filter]
+
+    async def subscribed(self):
+        self.queue.put_nowait(SUBSCRIBED)
+
+    async def events(self):
+        self.start()
+        while True:
+            yield await self.queue.get()
@@ -0,0 +1,208 @@
+import asyncio
+import time
+
+from common.cursors import load_cursor, save_cursor
+from common.reorg import DEFAULT_WINDOW, BlockWindow, ReorgDetected
+
+CONFIRMED = 'confirmed'
+PROVISIONAL = 'provisional'
+
+
+class Tail:
+    """Follows the head of one EVM chain with one scanner (transfers_in or transfers_out).
+
+    Every `interval` seconds the head is polled and only the new blocks are scanned with
+    get_logs. Rows are written with status 'confirmed' once their block is `confirmations`
+    deep; with `provisional`, rows of the newer blocks are written right away with status
+    'provisional' and written again as 'confirmed' when their block gets deep enough (so a
+    consumer keys them by nonce and keeps the latest).
+
+    With a `subscription` (a LogSubscription for the scanner's event), provisional rows are
+    written as the node pushes their logs instead of by get_logs on every poll; polls still
+    move the confirmed rows forward.
+
+    With a `reorg_window`, the hashes of the polled heads are kept (see BlockWindow) and
+    every scan is journaled with the sink offset it started at. When the chain reorganizes,
+    every scan that reached the fork block is cut off the output, the cursor is moved back
+    to the first block they covered and the range is scanned again on the same poll.
+
+    The cursor file holds the confirmed progress, the output offset, the block window and
+    the journal, so a restart drops rows written after the last save and resumes there.
+    """
+
+    def __init__(self, module, direction, w3, sink, confirmations, interval=2.0, provisional=False,
+                 chunk_size=2000, cursor_file=None, plan=None, cache=None, chain=None, reorg_window=DEFAULT_WINDOW,
+                 subscription=None):
+        self.module = module
+        self.direction = direction
+        self.w3 = w3
+        self.sink = sink
+        self.confirmations = confirmations
+        self.interval = interval
+        self.provisional = provisional
+        self.chunk_size = chunk_size
+        self.cursor_file = cursor_file
+        self.plan = plan or module.DEFAULT_PLAN
+        self.cache = cache
+        self.iter_rows = module.iter_cctp_transfers_in if direction == 'in' else module.iter_cctp_transfers
+        self.subscription = subscription
+        self.window = BlockWindow(chain, reorg_window) if reorg_window else None
+        # [sink offset, first block, last block, status] of every scan the window can still undo
+        self.journal = []
+        self.next_block = None
+        self.provisional_through = None
+        self.rows = {CONFIRMED: 0, PROVISIONAL: 0}
+        self.rolled_back = 0
+        self.polls = 0
+
+    @property
+    def header(self):
+        return self.plan.columns + ['status']
+
+    async def start(self, start_block=None):
+        """Resume from the cursor, else `start_block`, else the current head (new transfers only)."""
+        cursor = load_cursor(self.cursor_file)
+        if cursor is not None:
+            self.next_block = cursor['next_block']
+            self.provisional_through = cursor.get('provisional_through', self.next_block - 1)
+            if 'offset' in cursor:
+                # Rows written after the last save are written again from the cursor
+                self.sink.truncate(cursor['offset'])
+            self.journal = cursor.get('journal', [])
+            if self.window is not None:
+                self.window = BlockWindow(self.window.chain, self.window.size, cursor.get('blocks'))
+            return
+        if start_block is not None:
+            self.next_block = start_block
+        else:
+            self.next_block = await self.w3.eth.block_number - self.confirmations + 1
+        self.provisional_through = self.next_block - 1
+        if self.window is not None and self.next_block > 0:
+            # Anchor the window right below the first scanned block, so a reorg anywhere in
+            # the scanned range is found
+            anchor = await self.w3.eth.get_block(self.next_block - 1)
+            self.window.add(anchor['number'], anchor['hash'])
+
+    def save(self):
+        if not self.cursor_file:
+            return
+        cursor = {'next_block': self.next_block, 'provisional_through': self.provisional_through, 'offset': self.sink.tell()}
+        if self.window is not None:
+            cursor['blocks'] = self.window.items()
+            cursor['journal'] = self.journal
+        save_cursor(self.cursor_file, cursor)
+
+    async def _scan(self, start, end, status):
+        for chunk_start in range(start, end + 1, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size - 1, end)
+            offset = self.sink.tell()
+            async for row in self.iter_rows(chunk_start, chunk_end, self.w3, self.cache, self.plan):
+                self.sink.write(dict(zip(self.header, list(row) + [status])))
+                self.rows[status] += 1
+            if self.window is not None:
+                self.journal.append([offset, chunk_start, chunk_end, status])
+            if status == CONFIRMED:
+                self.next_block = chunk_end + 1
+            else:
+                self.provisional_through = chunk_end
+            self.save()
+        if status == CONFIRMED and self.subscription is not None:
+            self.subscription.forget(self.next_block)
+
+    async def _consume(self):
+        """Write a provisional row per pushed log of a block the confirmed scans have not reached."""
+        async for log in self.subscription.logs():
+            block = log['blockNumber']
+            # Removed logs are undone by the reorg check, which rolls back whole blocks
+            if log.get('removed') or block < self.next_block:
+                continue
+            rolled_back = self.rolled_back
+            try:
+                row = await self.module.process_log(log, self.w3, self.cache, plan=self.plan)
+            except Exception as e:
+                print(f"Error processing log: {str(e)}")
+                continue
+            if self.rolled_back != rolled_back:
+                continue  # the block may be gone; the rewind delivers it again if not
+            offset = self.sink.tell()
+            self.sink.write(dict(zip(self.header, list(row) + [PROVISIONAL])))
+            self.rows[PROVISIONAL] += 1
+            if self.window is not None:
+                self.journal.append([offset, block, block, PROVISIONAL])
+            # Other logs of this block may still be on their way
+            self.provisional_through = max(self.provisional_through, block - 1)
+            self.save()
+
+    def roll_back(self, fork_block):
+        """Cut every journaled scan that reached `fork_block` off the output and rewind to rescan it."""
+        # Pushed rows can land while a scan runs, so the journal is not in offset order
+        cut = min((offset for offset, _, end, _ in self.journal if end >= fork_block), default=None)
+        if cut is not None:
+            removed = [entry for entry in self.journal if entry[0] >= cut]
+            self.journal = [entry for entry in self.journal if entry[0] < cut]
+            self.sink.truncate(cut)
+            for _, start, _, status in removed:
+                if status == CONFIRMED:
+                    self.next_block = min(self.next_block, start)
+                else:
+                    self.provisional_through = min(self.provisional_through, start - 1)
+        self.next_block = min(self.next_block, fork_block)
+        self.provisional_through = min(self.provisional_through, fork_block - 1)
+        self.rolled_back += 1
+        self.save()
+        print(f"Reorg from block {fork_block}: output rolled back, rescanning from block {self.next_block}")
+
+    def _prune_journal(self):
+        # Scans below the window can't be undone any more
+        oldest = self.window.oldest
+        while self.journal and oldest is not None and self.journal[0][2] < oldest:
+            self.journal.pop(0)
+
+    async def _head(self):
+        if self.window is None:
+            return await self.w3.eth.block_number
+        head_block = await self.w3.eth.get_block('latest')
+        try:
+            await self.window.check(self.w3, head_block)
+        except ReorgDetected as e:
+            self.roll_back(e.fork_block)
+            if self.subscription is not None:
+                await self.subscription.rewind(self.provisional_through + 1)
+            await self.window.check(self.w3, head_block)
+        self._prune_journal()
+        return head_block['number']
+
+    async def poll(self):
+        """Scan what became confirmed (and, with provisional rows, what is new) since the last poll."""
+        head = await self._head()
+        self.polls += 1
+        confirmed_end = head - self.confirmations
+        if confirmed_end >= self.next_block:
+            await self._scan(self.next_block, confirmed_end, CONFIRMED)
+        if self.provisional and self.subscription is None:
+            start = max(self.next_block, self.provisional_through + 1)
+            if head >= start:
+                await self._scan(start, head, PROVISIONAL)
+        return head
+
+    async def run(self, start_block=None, duration=None):
+        """Poll until cancelled (or for `duration` seconds)."""
+        await self.start(start_block)
+        consumer = None
+        if self.subscription is not None:
+            self.subscription.next_block = max(self.next_block, self.provisional_through + 1)
+            consumer = asyncio.ensure_future(self._consume())
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    await self.poll()
+                except Exception as e:
+                    # A failed poll is retried on the next tick from the same block
+                    print(f"Tail poll failed: {str(e)}")
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            if consumer is not None:
+                consumer.cancel()
+                await self.subscription.close()
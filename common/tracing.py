@@ -0,0 +1,166 @@
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class _NullSpan:
+    """What span() hands out while tracing is off: entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ('tracer', 'stage', 'chain', 'args', 'started')
+
+    def __init__(self, tracer, stage, chain, args):
+        self.tracer = tracer
+        self.stage = stage
+        self.chain = chain
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+class Tracer:
+    """Collects pipeline stage spans for a per-stage breakdown and a Chrome trace file.
+
+    Spans with a `tx` argument (a tx hash, signature or Sui digest) are written as async
+    events keyed by it, so every stage of one transfer lands on the same track in
+    chrome://tracing or Perfetto; the rest go on one track per asyncio task. Only the
+    first `max_events` spans are kept for the file, the breakdown counts all of them.
+    """
+
+    def __init__(self, path=None, max_events=1_000_000):
+        self.enabled = False
+        self.path = path
+        self.max_events = max_events
+        self.origin = time.perf_counter()
+        # (chain, stage) -> [count, seconds, errors, max seconds]
+        self.totals = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        self.events = []
+        self.dropped = 0
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, chain=None, **args):
+        return Span(self, stage, chain, args) if self.enabled else NULL_SPAN
+
+    def _track(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        if key not in self._tracks:
+            self._tracks[key] = (len(self._tracks) + 1, task.get_name() if task is not None else threading.current_thread().name)
+        return self._tracks[key][0]
+
+    def record(self, span, duration, failed):
+        with self._lock:
+            totals = self.totals[(span.chain, span.stage)]
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] += failed
+            totals[3] = max(totals[3], duration)
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            args = dict(span.args, error=True) if failed else span.args
+            self.events.append((span.stage, span.chain, span.started, duration, self._track(), args))
+
+    def breakdown(self):
+        total = sum(seconds for _, seconds, _, _ in self.totals.values()) or 1.0
+        rows = [
+            {'chain': chain, 'stage': stage, 'count': count, 'seconds': seconds, 'errors': errors,
+             'mean_ms': seconds / count * 1000, 'max_ms': longest * 1000, 'share': seconds / total}
+            for (chain, stage), (count, seconds, errors, longest) in self.totals.items()
+        ]
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+    def print_breakdown(self):
+        rows = self.breakdown()
+        if not rows:
+            return
+        print("\nTime per stage (summed over concurrent tasks):")
+        for row in rows:
+            print(f"  {row['chain'] or '-':<10} {row['stage']:<24} {row['count']:>8}x {row['seconds']:>9.2f}s "
+                  f"{row['share'] * 100:>5.1f}%  mean {row['mean_ms']:.1f}ms  max {row['max_ms']:.1f}ms"
+                  + (f"  {row['errors']} errors" if row['errors'] else ''))
+        if self.dropped:
+            print(f"  ({self.dropped} spans past the first {self.max_events} are only in the totals)")
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in self._tracks.values()]
+        for stage, chain, started, duration, tid, args in self.events:
+            ts = (started - self.origin) * 1e6
+            event = {'name': stage, 'cat': chain or 'cctp', 'pid': pid, 'args': args}
+            if 'tx' in args:
+                tx = args['tx'].hex() if isinstance(args['tx'], bytes) else str(args['tx'])
+                trace.append({**event, 'ph': 'b', 'id': tx, 'ts': ts})
+                trace.append({**event, 'ph': 'e', 'id': tx, 'ts': ts + duration * 1e6, 'args': {}})
+            else:
+                trace.append({**event, 'ph': 'X', 'tid': tid, 'ts': ts, 'dur': duration * 1e6})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def write(self, path=None):
+        path = (path or self.path).replace('{pid}', str(os.getpid()))
+        with open(path, 'w') as f:
+            # HexBytes and other bytes arguments are only converted here, never on the hot path
+            json.dump(self.chrome_trace(), f, default=lambda value: value.hex() if isinstance(value, bytes) else str(value))
+        print(f"Trace with {len(self.events)} spans written to {path}")
+
+    def finish(self):
+        """Print the breakdown and write the trace file, if tracing was on."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.print_breakdown()
+        if self.path:
+            self.write()
+
+
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def span(stage, chain=None, **args):
+    """Context manager timing one pipeline stage; free when tracing is off."""
+    return _tracer.span(stage, chain, **args) if _tracer.enabled else NULL_SPAN
+
+def enable_tracing(path=None, at_exit=False):
+    """Start recording spans; `path` gets a Chrome trace JSON ('{pid}' is replaced by the process id)."""
+    _tracer.enabled = True
+    _tracer.path = path or _tracer.path
+    if at_exit:
+        atexit.register(_tracer.finish)
+    return _tracer
+
+# CCTP_TRACE=<file> turns tracing on for any entry point; results are written when the process exits
+if os.environ.get('CCTP_TRACE'):
+    enable_tracing(os.environ['CCTP_TRACE'], at_exit=True)
@@ -0,0 +1,115 @@
+import asyncio
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+class Transport:
+    """One keep-alive, connection-pooled aiohttp session per RPC host.
+
+    Every provider talking to the same host shares its sockets, so a TCP+TLS handshake
+    is only paid when the pool grows or an idle connection expires. Sessions are bound
+    to the event loop that created them; a new loop (e.g. a backfill worker's
+    asyncio.run) transparently gets fresh ones, and the old loop's are closed.
+    """
+
+    def __init__(self, limit_per_host=16, keepalive_timeout=30.0, ttl_dns_cache=300, host_limits=None):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.host_limits = dict(host_limits or {})
+        self._sessions = {}
+        self._stats = defaultdict(Counter)
+
+    @staticmethod
+    def host(url):
+        return urlsplit(url).netloc
+
+    def set_host_limit(self, url, limit):
+        # Accepts a URL or bare host; only affects sessions created afterwards.
+        # Chains served by the same host (e.g. one local node) get the largest limit asked for.
+        host = self.host(url) if '://' in url else url
+        self.host_limits[host] = max(limit, self.host_limits.get(host, 0))
+
+    def _trace_config(self, host):
+        stats = self._stats[host]
+        trace = aiohttp.TraceConfig()
+
+        async def count(name):
+            stats[name] += 1
+
+        trace.on_request_start.append(lambda *_: count('requests'))
+        trace.on_request_exception.append(lambda *_: count('request_errors'))
+        trace.on_connection_create_end.append(lambda *_: count('connections_created'))
+        trace.on_connection_reuseconn.append(lambda *_: count('connections_reused'))
+        trace.on_connection_queued_start.append(lambda *_: count('queued'))
+        trace.on_dns_resolvehost_end.append(lambda *_: count('dns_lookups'))
+        trace.on_dns_cache_hit.append(lambda *_: count('dns_cache_hits'))
+        return trace
+
+    def session_for(self, url):
+        host = self.host(url)
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(host)
+        if entry is not None and entry[0] is loop and not entry[1].closed:
+            return entry[1]
+        if entry is not None and not entry[1].closed:
+            self._close_stale(*entry)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.host_limits.get(host, self.limit_per_host),
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.ttl_dns_cache
+        )
+        session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config(host)])
+        self._sessions[host] = (loop, session)
+        return session
+
+    @staticmethod
+    def _close_stale(loop, session):
+        # A session left behind by another event loop (e.g. an earlier asyncio.run) can't be
+        # awaited from this one: hand the close to its loop while that still runs, otherwise
+        # close the connector synchronously so its pooled sockets are released with it
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        elif session.connector is not None:
+            session.connector._close()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        for host, (session_loop, session) in list(self._sessions.items()):
+            if session_loop is loop:
+                await session.close()
+                del self._sessions[host]
+
+    def stats(self):
+        hosts = {}
+        for host, counters in self._stats.items():
+            entry = self._sessions.get(host)
+            hosts[host] = {
+                'limit': self.host_limits.get(host, self.limit_per_host),
+                'open': entry is not None and not entry[1].closed,
+                **counters
+            }
+        return hosts
+
+
+_transport = None
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = Transport()
+    return _transport
+
+def configure_transport(**kwargs):
+    """Replace the shared transport's settings; call before any request goes out."""
+    global _transport
+    _transport = Transport(**kwargs)
+    return _transport
+
+async def close_transport():
+    if _transport is not None:
+        await _transport.close()
@@ -1,16 +1,31 @@
 import asyncio
+import os
+import sys
 from web3 import AsyncWeb3
 from web3.middleware import async_geth_poa_middleware
 from datetime import datetime
-import csv
 
-def setup_web3_provider(url):
-    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.addresses import checksum_address
+from common.caches import LRUCache
+from common.message import parse_burn_message, parse_message_received
+from common.planner import plan_columns
+from common.profiling import profile_flag, profiling
+from common.providers import PooledAsyncHTTPProvider
+from common.sinks import CSVSink
+from common.tracing import span
+from common.transport import close_transport
+
+def setup_web3_provider(urls):
+    # `urls` may be a single endpoint or a list to fail over / hedge between
+    w3 = AsyncWeb3(PooledAsyncHTTPProvider(urls))
     w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
     return w3
 
 w3_eth = setup_web3_provider('https://eth-mainnet.g.alchemy.com/v2/<API_KEY>')
 
+CHAIN = 'ethereum'
 MESSAGE_TRANSMITTER = AsyncWeb3.to_checksum_address('0x0a992d191deec32afe36203ad87d7d289a738f81')
 MESSAGE_RECEIVED_EVENT = '0x58200b4c34ae05ee816d710053fff3fb75af4395915d3d2a771b24aa10e3cc5d'
 USDC_ADDRESS = AsyncWeb3.to_checksum_address('0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48')  # USDC on Ethereum
@@ -21,99 +36,138 @@ DOMAIN_TO_CHAIN = {
     4: 'noble', 5: 'solana', 6: 'base', 7: 'polygon', 8: 'sui'
 }
 
+CSV_HEADER = [
+    'block_number',
+    'transaction_hash',
+    'timestamp',
+    'caller',
+    'source_chain',
+    'nonce',
+    'sender',
+    'recipient',
+    'complexity',
+    'amount'
+]
+
+# RPC sources each column needs beyond the MessageReceived log (see common/planner.py)
+COLUMN_SOURCES = {
+    'timestamp': ['block'],
+    'complexity': ['receipt'],
+}
+
+def make_plan(columns=None, sources=()):
+    # complexity is only paid for when asked for by name, or with sources=['receipt']
+    return plan_columns(CSV_HEADER, COLUMN_SOURCES, columns, optional=['complexity'], sources=sources)
+
+DEFAULT_PLAN = make_plan()
+
+# Block timestamps keyed by (chain, block_number); the orchestrator passes in a cache shared by all scanners
+block_cache = LRUCache(10000)
+
 def decode_uint256(hex_data):
     return int.from_bytes(hex_data, byteorder='big')
 
-def decode_address(hex_data):
-    if isinstance(hex_data, str):
-        clean_hex = hex_data.replace('0x', '')
-        return AsyncWeb3.to_checksum_address('0x' + clean_hex[-40:])
-    else:
-        hex_str = hex_data.hex()
-        if hex_str.startswith('0x'):
-            hex_str = hex_str[2:]
-        return AsyncWeb3.to_checksum_address('0x' + hex_str[-40:])
-
 def decode_amount(hex_data):
     amount_wei = int.from_bytes(hex_data, byteorder='big')
     return amount_wei / 1_000_000  # Convert from 6 decimals to normal units
 
-async def get_cctp_transfers_in(start_block, end_block, output_file):
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'block_number',
-            'transaction_hash',
-            'timestamp',
-            'caller',
-            'source_chain',
-            'nonce',
-            'sender',
-            'recipient',
-            'complexity',
-            'amount'
-        ])
-    
-    logs = await w3_eth.eth.get_logs({
-        'address': MESSAGE_TRANSMITTER,
-        'fromBlock': start_block,
-        'toBlock': end_block,
-        'topics': [MESSAGE_RECEIVED_EVENT]
-    })
-    
-    for log in logs:
-        try:
-            block = await w3_eth.eth.get_block(log['blockNumber'])
-            tx = await w3_eth.eth.get_transaction(log['transactionHash'])
-            
-            receipt = await w3_eth.eth.get_transaction_receipt(log['transactionHash'])
+async def get_block_timestamp(w3, block_number, cache=None):
+    cache = block_cache if cache is None else cache
+    timestamp = cache.get((CHAIN, block_number))
+    if timestamp is None:
+        with span('get_block', CHAIN, block=block_number):
+            block = await w3.eth.get_block(block_number)
+        timestamp = block['timestamp']
+        cache.put((CHAIN, block_number), timestamp)
+    return timestamp
+
+async def process_log(log, w3=None, cache=None, message=None, plan=None):
+    # By default the row comes from the log and its (cached) block timestamp alone; a plan with the
+    # receipt fills `complexity` and takes the amount from the USDC Transfer minted instead of the BurnMessage
+    w3 = w3 or w3_eth
+    plan = plan or DEFAULT_PLAN
+    timestamp = None
+    if plan.needs('block'):
+        timestamp = await get_block_timestamp(w3, log['blockNumber'], cache)
+
+    receipt = None
+    if plan.needs('receipt'):
+        with span('get_transaction_receipt', CHAIN, tx=log['transactionHash']):
+            receipt = await w3.eth.get_transaction_receipt(log['transactionHash'])
+
+    with span('decode', CHAIN, tx=log['transactionHash']):
+        caller = checksum_address(log['topics'][1])
+        nonce = decode_uint256(log['topics'][2])
+
+        message = message or parse_message_received(log['data'])
+        source_domain = message.source_domain
+        sender = checksum_address(message.sender)
+        burn = parse_burn_message(message.body)
+        recipient = checksum_address(burn.mint_recipient)
+
+        source_chain = DOMAIN_TO_CHAIN.get(source_domain, f"Unknown ({source_domain})")
+
+        # USDC has 6 decimals on every CCTP domain
+        usdc_amount = burn.amount / 1_000_000
+        complexity = None
+        if receipt is not None:
             complexity = len(receipt['logs'])
-            
-            caller = decode_address(log['topics'][1])
-            nonce = int(log['topics'][2].hex(), 16)
-            
-            data = log['data']
-            source_domain = decode_uint256(data[0:32])
-            sender = decode_address(data[32:64])
-            
-            message_body = data[64:]
-            recipient = decode_address(message_body[96:128])
-            
-            source_chain = DOMAIN_TO_CHAIN.get(source_domain, f"Unknown ({source_domain})")
-            
+
             # Find USDC transfer in the receipt logs
             usdc_amount = 0
             for receipt_log in receipt['logs']:
-                if (receipt_log['address'].lower() == USDC_ADDRESS.lower() and 
+                if (receipt_log['address'].lower() == USDC_ADDRESS.lower() and
                     receipt_log['topics'][0].hex() == TRANSFER_EVENT):
                     usdc_amount = decode_amount(receipt_log['data'])
                     break
 
-            with open(output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    log['blockNumber'],
-                    log['transactionHash'].hex(),
-                    datetime.utcfromtimestamp(block['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
-                    caller,
-                    source_chain,
-                    nonce,
-                    sender,
-                    recipient,
-                    complexity,
-                    usdc_amount
-                ])
-            
-            print(f"Processed incoming transfer #{nonce} from {source_chain} in block {log['blockNumber']}: {usdc_amount} USDC")
-            
+    print(f"Processed incoming transfer #{nonce} from {source_chain} in block {log['blockNumber']}: {usdc_amount} USDC")
+
+    return plan.project([
+        log['blockNumber'],
+        log['transactionHash'].hex(),
+        datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp is not None else None,
+        caller,
+        source_chain,
+        nonce,
+        sender,
+        recipient,
+        complexity,
+        usdc_amount
+    ])
+
+async def iter_cctp_transfers_in(start_block, end_block, w3=None, cache=None, plan=None):
+    w3 = w3 or w3_eth
+    with span('get_logs', CHAIN, from_block=start_block, to_block=end_block):
+        logs = await w3.eth.get_logs({
+            'address': MESSAGE_TRANSMITTER,
+            'fromBlock': start_block,
+            'toBlock': end_block,
+            'topics': [MESSAGE_RECEIVED_EVENT]
+        })
+
+    for log in logs:
+        try:
+            # Parsed per log, so a malformed one only drops its own row
+            row = await process_log(log, w3, cache, plan=plan)
         except Exception as e:
             print(f"Error processing log: {str(e)}")
             continue
+        yield row
+
+async def get_cctp_transfers_in(start_block, end_block, output_file, w3=None, cache=None, plan=None):
+    plan = plan or DEFAULT_PLAN
+    with CSVSink(output_file, plan.columns) as sink:
+        async for row in iter_cctp_transfers_in(start_block, end_block, w3, cache, plan):
+            sink.write(row)
 
 async def main():
     end_block = await w3_eth.eth.block_number
     start_block = end_block - 1000  # Last 1000 blocks
     await get_cctp_transfers_in(start_block, end_block, 'ethereum_transfers_in.csv')
+    await close_transport()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # --profile[=cpu|sample|alloc,...] writes {CHAIN}_transfers_in.prof etc. next to the CSV
+    with profiling(f"{CHAIN}_transfers_in.csv", profile_flag()):
+        asyncio.run(main())
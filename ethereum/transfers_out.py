@@ -1,16 +1,32 @@
 import asyncio
+import os
+import sys
 from web3 import AsyncWeb3
 from web3.middleware import async_geth_poa_middleware
 from datetime import datetime
-import csv
 
-def setup_web3_provider(url):
-    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.addresses import checksum_address
+from common.caches import LRUCache
+from common.message import parse_deposit_for_burn
+from common.multicall import get_token_info as fetch_token_info, prefetch_token_info
+from common.planner import plan_columns
+from common.profiling import profile_flag, profiling
+from common.providers import PooledAsyncHTTPProvider
+from common.sinks import CSVSink
+from common.tracing import span
+from common.transport import close_transport
+
+def setup_web3_provider(urls):
+    # `urls` may be a single endpoint or a list to fail over / hedge between
+    w3 = AsyncWeb3(PooledAsyncHTTPProvider(urls))
     w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
     return w3
 
 w3_eth = setup_web3_provider('https://eth-mainnet.g.alchemy.com/v2/<API_KEY>')
 
+CHAIN = 'ethereum'
 CIRCLE_TOKEN_MESSENGER = AsyncWeb3.to_checksum_address('0xBd3fa81B58Ba92a82136038B25aDec7066af3155')
 MESSAGE_SENT_EVENT = '0x2fa9ca894982930190727e75500a97d8dc500233a5065e0f3126c48fbe0343c0'
 
@@ -19,39 +35,60 @@ DOMAIN_TO_CHAIN = {
     4: 'noble', 5: 'solana', 6: 'base', 7: 'polygon', 8: 'sui'
 }
 
-ERC20_ABI = [
-    {"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},
-    {"inputs":[],"name":"symbol","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"}
+CSV_HEADER = [
+    'nonce', 'block_number', 'transaction_hash', 'timestamp', 'sender',
+    'is_direct', 'total_events', 'cctp_position', 'first_contract',
+    'token_address', 'token_symbol', 'amount', 'recipient', 'destination_chain'
 ]
 
+# RPC sources each column needs beyond the DepositForBurn log (see common/planner.py)
+COLUMN_SOURCES = {
+    'timestamp': ['block'],
+    'sender': ['transaction'],
+    'is_direct': ['transaction'],
+    'total_events': ['receipt'],
+    'cctp_position': ['receipt'],
+    'first_contract': ['receipt'],
+    'token_symbol': ['token_info'],
+    'amount': ['token_info'],
+}
+
+def make_plan(columns=None, sources=()):
+    return plan_columns(CSV_HEADER, COLUMN_SOURCES, columns, sources=sources)
+
+DEFAULT_PLAN = make_plan()
+
+# Block timestamps keyed by (chain, block_number); the orchestrator passes in a cache shared by all scanners
+block_cache = LRUCache(10000)
+
 async def get_token_info(w3, token_address):
-    token_contract = w3.eth.contract(address=token_address, abi=ERC20_ABI)
-    decimals = await token_contract.functions.decimals().call()
-    symbol = await token_contract.functions.symbol().call()
-    return decimals, symbol
+    # decimals() and symbol() go out through Multicall3 and stay cached per token
+    return await fetch_token_info(w3, CHAIN, token_address)
 
 def decode_uint256(hex_data):
     return int.from_bytes(hex_data, byteorder='big')
 
-def decode_address(hex_data):
-    if isinstance(hex_data, str):
-        clean_hex = hex_data.replace('0x', '')
-        return AsyncWeb3.to_checksum_address('0x' + clean_hex[-40:])
-    else:
-        hex_str = hex_data.hex()
-        if hex_str.startswith('0x'):
-            hex_str = hex_str[2:]
-        return AsyncWeb3.to_checksum_address('0x' + hex_str[-40:])
-
-async def analyze_transaction_type(w3, tx_hash, target_address):
-    receipt = await w3.eth.get_transaction_receipt(tx_hash)
-    tx = await w3.eth.get_transaction(tx_hash)
-    
-    is_direct = tx['to'].lower() == target_address.lower()
+async def get_block_timestamp(w3, block_number, cache=None):
+    cache = block_cache if cache is None else cache
+    timestamp = cache.get((CHAIN, block_number))
+    if timestamp is None:
+        with span('get_block', CHAIN, block=block_number):
+            block = await w3.eth.get_block(block_number)
+        timestamp = block['timestamp']
+        cache.put((CHAIN, block_number), timestamp)
+    return timestamp
+
+def analyze_transaction_type(tx, receipt, target_address):
+    # Either may be None when the plan skipped fetching it; its fields are left empty
+    is_direct = tx['to'].lower() == target_address.lower() if tx is not None else None
+    if receipt is None:
+        return {'is_direct': is_direct, 'total_logs': None, 'target_log_count': None,
+                'target_positions': [], 'first_contract': None}
+
     total_logs = len(receipt['logs'])
     target_logs = sum(1 for log in receipt['logs'] if log['address'].lower() == target_address.lower())
     target_positions = [i for i, log in enumerate(receipt['logs']) if log['address'].lower() == target_address.lower()]
-    
+
     return {
         'is_direct': is_direct,
         'total_logs': total_logs,
@@ -60,69 +97,94 @@ async def analyze_transaction_type(w3, tx_hash, target_address):
         'first_contract': receipt['logs'][0]['address'] if receipt['logs'] else None
     }
 
-async def get_cctp_transfers(start_block, end_block, output_file):
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'nonce', 'block_number', 'transaction_hash', 'timestamp', 'sender',
-            'is_direct', 'total_events', 'cctp_position', 'first_contract',
-            'token_address', 'token_symbol', 'amount', 'recipient', 'destination_chain'
-        ])
-    
-    logs = await w3_eth.eth.get_logs({
-        'address': CIRCLE_TOKEN_MESSENGER,
-        'fromBlock': start_block,
-        'toBlock': end_block,
-        'topics': [MESSAGE_SENT_EVENT]
-    })
-    
+async def process_log(log, w3=None, cache=None, deposit=None, plan=None):
+    w3 = w3 or w3_eth
+    plan = plan or DEFAULT_PLAN
+    timestamp = None
+    if plan.needs('block'):
+        timestamp = await get_block_timestamp(w3, log['blockNumber'], cache)
+
+    # One fetch each, shared by every column that needs it
+    tx = receipt = None
+    if plan.needs('transaction'):
+        with span('get_transaction', CHAIN, tx=log['transactionHash']):
+            tx = await w3.eth.get_transaction(log['transactionHash'])
+    if plan.needs('receipt'):
+        with span('get_transaction_receipt', CHAIN, tx=log['transactionHash']):
+            receipt = await w3.eth.get_transaction_receipt(log['transactionHash'])
+    tx_analysis = analyze_transaction_type(tx, receipt, CIRCLE_TOKEN_MESSENGER)
+
+    with span('decode', CHAIN, tx=log['transactionHash']):
+        nonce = decode_uint256(log['topics'][1])
+        burn_token = checksum_address(log['topics'][2])
+
+        deposit = deposit or parse_deposit_for_burn(log['data'])
+        amount = deposit.amount
+        mint_recipient = checksum_address(deposit.mint_recipient)
+        destination_domain = deposit.destination_domain
+        destination_chain = DOMAIN_TO_CHAIN.get(destination_domain, f"Unknown ({destination_domain})")
+
+    decimals = symbol = None
+    if plan.needs('token_info'):
+        with span('get_token_info', CHAIN, tx=log['transactionHash']):
+            decimals, symbol = await get_token_info(w3, burn_token)
+
+    print(f"Processed transfer #{nonce} in block {log['blockNumber']}")
+
+    return plan.project([
+        nonce,
+        log['blockNumber'],
+        log['transactionHash'].hex(),
+        datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp is not None else None,
+        tx['from'] if tx is not None else None,
+        tx_analysis['is_direct'],
+        tx_analysis['total_logs'],
+        tx_analysis['target_positions'][0] + 1 if tx_analysis['target_positions'] else None,
+        tx_analysis['first_contract'],
+        burn_token,
+        symbol,
+        amount / (10 ** decimals) if decimals is not None else None,
+        mint_recipient,
+        destination_chain
+    ])
+
+async def iter_cctp_transfers(start_block, end_block, w3=None, cache=None, plan=None):
+    w3 = w3 or w3_eth
+    with span('get_logs', CHAIN, from_block=start_block, to_block=end_block):
+        logs = await w3.eth.get_logs({
+            'address': CIRCLE_TOKEN_MESSENGER,
+            'fromBlock': start_block,
+            'toBlock': end_block,
+            'topics': [MESSAGE_SENT_EVENT]
+        })
+
+    # Every token of the page in one aggregate3, instead of two eth_calls per event
+    if logs and (plan or DEFAULT_PLAN).needs('token_info'):
+        with span('get_token_info', CHAIN, logs=len(logs)):
+            await prefetch_token_info(w3, CHAIN, {checksum_address(log['topics'][2]) for log in logs})
+
     for log in logs:
         try:
-            block = await w3_eth.eth.get_block(log['blockNumber'])
-            tx = await w3_eth.eth.get_transaction(log['transactionHash'])
-            tx_analysis = await analyze_transaction_type(w3_eth, log['transactionHash'], CIRCLE_TOKEN_MESSENGER)
-            
-            nonce = int(log['topics'][1].hex(), 16)
-            topic2_hex = log['topics'][2].hex()
-            burn_token = AsyncWeb3.to_checksum_address('0x' + topic2_hex[-40:])
-            
-            decimals, symbol = await get_token_info(w3_eth, burn_token)
-            
-            raw_data = log['data']
-            amount = decode_uint256(raw_data[0:32])
-            mint_recipient = decode_address(raw_data[32:64])
-            destination_domain = decode_uint256(raw_data[64:96])
-            destination_chain = DOMAIN_TO_CHAIN.get(destination_domain, f"Unknown ({destination_domain})")
-            
-            with open(output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    nonce,
-                    log['blockNumber'],
-                    log['transactionHash'].hex(),
-                    datetime.utcfromtimestamp(block['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
-                    tx['from'],
-                    tx_analysis['is_direct'],
-                    tx_analysis['total_logs'],
-                    tx_analysis['target_positions'][0] + 1 if tx_analysis['target_positions'] else None,
-                    tx_analysis['first_contract'],
-                    burn_token,
-                    symbol,
-                    amount / (10 ** decimals),
-                    mint_recipient,
-                    destination_chain
-                ])
-            
-            print(f"Processed transfer #{nonce} in block {log['blockNumber']}")
-            
+            # Parsed per log, so a malformed one only drops its own row
+            row = await process_log(log, w3, cache, plan=plan)
         except Exception as e:
             print(f"Error processing log: {str(e)}")
             continue
+        yield row
+
+async def get_cctp_transfers(start_block, end_block, output_file, w3=None, cache=None, plan=None):
+    plan = plan or DEFAULT_PLAN
+    with CSVSink(output_file, plan.columns) as sink:
+        async for row in iter_cctp_transfers(start_block, end_block, w3, cache, plan):
+            sink.write(row)
 
 async def main():
     end_block = await w3_eth.eth.block_number
     start_block = end_block - 1000  # Last 1000 blocks
     await get_cctp_transfers(start_block, end_block, 'ethereum_transfers_out.csv')
+    await close_transport()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # --profile[=cpu|sample|alloc,...] writes {CHAIN}_transfers_out.prof etc. next to the CSV
+    with profiling(f"{CHAIN}_transfers_out.csv", profile_flag()):
+        asyncio.run(main())
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from common.capture import enable_capture, get_capture
+from common.cursors import load_cursor, save_cursor
+from common.planner import parse_columns, plan_for
+from common.profiling import Profiler, add_profile_arguments, profile_base
+from common.registry import load_registry, load_scanner_module
+from common.response_cache import add_cache_arguments, enable_response_cache
+from common.sinks import CSVSink
+from common.transport import close_transport
+
+
+def plan_shards(start_block, end_block, shard_size):
+    return [(shard_start, min(shard_start + shard_size - 1, end_block))
+            for shard_start in range(start_block, end_block + 1, shard_size)]
+
+def shard_paths(work_dir, start, end):
+    base = os.path.join(work_dir, f"shard_{start:012d}_{end:012d}")
+    return f"{base}.csv", f"{base}.cursor"
+
+async def scan_shard(config, direction, start, end, part_file, cursor_file, step):
+    module = load_scanner_module(config['package'], f"transfers_{direction}")
+    w3 = module.setup_web3_provider(config['rpc_url'])
+    iter_rows = module.iter_cctp_transfers_in if direction == 'in' else module.iter_cctp_transfers
+    plan = plan_for(module, direction, config)
+
+    # Pick up where a previous run of this shard stopped
+    cursor = load_cursor(cursor_file, {'start': start, 'end': end, 'last_block': start - 1, 'rows': 0, 'offset': 0, 'done': False})
+    resume = cursor['last_block'] >= start
+    if resume and os.path.exists(part_file):
+        # Drop rows of a chunk that was interrupted after the last saved cursor
+        with open(part_file, 'r+') as f:
+            f.truncate(cursor['offset'])
+
+    try:
+        with CSVSink(part_file, plan.columns, append=resume) as sink:
+            for chunk_start in range(cursor['last_block'] + 1, end + 1, step):
+                chunk_end = min(chunk_start + step - 1, end)
+                async for row in iter_rows(chunk_start, chunk_end, w3, plan=plan):
+                    sink.write(row)
+                    cursor['rows'] += 1
+                cursor['last_block'] = chunk_end
+                cursor['offset'] = sink.tell()
+                save_cursor(cursor_file, cursor)
+    finally:
+        # HTTP sessions belong to this shard's event loop
+        await close_transport()
+        # Pool workers exit without running atexit hooks
+        if get_capture() is not None:
+            get_capture().flush()
+
+    cursor['done'] = True
+    save_cursor(cursor_file, cursor)
+    return cursor
+
+def run_shard(config, direction, start, end, part_file, cursor_file, step, profile=None):
+    # Runs in a worker process: each worker has its own event loop, provider and block cache
+    if not profile:
+        return asyncio.run(scan_shard(config, direction, start, end, part_file, cursor_file, step))
+    # Profiles stay next to the shard's partition until the parent folds them together
+    profiler = Profiler(profile_base(part_file), profile).start()
+    try:
+        return asyncio.run(scan_shard(config, direction, start, end, part_file, cursor_file, step))
+    finally:
+        profiler.stop()
+        profiler.write(quiet=True)
+
+def merge_shards(shards, work_dir, output_file):
+    """Concatenate shard partitions in block order and fold the shard cursors into one."""
+    rows = 0
+    completed_through = None
+    contiguous = True
+    shard_cursors = []
+
+    with open(output_file, 'w', newline='') as out:
+        wrote_header = False
+        for start, end in shards:
+            part_file, cursor_file = shard_paths(work_dir, start, end)
+            cursor = load_cursor(cursor_file, {'start': start, 'end': end, 'last_block': start - 1, 'rows': 0, 'done': False})
+            shard_cursors.append(cursor)
+            if contiguous:
+                if cursor['done']:
+                    completed_through = end
+                else:
+                    contiguous = False
+                    if cursor['last_block'] >= start:
+                        completed_through = cursor['last_block']
+            if not os.path.exists(part_file):
+                continue
+            with open(part_file, newline='') as part:
+                header = part.readline()
+                if not wrote_header:
+                    out.write(header)
+                    wrote_header = True
+                shutil.copyfileobj(part, out)
+            rows += cursor['rows']
+
+    return {
+        'rows': rows,
+        'completed_through': completed_through,
+        'shards_done': sum(1 for cursor in shard_cursors if cursor['done']),
+        'shards': shard_cursors
+    }
+
+def backfill(chain, direction, start_block, end_block, output_file=None, shard_size=10000,
+             workers=None, registry=None, keep_shards=False, profile=None, profile_top=25):
+    profile = profile or os.environ.get('CCTP_PROFILE')
+    registry = registry or load_registry()
+    config = registry[chain]
+    if config['kind'] != 'evm':
+        raise ValueError(f"{chain} is not an EVM chain")
+
+    output_file = output_file or f"{chain}_transfers_{direction}_{start_block}_{end_block}.csv"
+    work_dir = f"{output_file}.shards"
+    os.makedirs(work_dir, exist_ok=True)
+
+    shards = plan_shards(start_block, end_block, shard_size)
+    pending = []
+    for start, end in shards:
+        part_file, cursor_file = shard_paths(work_dir, start, end)
+        if load_cursor(cursor_file, {}).get('done'):
+            continue
+        pending.append((start, end, part_file, cursor_file))
+
+    workers = workers or os.cpu_count()
+    print(f"Backfilling {chain}/{direction} blocks {start_block}-{end_block}: "
+          f"{len(shards)} shards ({len(shards) - len(pending)} already done) on {workers} processes")
+
+    started = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_shard, config, direction, start, end, part_file, cursor_file, config['chunk_size'], profile): (start, end)
+            for start, end, part_file, cursor_file in pending
+        }
+        for future in as_completed(futures):
+            start, end = futures[future]
+            try:
+                cursor = future.result()
+                print(f"Shard {start}-{end} done: {cursor['rows']} rows")
+            except Exception as e:
+                print(f"Shard {start}-{end} failed: {str(e)}")
+                failed.append((start, end))
+
+    summary = merge_shards(shards, work_dir, output_file)
+    summary.update({'chain': chain, 'direction': direction, 'start': start_block, 'end': end_block})
+    save_cursor(f"{output_file}.cursor", summary)
+
+    if profile:
+        profiler = Profiler(profile_base(output_file), profile, profile_top)
+        for start, end, part_file, _ in pending:
+            profiler.absorb(profile_base(part_file))
+        profiler.wall = time.perf_counter() - started
+        profiler.write()
+
+    if not failed and not keep_shards:
+        shutil.rmtree(work_dir)
+
+    print(f"\nMerged {summary['rows']} rows into {output_file} in {time.perf_counter() - started:.1f}s")
+    print(f"Completed through block {summary['completed_through']} ({summary['shards_done']}/{len(shards)} shards)")
+    if failed:
+        print(f"{len(failed)} shards failed; rerun the same command to resume them")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Shard an EVM CCTP backfill across a process pool')
+    parser.add_argument('--chain', required=True)
+    parser.add_argument('--direction', choices=['in', 'out'], required=True)
+    parser.add_argument('--start', type=int, required=True, help='first block')
+    parser.add_argument('--end', type=int, required=True, help='last block (inclusive)')
+    parser.add_argument('--shard-size', type=int, default=10000, help='blocks per shard')
+    parser.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    parser.add_argument('--output')
+    parser.add_argument('--registry')
+    parser.add_argument('--keep-shards', action='store_true')
+    parser.add_argument('--receipts', action='store_true', help='fetch receipts for inbound rows (complexity, minted amount)')
+    parser.add_argument('--columns', help='comma separated output columns; RPC calls no column needs are skipped')
+    parser.add_argument('--plan', action='store_true', help='print the columns and RPC calls per event, then exit')
+    parser.add_argument('--capture', metavar='DIR', help='record every RPC response into segment files for replay.py')
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    if args.chain not in registry:
+        parser.error(f"unknown chain: {args.chain}")
+    if args.rpc_cache:
+        # Shard processes pick the cache up from the environment and share the directory
+        enable_response_cache(args.rpc_cache, args.rpc_cache_mb, registry)
+    if args.capture:
+        # Each shard process writes its own segments into the shared directory
+        enable_capture(args.capture)
+    config = registry[args.chain]
+    if args.receipts:
+        config['receipts'] = True
+    module = load_scanner_module(config['package'], f"transfers_{args.direction}")
+    if args.columns:
+        config['columns'] = parse_columns(args.columns)
+        try:
+            module.make_plan(config['columns'])
+        except ValueError as e:
+            parser.error(str(e))
+    if args.plan:
+        print(plan_for(module, args.direction, config).describe(f"{args.chain}/{args.direction}"))
+        return
+    backfill(args.chain, args.direction, args.start, args.end, args.output, args.shard_size,
+             args.workers, registry, args.keep_shards, args.profile, args.profile_top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import json
+
+from common.lookup import DEFAULT_MINT_WINDOW, NonceLookup
+from common.nonces import NonceIndex
+from common.registry import load_registry
+from common.transport import close_transport
+
+
+def print_transfer(result):
+    print(f"\nCCTP transfer #{result['nonce']} from {result['source_chain']} "
+          f"({result['calls']} search calls, {result['seconds']:.2f}s)")
+    print('-' * 50)
+    for title, row in (('BURN', result['burn']), ('MINT', result['mint'])):
+        if row is None:
+            if title == 'MINT' and result['burn'] is None:
+                break
+            status = 'not found' if title == 'BURN' else f"not found on {result['destination_chain']}"
+            print(f"{title}: {status if result['error'] is None else 'search gave up: ' + result['error']}")
+            continue
+        print(title)
+        for column, value in row.items():
+            print(f"  {column}: {value}")
+    print('-' * 50)
+
+async def run(args, registry):
+    index = NonceIndex(args.index) if args.index else None
+    lookup = NonceLookup(registry, index, args.mint_window)
+    try:
+        for nonce in args.nonce:
+            result = await lookup.lookup(args.chain, nonce)
+            if args.json:
+                print(json.dumps(result, default=str))
+            else:
+                print_transfer(result)
+    finally:
+        if index is not None:
+            index.close()
+        await close_transport()
+
+def main():
+    parser = argparse.ArgumentParser(description='Find CCTP transfers by source chain and nonce: the burn, then its mint')
+    parser.add_argument('--chain', required=True, help='source chain of the burn')
+    parser.add_argument('--nonce', type=int, nargs='+', required=True)
+    parser.add_argument('--registry', help='JSON file overriding chain settings')
+    parser.add_argument('--index', metavar='DIR', help='nonce bitmap directory (nonces.py) to narrow the block search')
+    parser.add_argument('--mint-window', type=int, default=DEFAULT_MINT_WINDOW,
+                        help='seconds after the burn to look for the mint')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per transfer')
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    if registry.get(args.chain, {}).get('kind') != 'evm':
+        parser.error('lookups support EVM source chains')
+    asyncio.run(run(args, registry))
+
+if __name__ == "__main__":
+    main()
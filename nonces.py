@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import csv
+import glob
+import os
+import re
+import time
+
+from common.caches import LRUCache
+from common.nonces import BURNS, CHAIN_DOMAINS, DOMAIN_CHAINS, MINTS, NonceIndex
+from common.registry import load_registry
+from common.sinks import CSVSink
+from common.transport import close_transport
+from orchestrator import SCANNER_TYPES
+
+# Scanner outputs `index` recognizes by name when no --chain/--direction is given
+OUTPUT_NAME = re.compile(r'(?P<chain>[a-z_]+)_transfers_(?P<direction>in|out)\b.*\.csv$')
+
+
+def index_csv(index, path, chain, direction):
+    indexed = skipped = 0
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if index.record(chain, direction, row):
+                indexed += 1
+            else:
+                skipped += 1
+    return indexed, skipped
+
+def index_outputs(index, paths, chain=None, direction=None):
+    for path in paths:
+        match = OUTPUT_NAME.search(os.path.basename(path))
+        file_chain = chain or (match and match['chain'])
+        file_direction = direction or (match and match['direction'])
+        if not file_chain or not file_direction:
+            print(f"{path}: can't tell chain and direction from the name, pass --chain and --direction")
+            continue
+        indexed, skipped = index_csv(index, path, file_chain, file_direction)
+        print(f"{path}: {indexed} nonces indexed as {file_chain}/{file_direction}"
+              + (f", {skipped} rows without a nonce or known source domain" if skipped else ''))
+    index.flush()
+
+def print_gaps(index, domains=None, kinds=(BURNS, MINTS), limit=20):
+    for (domain, kind), (seen, first, last, missing) in index.summary().items():
+        if (domains and domain not in domains) or kind not in kinds:
+            continue
+        print(f"{DOMAIN_CHAINS.get(domain, domain)} {kind}: {seen} nonces in {first}-{last}, {missing} missing")
+        for i, (gap_first, gap_last) in enumerate(index.bitmap(domain, kind).gaps()):
+            if i == limit:
+                print('  ...')
+                break
+            print(f"  {gap_first}" + (f"-{gap_last}" if gap_last != gap_first else ''))
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+async def repair_burns(index, chain, config, output_file, max_blocks=None):
+    """Find the burns missing from `chain`'s bitmap and append them to `output_file`.
+
+    Burn nonces grow with block numbers on their source chain, so each gap is looked for
+    between the blocks of the indexed nonces around it (see NonceBitmap.locate) instead
+    of rescanning the chain; only rows whose nonce is still missing are written.
+    """
+    bitmap = index.bitmap(CHAIN_DOMAINS[chain], BURNS)
+    scanner = SCANNER_TYPES[config['kind']](chain, 'out', config, LRUCache(100000))
+    if 'nonce' not in scanner.header:
+        raise ValueError('repair needs the nonce column')
+    gaps = list(bitmap.gaps())
+    missing = sum(last - first + 1 for first, last in gaps)
+    ranges = []
+    for first, last in gaps:
+        low, high = bitmap.locate(first, last)
+        if low is None or high is None:
+            print(f"  {first}-{last}: no indexed block around the gap, skipped")
+            continue
+        if max_blocks and high - low + 1 > max_blocks:
+            print(f"  {first}-{last}: blocks {low}-{high} span more than {max_blocks} blocks, skipped")
+            continue
+        ranges.append((low, high))
+    ranges = _merge(ranges)
+    print(f"Repairing {missing} missing {chain} burns in {len(gaps)} gaps: "
+          f"{sum(end - start + 1 for start, end in ranges)} blocks in {len(ranges)} ranges")
+
+    started = time.perf_counter()
+    found = 0
+    size = config['chunk_size']
+    try:
+        with CSVSink(output_file, scanner.header, append=True) as sink:
+            for start, end in ranges:
+                for chunk_start in range(start, end + 1, size):
+                    async for row in scanner.iter_chunk(chunk_start, min(chunk_start + size - 1, end)):
+                        record = row if isinstance(row, dict) else dict(zip(scanner.header, row))
+                        if int(record['nonce']) in bitmap:
+                            continue
+                        sink.write(record)
+                        index.record(chain, 'out', record)
+                        found += 1
+    finally:
+        index.flush()
+        await close_transport()
+    print(f"Found {found} of {missing} missing burns in {time.perf_counter() - started:.1f}s -> {output_file}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description='Track which CCTP nonces have been seen per source domain, list gaps and refetch them')
+    parser.add_argument('--index', default='nonces', metavar='DIR', help='nonce bitmap directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', help='mark the nonces of scanner output CSVs')
+    index_parser.add_argument('csv', nargs='+', help='output files, e.g. ethereum_transfers_out.csv (globs allowed)')
+    index_parser.add_argument('--chain', help='chain the files were scanned on (default: from the file name)')
+    index_parser.add_argument('--direction', choices=('in', 'out'), help='default: from the file name')
+
+    gaps_parser = commands.add_parser('gaps', help='list missing nonce ranges')
+    gaps_parser.add_argument('--chains', help='comma separated source chains (default: all indexed)')
+    gaps_parser.add_argument('--kind', choices=(BURNS, MINTS), help='default: both')
+    gaps_parser.add_argument('--limit', type=int, default=20, help='gaps listed per bitmap')
+
+    repair_parser = commands.add_parser('repair', help='refetch the missing burns of an EVM chain')
+    repair_parser.add_argument('--chain', required=True)
+    repair_parser.add_argument('--registry', help='JSON file overriding chain settings')
+    repair_parser.add_argument('--output', help='CSV the found rows are appended to (default: <chain>_transfers_out.repair.csv)')
+    repair_parser.add_argument('--max-blocks', type=int, help='skip gaps whose block range is wider than this')
+    args = parser.parse_args()
+
+    index = NonceIndex(args.index)
+    try:
+        if args.command == 'index':
+            paths = [path for pattern in args.csv for path in sorted(glob.glob(pattern)) or [pattern]]
+            index_outputs(index, paths, args.chain, args.direction)
+        elif args.command == 'gaps':
+            domains = {CHAIN_DOMAINS[chain] for chain in args.chains.split(',')} if args.chains else None
+            print_gaps(index, domains, (args.kind,) if args.kind else (BURNS, MINTS), args.limit)
+        else:
+            registry = load_registry(args.registry)
+            config = registry.get(args.chain)
+            if config is None or config['kind'] != 'evm':
+                parser.error('repair supports EVM chains')
+            asyncio.run(repair_burns(index, args.chain, config, args.output or f"{args.chain}_transfers_out.repair.csv",
+                                     args.max_blocks))
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+
+from common.addresses import address_cache_stats
+from common.caches import LRUCache
+from common.capture import enable_capture, get_capture
+from common.metrics import print_summary, start_metrics_server
+from common.multicall import multicall_stats
+from common.nonces import DOMAIN_CHAINS, NonceIndex
+from common.planner import parse_columns, plan_for
+from common.profiling import add_profile_arguments, profiling
+from common.registry import load_registry, load_scanner_module
+from common.response_cache import add_cache_arguments, enable_response_cache, get_response_cache
+from common.scheduler import FairScheduler
+from common.sinks import CSVSink, JSONLSink
+from common.tracing import enable_tracing, get_tracer
+from common.transport import close_transport, get_transport
+
+
+class Scanner(ABC):
+    """One chain/direction pair, scanned in chunks so the scheduler can interleave chains."""
+
+    def __init__(self, chain, direction, config, cache):
+        self.chain = chain
+        self.direction = direction
+        self.config = config
+        self.cache = cache
+        self.rows = 0
+        self.chunks_done = 0
+        # Column plan, for scanners that support choosing their output columns
+        self.plan = None
+
+    @property
+    def name(self):
+        return f"{self.chain}/{self.direction}"
+
+    @abstractmethod
+    async def head(self):
+        pass
+
+    def chunks(self, head):
+        # Inclusive block/slot ranges covering the last `lookback` units
+        start = head - self.config['lookback']
+        size = self.config['chunk_size']
+        for chunk_start in range(start, head + 1, size):
+            yield chunk_start, min(chunk_start + size - 1, head)
+
+    @abstractmethod
+    def iter_chunk(self, start, end):
+        pass
+
+
+class EVMScanner(Scanner):
+    def __init__(self, chain, direction, config, cache):
+        super().__init__(chain, direction, config, cache)
+        self.module = load_scanner_module(config['package'], f"transfers_{direction}")
+        self.plan = plan_for(self.module, direction, config)
+        self.header = self.plan.columns
+        self.output_name = f"{chain}_transfers_{direction}.csv"
+        self.w3 = self.module.setup_web3_provider(config['rpc_url'])
+
+    async def head(self):
+        return await self.w3.eth.block_number
+
+    def iter_chunk(self, start, end):
+        if self.direction == 'in':
+            return self.module.iter_cctp_transfers_in(start, end, self.w3, self.cache, self.plan)
+        return self.module.iter_cctp_transfers(start, end, self.w3, self.cache, self.plan)
+
+
+class SolanaScanner(Scanner):
+    def __init__(self, chain, direction, config, cache):
+        super().__init__(chain, direction, config, cache)
+        self.module = load_scanner_module(config['package'], 'transfers_in')
+        self.header = self.module.CSV_HEADER
+        self.output_name = 'solana_cctp_transactions.csv'
+
+    async def head(self):
+        return await self.module.get_slot(None, self.config['rpc_url'])
+
+    def iter_chunk(self, start, end):
+        return self.module.iter_cctp_transactions(None, self.config['rpc_url'], start, end)
+
+
+class SuiScanner(Scanner):
+    def __init__(self, chain, direction, config, cache):
+        super().__init__(chain, direction, config, cache)
+        self.module = load_scanner_module(config['package'], f"transfers_{direction}")
+        self.header = self.module.CSV_FIELDS
+        self.output_name = f"sui_transfers_{direction}.csv"
+        if direction == 'in':
+            self.querier = self.module.SuiCCTPEventQuerier()
+            self.iter_events = self.querier.iter_cctp_transfers
+        else:
+            self.querier = self.module.SuiCCTPBurnQuerier()
+            self.iter_events = self.querier.iter_cctp_burns
+        self.querier.rpc_endpoint = config['rpc_url']
+
+    async def head(self):
+        return int(time.time() * 1000)
+
+    def chunks(self, head):
+        # Half-open time windows, walked oldest-first so output stays ordered
+        start = head - self.config['lookback']
+        size = self.config['chunk_size']
+        for chunk_start in range(start, head, size):
+            yield chunk_start, min(chunk_start + size, head)
+
+    def iter_chunk(self, start, end):
+        return self.iter_events(time_range=(start, end), descending=False)
+
+
+SCANNER_TYPES = {
+    'evm': EVMScanner,
+    'solana': SolanaScanner,
+    'sui': SuiScanner,
+}
+
+async def run_scanner(scanner, scheduler, sink, combined=None, nonces=None):
+    head = await scanner.head()
+    for start, end in scanner.chunks(head):
+        async with scheduler.slot(scanner.chain):
+            async for row in scanner.iter_chunk(start, end):
+                sink.write(row)
+                if combined is not None or nonces is not None:
+                    record = row if isinstance(row, dict) else dict(zip(scanner.header, row))
+                    if combined is not None:
+                        combined.write({'chain': scanner.chain, 'direction': scanner.direction, **record})
+                    if nonces is not None:
+                        nonces.record(scanner.chain, scanner.direction, record)
+                scanner.rows += 1
+        scanner.chunks_done += 1
+    print(f"[{scanner.name}] done: {scanner.rows} rows in {scanner.chunks_done} chunks")
+
+async def orchestrate(chains, directions, registry, workers=8, output_dir='.', combined_file=None, plan_only=False,
+                      nonce_index=None):
+    scheduler = FairScheduler(workers)
+    # Shared by every scanner; keys are namespaced by chain
+    cache = LRUCache(100000)
+    transport = get_transport()
+    scanners = []
+
+    for chain in chains:
+        config = registry[chain]
+        # Each RPC host gets its own connection pool, so a slow endpoint can't exhaust another chain's sockets
+        urls = config['rpc_url'] if isinstance(config['rpc_url'], list) else [config['rpc_url']]
+        for url in urls:
+            transport.set_host_limit(url, config.get('max_connections', 8))
+        for direction in directions:
+            if direction not in config['directions']:
+                continue
+            scanners.append(SCANNER_TYPES[config['kind']](chain, direction, config, cache))
+
+    requested = {column for chain in chains for column in registry[chain].get('columns') or ()}
+    known = {column for scanner in scanners if scanner.plan for column in scanner.plan.header}
+    if requested - known:
+        raise ValueError(f"unknown columns: {', '.join(sorted(requested - known))}")
+
+    if plan_only:
+        for scanner in scanners:
+            print(scanner.plan.describe(scanner.name) if scanner.plan else f"{scanner.name}  columns: {', '.join(scanner.header)} (fixed)")
+        await close_transport()
+        return scanners
+
+    os.makedirs(output_dir, exist_ok=True)
+    sinks = [CSVSink(os.path.join(output_dir, scanner.output_name), scanner.header) for scanner in scanners]
+    combined = JSONLSink(combined_file) if combined_file else None
+    nonces = NonceIndex(nonce_index) if nonce_index else None
+    started = time.perf_counter()
+
+    try:
+        results = await asyncio.gather(
+            *(run_scanner(scanner, scheduler, sink, combined, nonces) for scanner, sink in zip(scanners, sinks)),
+            return_exceptions=True
+        )
+    finally:
+        for sink in sinks:
+            sink.close()
+        if combined is not None:
+            combined.close()
+        if nonces is not None:
+            nonces.flush()
+        await close_transport()
+
+    print(f"\nOrchestrator finished in {time.perf_counter() - started:.1f}s")
+    for scanner, result in zip(scanners, results):
+        status = f"error: {result}" if isinstance(result, Exception) else 'ok'
+        print(f"  {scanner.name:<20} rows={scanner.rows:<8} chunks={scanner.chunks_done:<5} {status}")
+    print(f"  scheduler slots granted: {dict(scheduler.granted)}")
+    print(f"  shared cache: {cache.stats()}")
+    print(f"  checksum addresses: {address_cache_stats()}")
+    print(f"  multicall: {multicall_stats()}")
+    if get_response_cache() is not None:
+        print(f"  rpc cache: {get_response_cache().stats()}")
+    if get_capture() is not None:
+        get_capture().flush()
+        print(f"  capture: {get_capture().stats()}")
+    for host, stats in transport.stats().items():
+        print(f"  http {host}: {stats}")
+    if nonces is not None:
+        for (domain, kind), (seen, first, last, missing) in nonces.summary().items():
+            print(f"  nonces {DOMAIN_CHAINS.get(domain, domain)} {kind}: {seen} in {first}-{last}, {missing} missing")
+        nonces.close()
+    print_summary()
+    get_tracer().finish()
+    return scanners
+
+async def main():
+    parser = argparse.ArgumentParser(description='Run CCTP scanners for several chains concurrently in one process')
+    parser.add_argument('--registry', help='JSON file overriding chain settings (rpc_url, lookback, chunk_size, ...)')
+    parser.add_argument('--chains', help='comma separated chain names (default: all)')
+    parser.add_argument('--directions', default='in,out', help='comma separated: in,out')
+    parser.add_argument('--workers', type=int, default=8, help='chunks in flight across all chains')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--combined', help='also write every row, tagged with chain/direction, to this JSONL file')
+    parser.add_argument('--receipts', action='store_true',
+                        help='fetch receipts for inbound EVM rows (complexity, minted amount); one extra call per event')
+    parser.add_argument('--columns', help='comma separated EVM output columns; RPC calls no column needs are skipped')
+    parser.add_argument('--plan', action='store_true', help='print the columns and RPC calls per event of each scanner, then exit')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on 127.0.0.1:<port>/metrics')
+    parser.add_argument('--trace', help='record per-stage spans and write a Chrome trace JSON to this file')
+    parser.add_argument('--capture', metavar='DIR', help='record every RPC response into segment files for replay.py')
+    parser.add_argument('--nonce-index', metavar='DIR', help='mark every nonce seen in per-domain bitmaps for nonces.py')
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.trace:
+        enable_tracing(args.trace)
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    registry = load_registry(args.registry)
+    if args.rpc_cache:
+        enable_response_cache(args.rpc_cache, args.rpc_cache_mb, registry)
+    if args.capture:
+        enable_capture(args.capture)
+    for config in registry.values():
+        if args.receipts:
+            config['receipts'] = True
+        if args.columns:
+            config['columns'] = parse_columns(args.columns)
+    chains = args.chains.split(',') if args.chains else list(registry)
+    unknown = [chain for chain in chains if chain not in registry]
+    if unknown:
+        parser.error(f"unknown chains: {', '.join(unknown)}")
+
+    with profiling(os.path.join(args.output_dir, 'orchestrator'), args.profile, args.profile_top):
+        await orchestrate(chains, args.directions.split(','), registry, args.workers, args.output_dir, args.combined,
+                          args.plan, args.nonce_index)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from common.caches import LRUCache
+from common.capture import enable_replay, get_replay, iter_segment, segment_files
+from common.planner import parse_columns
+from common.registry import load_registry, load_scanner_module
+from common.sinks import CSVSink
+from common.transport import close_transport
+from orchestrator import SCANNER_TYPES
+
+
+def scanner_for(chain, direction, config):
+    scanner = SCANNER_TYPES[config['kind']](chain, direction, config, LRUCache(100000))
+    if config['kind'] == 'sui':
+        # Captured answers come back at once: no pacing, and a miss is final rather than retried
+        scanner.querier.request_delay = scanner.querier.page_delay = 0
+        scanner.querier.max_retries = 1
+        scanner.querier.get_retry_delay = lambda attempt, status_code: 0
+    return scanner
+
+def _block(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith('0x'):
+        return int(value, 16)
+    return None
+
+def _sui_query(event_filter):
+    """(event type, time window) of a suix_queryEvents filter built by query_events: time
+    windows are queried without an event type, open-ended scans by event type alone."""
+    if 'TimeRange' in event_filter:
+        time_range = event_filter['TimeRange']
+        return None, (int(time_range['startTime']), int(time_range['endTime']))
+    return event_filter.get('MoveEventType'), None
+
+def disjoint(ranges):
+    """Cut overlapping (start, end, ...) block ranges down to the blocks no earlier range covers,
+    so every block is replayed once; Replay answers a cut range from the captured one."""
+    cut = []
+    covered = None
+    for start, end, *_ in sorted(ranges):
+        if covered is not None:
+            start = max(start, covered + 1)
+        if start <= end:
+            cut.append((start, end))
+            covered = end
+    return cut
+
+def find_units(capture_dir, registry, chains, directions):
+    """Scan ranges the capturing runs asked for, as {(chain, direction): [(start, end, descending)]}.
+
+    EVM: every eth_getLogs range of a scanner's event, told apart by contract address; tail
+    polls, subscription backfills and lookup probes overlap, so the ranges are cut to be
+    disjoint. Solana: the captured slots,
+    in contiguous runs of at most chunk_size. Sui: every first-page suix_queryEvents with its
+    time window (None, None for open-ended scans) and order, by event type; a time window is
+    queried for every type at once, so it goes to the directions whose events its pages hold.
+    """
+    units = defaultdict(set)
+    for chain in chains:
+        config = registry[chain]
+        kind = config['kind']
+        wanted = [direction for direction in directions if direction in config['directions']]
+        targets = {}
+        for direction in wanted:
+            if kind == 'evm':
+                module = load_scanner_module(config['package'], f"transfers_{direction}")
+                if direction == 'in':
+                    address, topic = module.MESSAGE_TRANSMITTER, module.MESSAGE_RECEIVED_EVENT
+                else:
+                    address, topic = module.CIRCLE_TOKEN_MESSENGER, module.MESSAGE_SENT_EVENT
+                targets[(address.lower(), topic.lower())] = direction
+            elif kind == 'sui':
+                targets[scanner_for(chain, direction, config).querier.event_type] = direction
+
+        slots = set()
+        windows = defaultdict(set)
+        for segment in segment_files(capture_dir, chain):
+            for key, value, _ in iter_segment(segment, values=kind == 'sui'):
+                method, params = json.loads(key)
+                if kind == 'evm' and method == 'eth_getLogs':
+                    query = params[0]
+                    # web3 sends the address as a one-element list
+                    address = query.get('address')
+                    address = address[0] if isinstance(address, list) and len(address) == 1 else address
+                    # Only the scanners' own queries: nonce-filtered ones (lookups) are not scans
+                    topics = query.get('topics') or []
+                    topic = topics[0] if len(topics) == 1 and isinstance(topics[0], str) else None
+                    direction = targets.get((str(address).lower(), str(topic).lower()))
+                    start, end = _block(query.get('fromBlock')), _block(query.get('toBlock'))
+                    if direction and start is not None and end is not None:
+                        units[(chain, direction)].add((start, end, False))
+                elif kind == 'solana' and method == 'getBlock':
+                    slots.add(params[0])
+                elif kind == 'sui' and method == 'suix_queryEvents':
+                    event_type, window = _sui_query(params[0])
+                    if window is not None:
+                        events = json.loads(zlib.decompress(value)).get('data', [])
+                        windows[(*window, params[3])].update(event['type'] for event in events)
+                    elif event_type in targets and params[1] is None:
+                        units[(chain, targets[event_type])].add((None, None, params[3]))
+
+        for window, event_types in windows.items():
+            for event_type in event_types & targets.keys():
+                units[(chain, targets[event_type])].add(window)
+
+        if slots and 'in' in wanted:
+            run = []
+            for slot in sorted(slots):
+                if run and (slot != run[-1] + 1 or len(run) >= config['chunk_size']):
+                    units[(chain, 'in')].add((run[0], run[-1], False))
+                    run = []
+                run.append(slot)
+            units[(chain, 'in')].add((run[0], run[-1], False))
+
+        if kind == 'evm':
+            for direction in wanted:
+                if (chain, direction) in units:
+                    units[(chain, direction)] = {(start, end, False) for start, end in disjoint(units[(chain, direction)])}
+
+    return {name: sorted(ranges, key=lambda unit: (unit[0] is not None, unit[0] or 0, unit[1] or 0))
+            for name, ranges in units.items()}
+
+async def replay_unit_async(chain, direction, config, unit, part_file):
+    scanner = scanner_for(chain, direction, config)
+    start, end, descending = unit
+    if config['kind'] == 'sui':
+        rows = scanner.iter_events(time_range=(start, end) if start is not None else None, descending=descending)
+    else:
+        rows = scanner.iter_chunk(start, end)
+    try:
+        with CSVSink(part_file, scanner.header) as sink:
+            async for row in rows:
+                sink.write(row)
+            return sink.rows_written
+    finally:
+        await close_transport()
+
+def replay_unit(capture_dir, chain, direction, config, unit, part_file):
+    # Runs in a worker process; its replay index is built on the first unit and reused after
+    replay = get_replay() or enable_replay(capture_dir)
+    misses = replay.misses
+    rows = asyncio.run(replay_unit_async(chain, direction, config, unit, part_file))
+    return rows, replay.misses - misses
+
+def merge_parts(part_files, output_file, unique=False):
+    # With `unique`, rows already written by an earlier part are dropped (for fixed-column
+    # outputs only, where equal rows are the same event)
+    seen = set()
+    with open(output_file, 'w', newline='') as out:
+        wrote_header = False
+        for part_file in part_files:
+            if not os.path.exists(part_file):
+                continue
+            with open(part_file, newline='') as part:
+                header = part.readline()
+                if not wrote_header:
+                    out.write(header)
+                    wrote_header = True
+                if not unique:
+                    shutil.copyfileobj(part, out)
+                    continue
+                for line in part:
+                    digest = hashlib.blake2b(line.encode(), digest_size=16).digest()
+                    if digest not in seen:
+                        seen.add(digest)
+                        out.write(line)
+
+def replay(capture_dir, chains, directions, registry, output_dir='.', workers=None):
+    """Re-run the decode and write stages of every scan in a capture, offline, on a process pool."""
+    units = find_units(capture_dir, registry, chains, directions)
+    work_dir = os.path.join(output_dir, '.replay')
+    os.makedirs(work_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    print(f"Replaying {sum(len(ranges) for ranges in units.values())} scan ranges of {len(units)} scanners "
+          f"from {capture_dir} on {workers} processes")
+
+    started = time.perf_counter()
+    parts = {}
+    rows = defaultdict(int)
+    misses = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for (chain, direction), ranges in units.items():
+            parts[(chain, direction)] = []
+            for i, unit in enumerate(ranges):
+                part_file = os.path.join(work_dir, f"{chain}_{direction}_{i:06d}.csv")
+                parts[(chain, direction)].append(part_file)
+                futures[pool.submit(replay_unit, capture_dir, chain, direction, registry[chain], unit, part_file)] = (chain, direction, unit)
+        for future in as_completed(futures):
+            chain, direction, unit = futures[future]
+            try:
+                unit_rows, unit_misses = future.result()
+            except Exception as e:
+                print(f"{chain}/{direction} {unit[0]}-{unit[1]} failed: {str(e)}")
+                continue
+            rows[(chain, direction)] += unit_rows
+            misses += unit_misses
+
+    os.makedirs(output_dir, exist_ok=True)
+    for (chain, direction), part_files in parts.items():
+        output_file = os.path.join(output_dir, scanner_for(chain, direction, registry[chain]).output_name)
+        # Sui event queries can overlap (an open-ended query and time windows); their columns are fixed
+        merge_parts(part_files, output_file, unique=registry[chain]['kind'] == 'sui')
+        print(f"  {chain}/{direction:<4} {rows[(chain, direction)]:>8} rows -> {output_file}")
+    shutil.rmtree(work_dir)
+    print(f"Replayed in {time.perf_counter() - started:.1f}s; {misses} requests were not in the capture")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-run the scanners over captured RPC responses, without network access')
+    parser.add_argument('--capture', required=True, help='directory written with --capture / CCTP_CAPTURE')
+    parser.add_argument('--registry', help='JSON file overriding chain settings')
+    parser.add_argument('--chains', help='comma separated chain names (default: every chain in the capture)')
+    parser.add_argument('--directions', default='in,out', help='comma separated: in,out')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    parser.add_argument('--receipts', action='store_true', help='fill the receipt columns of inbound EVM rows (if captured)')
+    parser.add_argument('--columns', help='comma separated EVM output columns')
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    for config in registry.values():
+        if args.receipts:
+            config['receipts'] = True
+        if args.columns:
+            config['columns'] = parse_columns(args.columns)
+    captured = [name for name in registry if segment_files(args.capture, name)]
+    chains = args.chains.split(',') if args.chains else captured
+    unknown = [chain for chain in chains if chain not in registry]
+    if unknown:
+        parser.error(f"unknown chains: {', '.join(unknown)}")
+    replay(args.capture, chains, args.directions.split(','), registry, args.output_dir, args.workers)
+
+if __name__ == "__main__":
+    main()
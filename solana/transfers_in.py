@@ -1,25 +1,47 @@
-import aiohttp
 import asyncio
 from datetime import datetime
-import csv
 import json
 import base64
+import os
 import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.message import parse_header
+from common.profiling import profile_flag, profiling
+from common.providers import post_json
+from common.sinks import CSVSink
+from common.tracing import span
+from common.transport import close_transport
+
+SOLANA_RPC_URL = "https://solana-mainnet.g.alchemy.com/v2/AMsnqGqzMboS_tNkYDeec0MleUfhykIR"
 
 # Message transmitter program ID
 MESSAGE_TRANSMITTER = "CCTPiPYPc6AsJuwueEnWgSgucamXDZwBd53dQ11YiKX3"
+# Anchor discriminator of the message transmitter's receive_message: sha256("global:receive_message")[:8]
+RECEIVE_MESSAGE_DISCRIMINATOR = bytes.fromhex('26907fe11fe1ee19')
+
+CSV_HEADER = [
+    'slot_number',
+    'transaction_hash',
+    'timestamp',
+    'block_hash',
+    'usdc_receiver',
+    'usdc_amount',
+    'cctp_nonce'
+]
 
 async def get_slot(session, url):
-    async with session.post(url, json={
+    data = await post_json(session, url, {
         "jsonrpc": "2.0",
         "id": 1,
         "method": "getSlot",
-    }) as response:
-        data = await response.json()
-        return data['result']
+    })
+    return data['result']
 
 async def get_block(session, url, slot):
-    async with session.post(url, json={
+    return await post_json(session, url, {
         "jsonrpc": "2.0",
         "id": 1,
         "method": "getBlock",
@@ -32,11 +54,10 @@ async def get_block(session, url, slot):
                 "rewards": False
             }
         ]
-    }) as response:
-        return await response.json()
+    })
 
 async def get_transaction(session, url, signature):
-    async with session.post(url, json={
+    return await post_json(session, url, {
         "jsonrpc": "2.0",
         "id": 1,
         "method": "getTransaction",
@@ -47,14 +68,13 @@ async def get_transaction(session, url, signature):
                 "maxSupportedTransactionVersion": 0,
             }
         ]
-    }) as response:
-        return await response.json()
+    })
 
 def extract_nonce_from_instructions(transaction):
     CCTP_PROGRAM = "CCTPmbSD7gX1bxKPAmg77w8oFzNFpaQiQUWD43TKaecd"
     
     try:
-        # Look for the first instruction to the CCTP program
+        # Look for the receive_message instruction to the CCTP program
         instructions = transaction['transaction']['message']['instructions']
         account_keys = transaction['transaction']['message']['accountKeys']
         
@@ -65,23 +85,15 @@ def extract_nonce_from_instructions(transaction):
                     import base58
                     # Decode the base58 instruction data
                     data = base58.b58decode(instruction['data'])
+                    if data[:8] != RECEIVE_MESSAGE_DISCRIMINATOR:
+                        continue
                     
-                    # Convert to hex for debugging
-                    hex_data = data.hex()
-                    print(f"Instruction data (hex): {hex_data}")
-                    
-                    # Extract the nonce from specific position (may need adjustment)
-                    # Looking for a 2-byte value
-                    # Try different offsets to find the correct position
-                    for i in range(len(data)-2):
-                        nonce_candidate = int.from_bytes(data[i:i+2], 'little')
-                        if nonce_candidate == 5145:  # Known good value for testing
-                            print(f"Found nonce at offset {i}")
-                            return str(nonce_candidate)
-                    
-                    # If we don't find the exact match, try the most likely position
-                    nonce = int.from_bytes(data[20:22], 'little')
-                    return str(nonce)
+                    # Borsh params: message as a u32-LE length-prefixed Vec<u8>, then the attestation
+                    length = int.from_bytes(data[8:12], 'little')
+                    if len(data) < 12 + length:
+                        raise ValueError(f"message of {length} bytes in {len(data) - 12} bytes of data")
+                    header, _ = parse_header(data[12:12 + length])
+                    return str(header.nonce)
                 except Exception as e:
                     print(f"Error decoding instruction data: {str(e)}")
                     return None
@@ -111,79 +123,78 @@ def get_usdc_info(transaction):
         return None, None
 
 async def save_transaction_details(session, url, signature):
-    tx_data = await get_transaction(session, url, signature)
+    with span('get_transaction', 'solana', tx=signature):
+        tx_data = await get_transaction(session, url, signature)
     if 'result' in tx_data and tx_data['result']:
         with open('test.json', 'w') as f:
             json.dump(tx_data['result'], f, indent=2)
         print(f"Transaction details saved to test.json")
     return tx_data.get('result')
 
-async def get_cctp_transactions(start_slot, end_slot, output_file):
-    url = "https://solana-mainnet.g.alchemy.com/v2/AMsnqGqzMboS_tNkYDeec0MleUfhykIR"
-    
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'slot_number',
-            'transaction_hash',
-            'timestamp',
-            'block_hash',
-            'usdc_receiver',
-            'usdc_amount',
-            'cctp_nonce'
-        ])
-    
-    async with aiohttp.ClientSession() as session:
-        for slot in range(start_slot, end_slot + 1):
-            try:
+async def iter_cctp_transactions(session, url, start_slot, end_slot):
+    for slot in range(start_slot, end_slot + 1):
+        try:
+            with span('get_block', 'solana', slot=slot):
                 block = await get_block(session, url, slot)
+            
+            if 'result' in block and block['result']:
+                block_data = block['result']
                 
-                if 'result' in block and block['result']:
-                    block_data = block['result']
-                    
-                    if 'transactions' in block_data:
-                        for tx in block_data['transactions']:
-                            # Check if the transaction involves the message transmitter program
-                            if any(account == MESSAGE_TRANSMITTER 
-                                  for account in tx['transaction']['message']['accountKeys']):
-                                
-                                timestamp = datetime.fromtimestamp(block_data['blockTime'])
-                                tx_hash = tx['transaction']['signatures'][0]
-                                
-                                # Extract additional information
+                if 'transactions' in block_data:
+                    for tx in block_data['transactions']:
+                        # Check if the transaction involves the message transmitter program
+                        if any(account == MESSAGE_TRANSMITTER 
+                              for account in tx['transaction']['message']['accountKeys']):
+                            
+                            timestamp = datetime.fromtimestamp(block_data['blockTime'])
+                            tx_hash = tx['transaction']['signatures'][0]
+                            
+                            # Extract additional information
+                            with span('decode', 'solana', tx=tx_hash):
                                 nonce = extract_nonce_from_instructions(tx)
                                 usdc_receiver, usdc_amount = get_usdc_info(tx)
-                                
-                                with open(output_file, 'a', newline='') as f:
-                                    writer = csv.writer(f)
-                                    writer.writerow([
-                                        slot,
-                                        tx_hash,
-                                        timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                                        block_data['blockhash'],
-                                        usdc_receiver,
-                                        usdc_amount,
-                                        nonce
-                                    ])
-                                
-                                print(f"Found CCTP transaction in slot {slot}: {tx_hash}")
-                                print(f"USDC Receiver: {usdc_receiver}")
-                                print(f"CCTP Nonce: {nonce}")
-                                
-                                # Save the first CCTP transaction we find to test.json
-                                await save_transaction_details(session, url, tx_hash)
-                                return  # Exit after saving the first transaction
-                
-            except Exception as e:
-                print(f"Error processing slot {slot}: {str(e)}")
-                continue
+                            
+                            print(f"Found CCTP transaction in slot {slot}: {tx_hash}")
+                            print(f"USDC Receiver: {usdc_receiver}")
+                            print(f"CCTP Nonce: {nonce}")
+                            
+                            yield [
+                                slot,
+                                tx_hash,
+                                timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                                block_data['blockhash'],
+                                usdc_receiver,
+                                usdc_amount,
+                                nonce
+                            ]
+            
+        except Exception as e:
+            print(f"Error processing slot {slot}: {str(e)}")
+            continue
+
+async def get_cctp_transactions(start_slot, end_slot, output_file):
+    url = SOLANA_RPC_URL
+    
+    # session=None: requests go through the shared keep-alive session for the RPC host
+    session = None
+    
+    with CSVSink(output_file, CSV_HEADER) as sink:
+        async for row in iter_cctp_transactions(session, url, start_slot, end_slot):
+            sink.write(row)
+            
+            # Save the first CCTP transaction we find to test.json
+            await save_transaction_details(session, url, row[1])
+            return  # Exit after saving the first transaction
 
 async def main():
-    async with aiohttp.ClientSession() as session:
-        url = "https://solana-mainnet.g.alchemy.com/v2/AMsnqGqzMboS_tNkYDeec0MleUfhykIR"
-        current_slot = await get_slot(session, url)
+    try:
+        url = SOLANA_RPC_URL
+        current_slot = await get_slot(None, url)
         start_slot = current_slot - 1000  # Last 1000 slots
         await get_cctp_transactions(start_slot, current_slot, 'solana_cctp_transactions.csv')
+    finally:
+        await close_transport()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with profiling('solana_cctp_transactions.csv', profile_flag()):
+        asyncio.run(main())
\ No newline at end of file
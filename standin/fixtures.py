@@ -0,0 +1,362 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+
+from eth_abi import decode, encode
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_DIR = os.path.join(REPO_ROOT, 'x) example_outputs')
+
+# Multicall3 aggregate3 is answered from the fixture's own eth_call results
+MULTICALL3 = '0xca11bde05977b3631167028862be2a173976ca11'
+AGGREGATE3 = '0x82ad56cb'
+
+# Recorded Sui transactions (sui_getTransactionBlock responses) shipped with the repo
+SUI_EXAMPLES = ['sui_deposit_for_burn.json', 'sui_message_receive.json']
+
+
+def fake_hash(*parts) -> str:
+    """Deterministic 32-byte hex hash for synthesized blocks and transactions."""
+    return '0x' + hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+class EVMFixture:
+    """Logs, transactions, receipts and eth_call results for one EVM chain.
+
+    Logs, transactions and receipts are stored exactly as a JSON-RPC node returns them
+    (hex quantities). Anything a fixture doesn't record is synthesized: blocks are derived
+    from `genesis_time`/`block_time`, transactions and receipts from the logs they emitted.
+    """
+
+    def __init__(self, name: str, data: Dict[str, Any]):
+        self.name = name
+        self.chain_id = data.get('chain_id', 1)
+        self.genesis_time = data.get('genesis_time', 1700000000)
+        self.block_time = data.get('block_time', 12)
+        self.blocks = {int(number): block for number, block in data.get('blocks', {}).items()}
+        self.transactions = {tx_hash.lower(): tx for tx_hash, tx in data.get('transactions', {}).items()}
+        self.receipts = {tx_hash.lower(): receipt for tx_hash, receipt in data.get('receipts', {}).items()}
+        # eth_call results keyed by "<to>:<calldata>" or "<to>:<4-byte selector>"
+        self.calls = {key.lower(): result for key, result in data.get('calls', {}).items()}
+
+        self.logs = sorted(data.get('logs', []), key=lambda log: (int(log['blockNumber'], 16), int(log['logIndex'], 16)))
+        self._log_blocks = [int(log['blockNumber'], 16) for log in self.logs]
+        self._logs_by_tx = {}
+        for log in self.logs:
+            self._logs_by_tx.setdefault(log['transactionHash'].lower(), []).append(log)
+        # Block each contract was deployed at: recorded, else the block of its first log
+        self.deployed = {address.lower(): int(number) for address, number in data.get('deployed', {}).items()}
+        for log in self.logs:
+            self.deployed.setdefault(log['address'].lower(), int(log['blockNumber'], 16))
+
+        last_log_block = self._log_blocks[-1] if self._log_blocks else 0
+        self.head = data.get('head', max([last_log_block, *self.blocks]) if self.blocks or self.logs else 1000)
+
+        self.reorgs = sorted(data.get('reorgs', []), key=lambda reorg: reorg['block'])
+        self.loaded_at = time.monotonic()
+        # Live mode: (first visible head, seconds per block, when it started); see go_live
+        self.live = None
+
+    def go_live(self, behind: int, block_time: float):
+        """Start the visible head `behind` blocks short of the fixture's and advance it one block
+        every `block_time` seconds, so head-following scanners see blocks arrive."""
+        self.live = (max(0, self.head - behind), block_time, time.monotonic())
+
+    def tip(self) -> int:
+        """Current head: the fixture's last block, or the live head while it catches up to it."""
+        if self.live is None:
+            return self.head
+        start, block_time, started = self.live
+        return min(self.head, start + int((time.monotonic() - started) / block_time))
+
+    def active_reorgs(self) -> List[Dict]:
+        if not self.reorgs:
+            return []
+        elapsed = time.monotonic() - self.loaded_at
+        return [reorg for reorg in self.reorgs if elapsed < reorg.get('resolve_after', 0)]
+
+    def block_hash(self, number: int) -> str:
+        for reorg in self.active_reorgs():
+            if reorg['block'] <= number < reorg['block'] + reorg.get('depth', 1):
+                return reorg['hashes'][number - reorg['block']]
+            if number >= reorg['block']:
+                # Blocks built on a live fork are on the fork too, as on a real chain
+                return fake_hash(self.name, 'fork', reorg['block'], number)
+        block = self.blocks.get(number)
+        return block['hash'] if block and 'hash' in block else fake_hash(self.name, 'block', number)
+
+    def get_block(self, number: int) -> Optional[Dict]:
+        if number < 0 or number > self.tip():
+            return None
+        recorded = self.blocks.get(number, {})
+        zero = '0x' + '00' * 32
+        block = {
+            'number': hex(number),
+            'hash': self.block_hash(number),
+            'parentHash': self.block_hash(number - 1) if number > 0 else zero,
+            'timestamp': hex(int(self.genesis_time + number * self.block_time)),
+            'transactions': sorted({log['transactionHash'] for log in self.logs_in_range(number, number)}),
+            'miner': '0x' + '00' * 20, 'extraData': '0x', 'gasLimit': hex(30_000_000), 'gasUsed': '0x0',
+            'difficulty': '0x0', 'totalDifficulty': '0x0', 'size': '0x0', 'nonce': '0x0000000000000000',
+            'logsBloom': '0x' + '00' * 256, 'sha3Uncles': zero, 'stateRoot': zero, 'transactionsRoot': zero,
+            'receiptsRoot': zero, 'mixHash': zero, 'uncles': [], 'baseFeePerGas': '0x0'
+        }
+        block.update(recorded)
+        return block
+
+    def get_code(self, address: str, number: int) -> str:
+        # Contracts without logs (tokens, Multicall3) are there from genesis
+        if number < self.deployed.get(address.lower(), 0):
+            return '0x'
+        return '0x' + fake_hash(self.name, 'code', address.lower())[2:]
+
+    def logs_in_range(self, from_block: int, to_block: int) -> List[Dict]:
+        to_block = min(to_block, self.tip())
+        logs = self.logs[bisect_left(self._log_blocks, from_block):bisect_right(self._log_blocks, to_block)]
+        active = self.active_reorgs()
+        if not active:
+            return logs
+        # While a fork is live its transactions are only visible in their orphaned blocks
+        orphaned = [log for reorg in active for log in reorg['logs']]
+        hidden = {log['transactionHash'] for log in orphaned}
+        logs = [log for log in logs if log['transactionHash'] not in hidden]
+        logs += [log for log in orphaned if from_block <= int(log['blockNumber'], 16) <= to_block]
+        return sorted(logs, key=lambda log: (int(log['blockNumber'], 16), int(log['logIndex'], 16)))
+
+    def get_logs(self, from_block: int, to_block: int, address=None, topics=None, block_hash=None) -> List[Dict]:
+        if block_hash is not None:
+            logs = self.logs + [log for reorg in self.active_reorgs() for log in reorg['logs']]
+            return [log for log in logs if log['blockHash'].lower() == block_hash.lower()
+                    and self._matches(log, address, topics)]
+        return [log for log in self.logs_in_range(from_block, to_block) if self._matches(log, address, topics)]
+
+    def tx_logs(self, tx_hash: str) -> List[Dict]:
+        for reorg in self.active_reorgs():
+            orphaned = [log for log in reorg['logs'] if log['transactionHash'].lower() == tx_hash]
+            if orphaned:
+                return orphaned
+        return self._logs_by_tx.get(tx_hash, [])
+
+    def _matches(self, log, address, topics) -> bool:
+        if address is not None:
+            addresses = address if isinstance(address, list) else [address]
+            if log['address'].lower() not in {a.lower() for a in addresses}:
+                return False
+        return not topics or self._topics_match(log['topics'], topics)
+
+    @staticmethod
+    def _topics_match(log_topics, wanted):
+        for position, expected in enumerate(wanted):
+            if expected is None:
+                continue
+            if position >= len(log_topics):
+                return False
+            options = expected if isinstance(expected, list) else [expected]
+            if log_topics[position].lower() not in {option.lower() for option in options}:
+                return False
+        return True
+
+    def get_transaction(self, tx_hash: str) -> Optional[Dict]:
+        # Recorded fields (possibly just from/to) win over synthesized ones
+        tx_hash = tx_hash.lower()
+        recorded = self.transactions.get(tx_hash, {})
+        logs = self.tx_logs(tx_hash)
+        if not logs:
+            return recorded or None
+        first = logs[0]
+        return {**{
+            'hash': first['transactionHash'], 'blockNumber': first['blockNumber'], 'blockHash': first['blockHash'],
+            'transactionIndex': first.get('transactionIndex', '0x0'), 'from': '0x' + tx_hash[-40:],
+            'to': first['address'], 'input': '0x', 'value': '0x0', 'gas': hex(300_000), 'gasPrice': '0x1',
+            'nonce': '0x0', 'type': '0x2', 'chainId': hex(self.chain_id), 'v': '0x0', 'r': '0x0', 's': '0x0'
+        }, **recorded}
+
+    def get_receipt(self, tx_hash: str) -> Optional[Dict]:
+        tx_hash = tx_hash.lower()
+        if tx_hash in self.receipts:
+            return self.receipts[tx_hash]
+        tx = self.get_transaction(tx_hash)
+        if tx is None:
+            return None
+        return {
+            'transactionHash': tx['hash'], 'blockNumber': tx['blockNumber'], 'blockHash': tx['blockHash'],
+            'transactionIndex': tx['transactionIndex'], 'from': tx['from'], 'to': tx['to'],
+            'logs': self.tx_logs(tx_hash), 'status': '0x1', 'gasUsed': hex(100_000),
+            'cumulativeGasUsed': hex(100_000), 'effectiveGasPrice': '0x1', 'contractAddress': None,
+            'logsBloom': '0x' + '00' * 256, 'type': tx.get('type', '0x2')
+        }
+
+    def call(self, to: str, data: str) -> Optional[str]:
+        to, data = to.lower(), data.lower()
+        if to == MULTICALL3 and data.startswith(AGGREGATE3):
+            return self.aggregate3(data)
+        return self.calls.get(f"{to}:{data}", self.calls.get(f"{to}:{data[:10]}"))
+
+    def aggregate3(self, data: str) -> Optional[str]:
+        results = []
+        for target, allow_failure, call_data in decode(['(address,bool,bytes)[]'], bytes.fromhex(data[10:]))[0]:
+            result = self.call(target, '0x' + call_data.hex())
+            if result is None and not allow_failure:
+                return None
+            results.append((result is not None, bytes.fromhex(result[2:]) if result is not None else b''))
+        return '0x' + encode(['(bool,bytes)[]'], [results]).hex()
+
+
+class SolanaFixture:
+    """Blocks, transactions and signature lists for Solana.
+
+    With `first_slot`/`genesis_time`/`slot_time` set, slots between `first_slot` and the
+    head that weren't recorded come back as empty blocks instead of skipped slots.
+    """
+
+    def __init__(self, name: str, data: Dict[str, Any]):
+        self.name = name
+        self.blocks = {int(slot): block for slot, block in data.get('blocks', {}).items()}
+        self.transactions = data.get('transactions', {})
+        # Signature lists per address, newest first like getSignaturesForAddress returns them
+        self.signatures = data.get('signatures', {})
+        self.slot = data.get('slot', max(self.blocks) if self.blocks else 1000)
+        self.first_slot = data.get('first_slot')
+        self.genesis_time = data.get('genesis_time', 0)
+        self.slot_time = data.get('slot_time', 0.4)
+        self.skipped_slots = set(data.get('skipped_slots', []))
+
+    def get_block(self, slot: int) -> Optional[Dict]:
+        if slot in self.blocks:
+            return self.blocks[slot]
+        if self.first_slot is None or not self.first_slot <= slot <= self.slot or slot in self.skipped_slots:
+            return None
+        return {
+            'blockTime': int(self.genesis_time + slot * self.slot_time), 'blockhash': fake_hash(self.name, 'block', slot),
+            'parentSlot': slot - 1, 'blockHeight': slot, 'transactions': []
+        }
+
+    def get_transaction(self, signature: str) -> Optional[Dict]:
+        return self.transactions.get(signature)
+
+    def get_signatures(self, address: str, limit: int = 1000, before: Optional[str] = None) -> List[Dict]:
+        signatures = self.signatures.get(address, [])
+        if before is not None:
+            index = next((i for i, info in enumerate(signatures) if info['signature'] == before), None)
+            signatures = signatures[index + 1:] if index is not None else []
+        return signatures[:limit]
+
+
+class SuiFixture:
+    def __init__(self, name: str, data: Dict[str, Any]):
+        self.name = name
+        self.transactions = dict(data.get('transactions', {}))
+        self.checkpoints = {int(seq): int(ts) for seq, ts in data.get('checkpoints', {}).items()}
+        self.events = list(data.get('events', []))
+
+        # Recorded transactions carry their events; expose them to suix_queryEvents as well
+        known = {(event['id']['txDigest'], event['id']['eventSeq']) for event in self.events}
+        for digest, tx in self.transactions.items():
+            self.checkpoints.setdefault(int(tx.get('checkpoint', 0)), int(tx.get('timestampMs', 0)))
+            for event in tx.get('events', []):
+                if (event['id']['txDigest'], event['id']['eventSeq']) not in known:
+                    self.events.append({**event, 'timestampMs': tx.get('timestampMs')})
+        self.events.sort(key=lambda event: (int(event.get('timestampMs') or 0), event['id']['txDigest'], int(event['id']['eventSeq'])))
+        # Live mode: (events hidden at the start, seconds per event, when it started); see go_live
+        self.live = None
+
+    def go_live(self, behind: int, interval: float):
+        """Hide the newest `behind` events and reveal them one every `interval` seconds."""
+        self.live = (behind, interval, time.monotonic())
+
+    def visible_events(self) -> List[Dict]:
+        if self.live is None:
+            return self.events
+        behind, interval, started = self.live
+        hidden = max(0, behind - int((time.monotonic() - started) / interval))
+        return self.events[:len(self.events) - hidden]
+
+    @staticmethod
+    def _event_matches(event, event_filter) -> bool:
+        if not event_filter:
+            return True
+        for compound in ('All', 'Any', 'And', 'Or'):
+            if compound in event_filter:
+                raise ValueError(f"{compound} event filter is not supported by the full node")
+        if 'MoveEventType' in event_filter:
+            return event['type'] == event_filter['MoveEventType']
+        if 'MoveModule' in event_filter:
+            module = event_filter['MoveModule']
+            return event['packageId'] == module['package'] and event['transactionModule'] == module['module']
+        if 'Transaction' in event_filter:
+            return event['id']['txDigest'] == event_filter['Transaction']
+        if 'Sender' in event_filter:
+            return event['sender'] == event_filter['Sender']
+        if 'TimeRange' in event_filter:
+            time_range = event_filter['TimeRange']
+            return int(time_range['startTime']) <= int(event.get('timestampMs') or 0) < int(time_range['endTime'])
+        raise ValueError(f"Unsupported event filter: {list(event_filter)}")
+
+    def query_events(self, event_filter, cursor=None, limit=50, descending=False) -> Dict:
+        events = [event for event in self.visible_events() if self._event_matches(event, event_filter)]
+        if descending:
+            events.reverse()
+        if cursor:
+            ids = [(event['id']['txDigest'], event['id']['eventSeq']) for event in events]
+            key = (cursor['txDigest'], cursor['eventSeq'])
+            events = events[ids.index(key) + 1:] if key in ids else []
+        page = events[:limit or 50]
+        return {
+            'data': page,
+            'nextCursor': page[-1]['id'] if page else cursor,
+            'hasNextPage': len(events) > len(page)
+        }
+
+    def get_transaction(self, digest: str) -> Optional[Dict]:
+        return self.transactions.get(digest)
+
+
+FIXTURE_TYPES = {
+    'evm': EVMFixture,
+    'solana': SolanaFixture,
+    'sui': SuiFixture,
+}
+
+def seed_sui_examples(examples_dir: str = EXAMPLES_DIR) -> Dict[str, Any]:
+    transactions = {}
+    for filename in SUI_EXAMPLES:
+        path = os.path.join(examples_dir, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            tx = json.load(f)['rawTransaction']['result']
+        transactions[tx['digest']] = tx
+    return {'kind': 'sui', 'transactions': transactions}
+
+def load_fixtures(fixtures_dir: Optional[str] = None, registry: Optional[Dict] = None) -> Dict[str, Any]:
+    """Fixtures for every chain in the registry, keyed by chain name.
+
+    `fixtures_dir` holds one `<chain>.json` per chain ({"kind": "evm" | "solana" | "sui", ...}).
+    Sui always starts from the transactions recorded in `x) example_outputs/`; chains
+    without a fixture file get an empty one so scanners still see a head and empty ranges.
+    """
+    from common.registry import CHAINS
+    registry = registry or CHAINS
+
+    data = {name: {'kind': config['kind']} for name, config in registry.items()}
+    data.setdefault('sui', {'kind': 'sui'}).update(seed_sui_examples())
+
+    if fixtures_dir:
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.json'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name == 'manifest':
+                # Written by the generator next to its fixtures
+                continue
+            with open(path) as f:
+                fixture = json.load(f)
+            if name == 'sui':
+                # Merge rather than replace so the recorded examples stay available
+                seeded = data['sui']
+                fixture['transactions'] = {**seeded.get('transactions', {}), **fixture.get('transactions', {})}
+            data[name] = {**data.get(name, {}), **fixture}
+
+    return {name: FIXTURE_TYPES[fixture['kind']](name, fixture) for name, fixture in data.items()}
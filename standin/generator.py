@@ -0,0 +1,608 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from web3 import Web3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.registry import CHAINS, load_scanner_module
+from standin.fixtures import fake_hash
+
+# Typical block/slot times and a realistic starting height, so synthesized heights look like mainnet
+EVM_PARAMS = {
+    'ethereum': {'block_time': 12, 'first_block': 21_000_000, 'chain_id': 1},
+    'avalanche': {'block_time': 2, 'first_block': 53_000_000, 'chain_id': 43114},
+    'optimism': {'block_time': 2, 'first_block': 128_000_000, 'chain_id': 10},
+    'arbitrum': {'block_time': 0.25, 'first_block': 270_000_000, 'chain_id': 42161},
+    'base': {'block_time': 2, 'first_block': 22_000_000, 'chain_id': 8453},
+    'polygon': {'block_time': 2, 'first_block': 64_000_000, 'chain_id': 137},
+}
+SOLANA_SLOT_TIME = 0.4
+SOLANA_FIRST_SLOT = 300_000_000
+SUI_CHECKPOINTS_PER_SECOND = 4
+SUI_FIRST_CHECKPOINT = 97_000_000
+
+MESSAGE_SENT_TOPIC = '0x' + Web3.keccak(text='MessageSent(bytes)').hex().replace('0x', '')
+MINT_AND_WITHDRAW_TOPIC = '0x' + Web3.keccak(text='MintAndWithdraw(address,uint256,address)').hex().replace('0x', '')
+
+SOLANA_TOKEN_MESSENGER_MINTER = 'CCTPiPYPc6AsJuwueEnWgSgucamXDZwBd53dQ11YiKX3'
+SOLANA_MESSAGE_TRANSMITTER = 'CCTPmbSD7gX1bxKPAmg77w8oFzNFpaQiQUWD43TKaecd'
+SOLANA_USDC_MINT = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'
+# Anchor discriminator of receive_message: sha256('global:receive_message')[:8]
+RECEIVE_MESSAGE_DISCRIMINATOR = bytes.fromhex('26907fe11fe1ee19')
+SUI_TOKEN_MESSENGER = '0x2aa6c5d56376c371f88a6cc42e852824994993cb9bab8d3e6450cbe3cb32b94e'
+SUI_MESSAGE_TRANSMITTER = '0x08d87d37ba49e785dde270a83f8e979605b03dc552b5548f26fdf2f49bf7ed1b'
+SUI_USDC = '0xdba34672e30cb065b1f93e3ab55318768fd6fef66c15942c9f7cb846e2f900e7::usdc::USDC'
+
+B58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# matched: burn and mint generated; pending: burn only, the mint hasn't happened yet;
+# unmatched: mint only, its burn predates the data set; external: the other side isn't a generated chain
+STATUSES = ['matched', 'pending', 'unmatched', 'external']
+
+
+def b58encode(data: bytes) -> str:
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = B58_ALPHABET[remainder] + encoded
+    return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
+
+def b58decode(text: str) -> bytes:
+    number = 0
+    for char in text:
+        number = number * 58 + B58_ALPHABET.index(char)
+    body = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    return b'\0' * (len(text) - len(text.lstrip('1'))) + body
+
+def word(value) -> bytes:
+    """32-byte ABI word for an int, 20-byte address or 32-byte id."""
+    if isinstance(value, int):
+        return value.to_bytes(32, 'big')
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith('0x') else value)
+    return value.rjust(32, b'\0')
+
+def hex32(value) -> str:
+    return '0x' + word(value).hex()
+
+def parse_burst(text: str) -> Tuple[float, float, float]:
+    """"<start>:<duration>:<multiplier>", seconds from the generator's start time."""
+    start, duration, multiplier = (float(part) for part in text.split(':'))
+    return start, duration, multiplier
+
+
+class CCTPGenerator:
+    """Synthesizes CCTP v1 burns and their matching mints as stand-in fixtures.
+
+    Every transfer gets a per-source-domain nonce, a real CCTP message (header + BurnMessage)
+    and the logs/events each chain would emit for it: USDC Transfer, MessageSent and
+    DepositForBurn on an EVM source; MessageReceived, the USDC mint Transfer and
+    MintAndWithdraw on an EVM destination; a receive_message transaction on Solana and
+    MessageReceived / DepositForBurn events on Sui. Domains without a generated chain
+    (e.g. Noble) still send and receive, only their side isn't emitted.
+
+    `pending_ratio` of the transfers stop after the burn and `unmatched_ratio` only show
+    their mint. With `reorg_ratio`, that fraction of EVM blocks carrying CCTP logs is first
+    served as a fork `reorg_depth` blocks deep, which the stand-in resolves after
+    `reorg_resolve_after` seconds; the transactions are re-included right after the fork.
+
+    Output is either stand-in fixtures (`generate` then `write`) or a stream of raw
+    objects (`stream`) that never holds more than one transfer in memory.
+    """
+
+    def __init__(self, chains: Optional[List[str]] = None, seed: int = 0, start_time: int = 1704067200,
+                 pending_ratio: float = 0.0, unmatched_ratio: float = 0.0, reorg_ratio: float = 0.0,
+                 reorg_depth: int = 1, reorg_resolve_after: Tuple[float, float] = (5.0, 60.0)):
+        self.chains = chains or list(CHAINS)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.start_time = start_time
+        self.pending_ratio = pending_ratio
+        self.unmatched_ratio = unmatched_ratio
+        self.reorg_ratio = reorg_ratio
+        self.reorg_depth = reorg_depth
+        self.reorg_resolve_after = reorg_resolve_after
+
+        self.domain_to_chain = dict(load_scanner_module('ethereum', 'transfers_in').DOMAIN_TO_CHAIN)
+        self.chain_domains = {chain: domain for domain, chain in self.domain_to_chain.items()}
+        self.domains = {CHAINS[chain]['domain']: chain for chain in self.chains}
+        self.nonces = {}
+        self.contracts = {chain: self._evm_contracts(chain) for chain in self.chains if CHAINS[chain]['kind'] == 'evm'}
+        self._remote_ids = {}
+
+        self.store = True
+        self._pending = []
+        self.evm = {chain: {'logs': [], 'transactions': {}, 'reorgs': {}} for chain in self.contracts}
+        self.solana = {'transactions': {}}
+        self.sui = {'events': [], 'transactions': {}}
+        self._counter = 0
+        self.transfers = []
+        self.summary = {'transfers': 0, 'statuses': Counter(), 'chains': defaultdict(Counter), 'last_time': start_time}
+
+    @staticmethod
+    def _evm_contracts(chain: str) -> Dict[str, str]:
+        package = CHAINS[chain]['package']
+        inbound = load_scanner_module(package, 'transfers_in')
+        outbound = load_scanner_module(package, 'transfers_out')
+        return {
+            'transmitter': inbound.MESSAGE_TRANSMITTER.lower(),
+            'messenger': outbound.CIRCLE_TOKEN_MESSENGER.lower(),
+            'usdc': inbound.USDC_ADDRESS.lower(),
+            'transfer_topic': inbound.TRANSFER_EVENT,
+            'received_topic': inbound.MESSAGE_RECEIVED_EVENT,
+            'deposit_topic': outbound.MESSAGE_SENT_EVENT,
+        }
+
+    def _id(self, *parts) -> bytes:
+        self._counter += 1
+        return hashlib.sha256(':'.join(str(part) for part in (self.seed, self._counter, *parts)).encode()).digest()
+
+    def _remote_id(self, kind: str, chain: str) -> bytes:
+        # Stable per chain, for domains whose contracts the repo doesn't know (e.g. Noble)
+        key = (kind, chain)
+        if key not in self._remote_ids:
+            self._remote_ids[key] = hashlib.sha256(f"{kind}:{chain}".encode()).digest()
+        return self._remote_ids[key]
+
+    def messenger_bytes32(self, chain: str) -> bytes:
+        if chain == 'solana':
+            return b58decode(SOLANA_TOKEN_MESSENGER_MINTER)
+        if chain == 'sui':
+            return word(SUI_TOKEN_MESSENGER)
+        if chain in self.contracts:
+            return word(self.contracts[chain]['messenger'])
+        return self._remote_id('messenger', chain)
+
+    def usdc_bytes32(self, chain: str) -> bytes:
+        if chain == 'solana':
+            return b58decode(SOLANA_USDC_MINT)
+        if chain == 'sui':
+            return word('0x' + SUI_USDC.split('::')[0][2:])
+        if chain in self.contracts:
+            return word(self.contracts[chain]['usdc'])
+        return self._remote_id('usdc', chain)
+
+    def emits_burns(self, chain: str) -> bool:
+        # Solana burns aren't scanned by anything in this repo
+        return chain in self.contracts or (chain == 'sui' and 'sui' in self.chains)
+
+    def emits_mints(self, chain: str) -> bool:
+        return chain in self.contracts or (chain in ('solana', 'sui') and chain in self.chains)
+
+    # Heights for a unix time on each chain
+
+    def evm_block(self, chain: str, timestamp: float) -> int:
+        params = EVM_PARAMS[chain]
+        return params['first_block'] + int((timestamp - self.start_time) / params['block_time'])
+
+    def solana_slot(self, timestamp: float) -> int:
+        return SOLANA_FIRST_SLOT + int((timestamp - self.start_time) / SOLANA_SLOT_TIME)
+
+    def sui_checkpoint(self, timestamp: float) -> int:
+        return SUI_FIRST_CHECKPOINT + int((timestamp - self.start_time) * SUI_CHECKPOINTS_PER_SECOND)
+
+    # Messages
+
+    @staticmethod
+    def build_message(source_domain, destination_domain, nonce, sender, recipient, burn_token, mint_recipient, amount, message_sender) -> bytes:
+        body = (0).to_bytes(4, 'big') + burn_token + mint_recipient + amount.to_bytes(32, 'big') + message_sender
+        header = (
+            (0).to_bytes(4, 'big') + source_domain.to_bytes(4, 'big') + destination_domain.to_bytes(4, 'big')
+            + nonce.to_bytes(8, 'big') + sender + recipient + bytes(32)
+        )
+        return header + body
+
+    def transfer(self, source: str, destination_domain: int, amount: int, timestamp: float,
+                 mint_delay: Optional[float] = None, skip: Optional[str] = None) -> Dict[str, Any]:
+        """Add one transfer from `source`; its mint lands `mint_delay` seconds after the burn.
+
+        `skip` is 'mint' for a pending transfer or 'burn' for an unmatched one.
+        """
+        source_domain = self.chain_domains[source]
+        nonce = self.nonces.get(source_domain, 0)
+        self.nonces[source_domain] = nonce + 1
+        destination = self.domain_to_chain.get(destination_domain)
+
+        depositor = self._id('depositor')[-20:] if source in self.contracts else self._id('depositor')
+        mint_recipient = self._id('recipient')[-20:].rjust(32, b'\0') if destination in self.contracts else self._id('recipient')
+        message = self.build_message(
+            source_domain, destination_domain, nonce,
+            self.messenger_bytes32(source), self.messenger_bytes32(destination),
+            self.usdc_bytes32(source), mint_recipient, amount, depositor.rjust(32, b'\0')
+        )
+
+        if mint_delay is None:
+            # Attestations take ~13-19 minutes from Ethereum, well under a minute elsewhere
+            mint_delay = self.random.uniform(780, 1140) if source == 'ethereum' else self.random.uniform(8, 40)
+        transfer = {
+            'source': source, 'source_domain': source_domain, 'destination_domain': destination_domain,
+            'destination': destination, 'nonce': nonce, 'amount': amount, 'timestamp': timestamp,
+            'mint_timestamp': timestamp + mint_delay, 'source_tx': None, 'destination_tx': None
+        }
+        if self.emits_burns(source) and skip != 'burn':
+            transfer['source_tx'] = self._emit_burn(source, transfer, message, depositor, mint_recipient)
+        if self.emits_mints(destination) and skip != 'mint':
+            transfer['destination_tx'] = self._emit_mint(destination, transfer, message, mint_recipient)
+
+        if transfer['source_tx'] and transfer['destination_tx']:
+            transfer['status'] = 'matched'
+        elif transfer['source_tx']:
+            transfer['status'] = 'pending' if skip == 'mint' else 'external'
+        else:
+            transfer['status'] = 'unmatched' if skip == 'burn' else 'external'
+        self._count(transfer)
+        if self.store:
+            self.transfers.append(transfer)
+        return transfer
+
+    def _count(self, transfer):
+        summary = self.summary
+        summary['transfers'] += 1
+        summary['statuses'][transfer['status']] += 1
+        if transfer['source_tx']:
+            summary['chains'][transfer['source']]['burns'] += 1
+            summary['last_time'] = max(summary['last_time'], transfer['timestamp'])
+        if transfer['destination_tx']:
+            summary['chains'][transfer['destination']]['mints'] += 1
+            summary['last_time'] = max(summary['last_time'], transfer['mint_timestamp'])
+
+    def _emit(self, chain: str, kind: str, data: Dict):
+        if not self.store:
+            self._pending.append({'chain': chain, 'kind': kind, 'data': data})
+        elif kind == 'log':
+            self.evm[chain]['logs'].append(data)
+        elif kind == 'orphaned_log':
+            block = int(data['blockNumber'], 16)
+            reorgs = self.evm[chain]['reorgs']
+            if block not in reorgs:
+                reorgs[block] = {**self.reorg_for(chain, block), 'logs': []}
+            reorgs[block]['logs'].append(data)
+        elif kind == 'transaction':
+            self.evm[chain]['transactions'][data['hash']] = data
+        elif kind == 'solana_transaction':
+            self.solana['transactions'][data['transaction']['signatures'][0]] = data
+        elif kind == 'sui_event':
+            self.sui['events'].append(data)
+        elif kind == 'sui_transaction':
+            self.sui['transactions'][data['digest']] = data
+
+    def _emit_burn(self, chain, transfer, message, depositor, mint_recipient):
+        if chain in self.contracts:
+            return self._evm_burn(chain, transfer, message, depositor, mint_recipient)
+        return self._sui_event(transfer, 'burn', message, depositor, mint_recipient)
+
+    def _emit_mint(self, chain, transfer, message, mint_recipient):
+        if chain in self.contracts:
+            return self._evm_mint(chain, transfer, message, mint_recipient)
+        if chain == 'solana':
+            return self._solana_mint(transfer, message, mint_recipient)
+        return self._sui_event(transfer, 'mint', message, None, mint_recipient)
+
+    # EVM
+
+    def reorg_for(self, chain: str, block: int) -> Optional[Dict]:
+        """The fork replacing `block`, if any; derived from the seed so it needs no state."""
+        if not self.reorg_ratio:
+            return None
+        rng = random.Random(f"{self.seed}:{chain}:reorg:{block}")
+        if rng.random() >= self.reorg_ratio:
+            return None
+        return {
+            'block': block, 'depth': self.reorg_depth,
+            'hashes': [fake_hash(chain, 'orphan', number) for number in range(block, block + self.reorg_depth)],
+            'resolve_after': round(rng.uniform(*self.reorg_resolve_after), 3)
+        }
+
+    def _evm_log(self, chain, block, tx_hash, log_index, address, topics, data, block_hash=None):
+        return {
+            'address': address, 'topics': topics, 'data': '0x' + data.hex(),
+            'blockNumber': hex(block), 'blockHash': block_hash or fake_hash(chain, 'block', block),
+            'transactionHash': tx_hash, 'transactionIndex': '0x0', 'logIndex': hex(log_index), 'removed': False
+        }
+
+    def _evm_emit_tx(self, chain, block, sender, to, logs):
+        """Emit a transaction and its logs ([(address, topics, data)]); a reorged one is re-included after the fork."""
+        tx_hash = '0x' + self._id(chain, 'tx').hex()
+        reorg = self.reorg_for(chain, block)
+        if reorg is not None:
+            for log_index, (address, topics, data) in enumerate(logs):
+                self._emit(chain, 'orphaned_log',
+                           self._evm_log(chain, block, tx_hash, log_index, address, topics, data, reorg['hashes'][0]))
+            self.summary['chains'][chain]['reorged_txs'] += 1
+            block += reorg['depth']
+
+        self._emit(chain, 'transaction', {'hash': tx_hash, 'from': '0x' + sender[-20:].hex(), 'to': to})
+        for log_index, (address, topics, data) in enumerate(logs):
+            self._emit(chain, 'log', self._evm_log(chain, block, tx_hash, log_index, address, topics, data))
+        return tx_hash
+
+    def _evm_burn(self, chain, transfer, message, depositor, mint_recipient):
+        contracts = self.contracts[chain]
+        destination_messenger = message[52:84]
+        return self._evm_emit_tx(chain, self.evm_block(chain, transfer['timestamp']), depositor, contracts['messenger'], [
+            (contracts['usdc'], [contracts['transfer_topic'], hex32(depositor), hex32(contracts['messenger'])],
+             word(transfer['amount'])),
+            (contracts['transmitter'], [MESSAGE_SENT_TOPIC],
+             word(32) + word(len(message)) + message.ljust((len(message) + 31) // 32 * 32, b'\0')),
+            (contracts['messenger'],
+             [contracts['deposit_topic'], hex32(transfer['nonce']), hex32(contracts['usdc']), hex32(depositor)],
+             word(transfer['amount']) + mint_recipient + word(transfer['destination_domain']) + destination_messenger + bytes(32)),
+        ])
+
+    def _evm_mint(self, chain, transfer, message, mint_recipient):
+        contracts = self.contracts[chain]
+        relayer = self._id('relayer')
+        body = message[116:]
+        return self._evm_emit_tx(chain, self.evm_block(chain, transfer['mint_timestamp']), relayer, contracts['transmitter'], [
+            (contracts['transmitter'], [contracts['received_topic'], hex32(relayer[-20:]), hex32(transfer['nonce'])],
+             word(transfer['source_domain']) + self.messenger_bytes32(transfer['source'])
+             + word(96) + word(len(body)) + body.ljust((len(body) + 31) // 32 * 32, b'\0')),
+            (contracts['usdc'], [contracts['transfer_topic'], hex32(0), hex32(mint_recipient)], word(transfer['amount'])),
+            (contracts['messenger'], [MINT_AND_WITHDRAW_TOPIC, hex32(mint_recipient), hex32(contracts['usdc'])],
+             word(transfer['amount'])),
+        ])
+
+    # Solana
+
+    def _solana_mint(self, transfer, message, mint_recipient):
+        slot = self.solana_slot(transfer['mint_timestamp'])
+        signature = b58encode(self._id('solana', 'signature') + self._id('solana', 'signature'))
+        payer = b58encode(self._id('solana', 'payer'))
+        # Two 65-byte attester signatures
+        attestation = b''.join(self._id('solana', 'attestation') for _ in range(5))[:130]
+        # receive_message: 8-byte discriminator, then the message and attestation as u32-LE length-prefixed Vec<u8>s
+        data = RECEIVE_MESSAGE_DISCRIMINATOR + b''.join(len(part).to_bytes(4, 'little') + part for part in (message, attestation))
+        self._emit('solana', 'solana_transaction', {
+            'slot': slot,
+            'blockTime': int(transfer['mint_timestamp']),
+            'transaction': {
+                'signatures': [signature],
+                'message': {
+                    'accountKeys': [payer, SOLANA_MESSAGE_TRANSMITTER, SOLANA_TOKEN_MESSENGER_MINTER, b58encode(mint_recipient)],
+                    'instructions': [{'programIdIndex': 1, 'accounts': [0, 2, 3], 'data': b58encode(data)}]
+                }
+            },
+            'meta': {
+                'err': None, 'fee': 5000,
+                'preTokenBalances': [],
+                'postTokenBalances': [{
+                    'accountIndex': 3, 'mint': SOLANA_USDC_MINT, 'owner': b58encode(mint_recipient),
+                    'uiTokenAmount': {'amount': str(transfer['amount']), 'decimals': 6,
+                                      'uiAmountString': str(transfer['amount'] / 1e6)}
+                }],
+                'innerInstructions': []
+            }
+        })
+        return signature
+
+    # Sui
+
+    def _sui_event(self, transfer, kind, message, depositor, mint_recipient):
+        timestamp = transfer['timestamp'] if kind == 'burn' else transfer['mint_timestamp']
+        digest = b58encode(self._id('sui', 'digest'))
+        sender = '0x' + (depositor or self._id('sui', 'relayer')).hex()
+        timestamp_ms = str(int(timestamp * 1000))
+
+        if kind == 'burn':
+            event_type = f"{SUI_TOKEN_MESSENGER}::deposit_for_burn::DepositForBurn"
+            parsed = {
+                'amount': str(transfer['amount']), 'burn_token': '0x' + self.usdc_bytes32('sui').hex(),
+                'depositor': sender, 'destination_caller': hex32(0), 'destination_domain': transfer['destination_domain'],
+                'destination_token_messenger': '0x' + message[52:84].hex(), 'mint_recipient': '0x' + mint_recipient.hex(),
+                'nonce': str(transfer['nonce'])
+            }
+            module, package = 'deposit_for_burn', SUI_TOKEN_MESSENGER
+            balance = -transfer['amount']
+        else:
+            event_type = f"{SUI_MESSAGE_TRANSMITTER}::receive_message::MessageReceived"
+            parsed = {
+                'caller': sender, 'message_body': list(message[116:]), 'nonce': str(transfer['nonce']),
+                'sender': '0x' + self.messenger_bytes32(transfer['source']).hex(), 'source_domain': transfer['source_domain']
+            }
+            module, package = 'receive_message', SUI_MESSAGE_TRANSMITTER
+            balance = transfer['amount']
+
+        event = {
+            'id': {'txDigest': digest, 'eventSeq': '0'}, 'packageId': package, 'transactionModule': module,
+            'sender': sender, 'type': event_type, 'parsedJson': parsed, 'timestampMs': timestamp_ms
+        }
+        self._emit('sui', 'sui_event', event)
+        # Only the parts of sui_getTransactionBlock the queriers read; see x) example_outputs/ for a full response
+        self._emit('sui', 'sui_transaction', {
+            'digest': digest, 'timestampMs': timestamp_ms, 'checkpoint': str(self.sui_checkpoint(timestamp)),
+            'effects': {'status': {'status': 'success'}, 'transactionDigest': digest},
+            'events': [{k: v for k, v in event.items() if k != 'timestampMs'}],
+            'balanceChanges': [{'owner': {'AddressOwner': sender}, 'coinType': SUI_USDC, 'amount': str(balance)}]
+        })
+        return digest
+
+    # Volume
+
+    def rate_at(self, timestamp: float, rate: float, bursts: List[Tuple[float, float, float]]) -> float:
+        offset = timestamp - self.start_time
+        for start, duration, multiplier in bursts:
+            if start <= offset < start + duration:
+                return rate * multiplier
+        return rate
+
+    def schedule(self, transfers: int, rate: float = 1.0, sources: Optional[List[str]] = None,
+                 bursts: Optional[List[Tuple[float, float, float]]] = None) -> Iterator[Tuple]:
+        """(source, destination domain, amount, timestamp, skip) for `transfers` transfers.
+
+        Arrivals are Poisson at `rate` per second, multiplied inside each (start, duration,
+        multiplier) burst window; sources default to every CCTP domain.
+        """
+        sources = sources or list(self.chain_domains)
+        bursts = bursts or []
+        timestamp = float(self.start_time)
+        produced = 0
+        while produced < transfers:
+            timestamp += self.random.expovariate(self.rate_at(timestamp, rate, bursts))
+            source = self.random.choice(sources)
+            # At least one side has to land on a generated chain to be worth emitting
+            destinations = [domain for domain, chain in self.domain_to_chain.items()
+                            if chain != source and (self.emits_burns(source) or self.emits_mints(chain))]
+            if not destinations:
+                continue
+            destination_domain = self.random.choice(destinations)
+            amount = int(self.random.lognormvariate(8, 2.5) * 1_000_000)
+            roll = self.random.random()
+            skip = 'mint' if roll < self.pending_ratio else 'burn' if roll < self.pending_ratio + self.unmatched_ratio else None
+            produced += 1
+            yield source, destination_domain, amount, timestamp, skip
+
+    def generate(self, transfers: int, rate: float = 1.0, sources: Optional[List[str]] = None,
+                 bursts: Optional[List[Tuple[float, float, float]]] = None) -> List[Dict]:
+        for source, destination_domain, amount, timestamp, skip in self.schedule(transfers, rate, sources, bursts):
+            self.transfer(source, destination_domain, amount, timestamp, skip=skip)
+        return self.transfers
+
+    def stream(self, transfers: int, rate: float = 1.0, sources: Optional[List[str]] = None,
+               bursts: Optional[List[Tuple[float, float, float]]] = None) -> Iterator[Dict]:
+        """Raw objects ({'chain', 'kind', 'data'}) one transfer at a time, for feeding decoders directly.
+
+        Objects come in transfer order, so a mint follows its burn rather than sitting at
+        its own block; EVM logs are exactly what eth_getLogs returns.
+        """
+        self.store = False
+        try:
+            for source, destination_domain, amount, timestamp, skip in self.schedule(transfers, rate, sources, bursts):
+                self.transfer(source, destination_domain, amount, timestamp, skip=skip)
+                yield from self._pending
+                self._pending.clear()
+        finally:
+            self.store = True
+
+    # Output
+
+    def fixtures(self) -> Dict[str, Dict[str, Any]]:
+        last = self.summary['last_time'] + 60
+        fixtures = {}
+        for chain, data in self.evm.items():
+            params = EVM_PARAMS[chain]
+            contracts = self.contracts[chain]
+            fixtures[chain] = {
+                'kind': 'evm', 'chain_id': params['chain_id'], 'block_time': params['block_time'],
+                'genesis_time': self.start_time - params['first_block'] * params['block_time'],
+                'head': self.evm_block(chain, last),
+                'logs': data['logs'], 'transactions': data['transactions'], 'reorgs': list(data['reorgs'].values()),
+                'calls': {
+                    # decimals() and symbol() on USDC
+                    f"{contracts['usdc']}:0x313ce567": hex32(6),
+                    f"{contracts['usdc']}:0x95d89b41": '0x' + (word(32) + word(4) + b'USDC'.ljust(32, b'\0')).hex(),
+                }
+            }
+        if 'solana' in self.chains:
+            blocks, signatures = {}, []
+            for signature, tx in sorted(self.solana['transactions'].items(), key=lambda item: item[1]['slot']):
+                slot = tx['slot']
+                block = blocks.setdefault(slot, {
+                    'blockTime': tx['blockTime'], 'blockhash': b58encode(bytes.fromhex(fake_hash('solana', 'block', slot)[2:])),
+                    'parentSlot': slot - 1, 'blockHeight': slot, 'transactions': []
+                })
+                block['transactions'].append({'transaction': tx['transaction'], 'meta': tx['meta']})
+                signatures.append({'signature': signature, 'slot': slot, 'blockTime': tx['blockTime'], 'err': None, 'memo': None})
+            fixtures['solana'] = {
+                'kind': 'solana', 'slot': self.solana_slot(last), 'first_slot': SOLANA_FIRST_SLOT,
+                'genesis_time': self.start_time - SOLANA_FIRST_SLOT * SOLANA_SLOT_TIME, 'slot_time': SOLANA_SLOT_TIME,
+                'blocks': blocks, 'transactions': self.solana['transactions'],
+                'signatures': {SOLANA_MESSAGE_TRANSMITTER: list(reversed(signatures))}
+            }
+        if 'sui' in self.chains:
+            fixtures['sui'] = {
+                'kind': 'sui', 'events': self.sui['events'], 'transactions': self.sui['transactions'],
+                'checkpoints': {str(self.sui_checkpoint(last)): str(int(last * 1000))}
+            }
+        return fixtures
+
+    def manifest(self) -> Dict[str, Any]:
+        """Scan ranges covering everything generated, per chain, and what a scan should find there."""
+        last = self.summary['last_time'] + 60
+        counts = self.summary['chains']
+        manifest = {
+            'transfers': self.summary['transfers'],
+            'statuses': {status: self.summary['statuses'][status] for status in STATUSES},
+            'start_time': self.start_time, 'end_time': last, 'chains': {}
+        }
+        for chain in self.evm:
+            manifest['chains'][chain] = {
+                'start': self.evm_block(chain, self.start_time), 'end': self.evm_block(chain, last),
+                'burns': counts[chain]['burns'], 'mints': counts[chain]['mints'], 'reorged_txs': counts[chain]['reorged_txs']
+            }
+        if 'solana' in self.chains:
+            manifest['chains']['solana'] = {
+                'start': self.solana_slot(self.start_time), 'end': self.solana_slot(last), 'mints': counts['solana']['mints']
+            }
+        if 'sui' in self.chains:
+            manifest['chains']['sui'] = {
+                'start': self.start_time * 1000, 'end': int(last * 1000),
+                'burns': counts['sui']['burns'], 'mints': counts['sui']['mints']
+            }
+        return manifest
+
+    def write(self, fixtures_dir: str):
+        os.makedirs(fixtures_dir, exist_ok=True)
+        for chain, fixture in self.fixtures().items():
+            with open(os.path.join(fixtures_dir, f"{chain}.json"), 'w') as f:
+                json.dump(fixture, f)
+        with open(os.path.join(fixtures_dir, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest(), f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic CCTP activity for the stand-in RPC or the decoders')
+    parser.add_argument('--transfers', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=1.0, help='average transfers per second of chain time')
+    parser.add_argument('--burst', action='append', default=[], type=parse_burst,
+                        help='start:duration:multiplier in seconds from the start time, repeatable')
+    parser.add_argument('--chains', help='comma separated chains to generate (default: all in the registry)')
+    parser.add_argument('--sources', help='comma separated source chains, e.g. noble (default: every domain)')
+    parser.add_argument('--pending-ratio', type=float, default=0.0, help='fraction of burns without a mint yet')
+    parser.add_argument('--unmatched-ratio', type=float, default=0.0, help='fraction of mints whose burn is not generated')
+    parser.add_argument('--reorg-ratio', type=float, default=0.0, help='fraction of EVM CCTP blocks first served on a fork')
+    parser.add_argument('--reorg-depth', type=int, default=1)
+    parser.add_argument('--reorg-resolve-after', default='5:60', help='min:max seconds the stand-in serves a fork')
+    parser.add_argument('--start-time', type=int, default=1704067200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='fixtures directory for standin/server.py --fixtures')
+    parser.add_argument('--jsonl', help="stream raw objects to this file ('-' for stdout) instead; memory stays flat at any volume")
+    args = parser.parse_args()
+
+    if not args.output and not args.jsonl:
+        parser.error('one of --output or --jsonl is required')
+
+    generator = CCTPGenerator(
+        chains=args.chains.split(',') if args.chains else None, seed=args.seed, start_time=args.start_time,
+        pending_ratio=args.pending_ratio, unmatched_ratio=args.unmatched_ratio, reorg_ratio=args.reorg_ratio,
+        reorg_depth=args.reorg_depth, reorg_resolve_after=tuple(float(part) for part in args.reorg_resolve_after.split(':'))
+    )
+    sources = args.sources.split(',') if args.sources else None
+
+    if args.jsonl:
+        out = sys.stdout if args.jsonl == '-' else open(args.jsonl, 'w')
+        try:
+            for item in generator.stream(args.transfers, args.rate, sources, args.burst):
+                out.write(json.dumps(item) + '\n')
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(json.dumps(generator.manifest(), indent=2), file=sys.stderr)
+        return
+
+    generator.generate(args.transfers, args.rate, sources, args.burst)
+    generator.write(args.output)
+    manifest = generator.manifest()
+    print(f"{manifest['transfers']} transfers written to {args.output} ({manifest['statuses']})")
+    for chain, ranges in manifest['chains'].items():
+        print(f"  {chain}: {ranges}")
+
+if __name__ == "__main__":
+    main()
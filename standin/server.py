@@ -0,0 +1,392 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.registry import CHAINS
+from standin.fixtures import EVMFixture, SolanaFixture, SuiFixture, load_fixtures
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Faults:
+    """Latency, rate limiting and error injection for one chain route.
+
+    latency/jitter are seconds; rate_limit is requests per second with a `burst` sized
+    token bucket (0 disables it); error_rate is the fraction of requests answered with
+    an injected failure, half as HTTP 503 and half as a JSON-RPC internal error; ws_drop
+    closes every WebSocket that many seconds after it connected (0 keeps them open).
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=0.0, burst=None, error_rate=0.0, error_methods=None, seed=None,
+                 ws_drop=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit))
+        self.error_rate = error_rate
+        self.error_methods = set(error_methods or [])
+        self.ws_drop = ws_drop
+        self.random = random.Random(seed)
+        self.tokens = float(self.burst)
+        self.refilled_at = time.monotonic()
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any], defaults: 'Faults' = None) -> 'Faults':
+        base = {} if defaults is None else {
+            'latency': defaults.latency, 'jitter': defaults.jitter, 'rate_limit': defaults.rate_limit,
+            'burst': defaults.burst, 'error_rate': defaults.error_rate, 'error_methods': defaults.error_methods,
+            'seed': defaults.random.random(), 'ws_drop': defaults.ws_drop
+        }
+        return cls(**{**base, **config})
+
+    def take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate_limit)
+        self.refilled_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def inject_error(self, method: str) -> Optional[str]:
+        if not self.error_rate or (self.error_methods and method not in self.error_methods):
+            return None
+        if self.random.random() >= self.error_rate:
+            return None
+        return 'http' if self.random.random() < 0.5 else 'rpc'
+
+
+def parse_block(fixture: EVMFixture, value) -> int:
+    if value in (None, 'latest', 'safe', 'finalized', 'pending'):
+        return fixture.tip()
+    if value == 'earliest':
+        return 0
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def evm_handlers(fixture: EVMFixture):
+    def get_logs(params):
+        query = params[0]
+        return fixture.get_logs(
+            parse_block(fixture, query.get('fromBlock')), parse_block(fixture, query.get('toBlock')),
+            query.get('address'), query.get('topics'), query.get('blockHash')
+        )
+
+    def call(params):
+        result = fixture.call(params[0]['to'], params[0].get('data') or params[0].get('input', '0x'))
+        if result is None:
+            raise RPCError(3, 'execution reverted')
+        return result
+
+    return {
+        'eth_chainId': lambda params: hex(fixture.chain_id),
+        'net_version': lambda params: str(fixture.chain_id),
+        'eth_blockNumber': lambda params: hex(fixture.tip()),
+        'eth_getBlockByNumber': lambda params: fixture.get_block(parse_block(fixture, params[0])),
+        'eth_getLogs': get_logs,
+        'eth_getCode': lambda params: fixture.get_code(params[0], parse_block(fixture, params[1] if len(params) > 1 else None)),
+        'eth_getTransactionByHash': lambda params: fixture.get_transaction(params[0]),
+        'eth_getTransactionReceipt': lambda params: fixture.get_receipt(params[0]),
+        'eth_call': call,
+    }
+
+
+def solana_handlers(fixture: SolanaFixture):
+    def get_block(params):
+        block = fixture.get_block(int(params[0]))
+        if block is None:
+            raise RPCError(-32007, f"Slot {params[0]} was skipped, or missing due to ledger jump to recent snapshot")
+        return block
+
+    def get_signatures(params):
+        options = params[1] if len(params) > 1 else {}
+        return fixture.get_signatures(params[0], options.get('limit', 1000), options.get('before'))
+
+    return {
+        'getSlot': lambda params: fixture.slot,
+        'getBlock': get_block,
+        'getTransaction': lambda params: fixture.get_transaction(params[0]),
+        'getSignaturesForAddress': get_signatures,
+    }
+
+
+def sui_handlers(fixture: SuiFixture):
+    def query_events(params):
+        event_filter, cursor, limit, descending = (list(params) + [None, None, None, None])[:4]
+        try:
+            return fixture.query_events(event_filter, cursor, limit, bool(descending))
+        except ValueError as e:
+            raise RPCError(-32602, str(e))
+
+    def get_transaction(params):
+        tx = fixture.get_transaction(params[0])
+        if tx is None:
+            raise RPCError(-32602, f"Could not find the referenced transaction [TransactionDigest({params[0]})]")
+        return tx
+
+    def get_checkpoint(params):
+        sequence = int(params[0])
+        if sequence not in fixture.checkpoints:
+            raise RPCError(-32602, f"Could not find the referenced checkpoint {sequence}")
+        return {'sequenceNumber': str(sequence), 'timestampMs': str(fixture.checkpoints[sequence])}
+
+    return {
+        'suix_queryEvents': query_events,
+        'sui_getTransactionBlock': get_transaction,
+        'sui_getCheckpoint': get_checkpoint,
+    }
+
+
+HANDLER_FACTORIES = {
+    EVMFixture: evm_handlers,
+    SolanaFixture: solana_handlers,
+    SuiFixture: sui_handlers,
+}
+
+
+class StandInServer:
+    """JSON-RPC stand-in for every chain the scanners talk to, one route per chain (POST /<chain>)."""
+
+    def __init__(self, fixtures: Dict[str, Any], faults: Optional[Faults] = None, chain_faults: Optional[Dict[str, Dict]] = None):
+        self.fixtures = fixtures
+        self.handlers = {name: HANDLER_FACTORIES[type(fixture)](fixture) for name, fixture in fixtures.items()}
+        # Every chain gets its own copy so rate limits and error streams are independent
+        default_faults = faults or Faults()
+        chain_faults = chain_faults or {}
+        self.faults = {name: Faults.from_dict(chain_faults.get(name, {}), default_faults) for name in fixtures}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = defaultdict(Counter)
+        self.started_at = time.time()
+
+    def count(self, chain: str, method: str, **values):
+        for key, value in values.items():
+            self.stats[f"{chain}.{method}"][key] += value
+
+    def dispatch(self, chain: str, request: Dict) -> Dict:
+        method = request.get('method')
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        handler = self.handlers[chain].get(method)
+        try:
+            if handler is None:
+                raise RPCError(-32601, f"Method not found: {method}")
+            response['result'] = handler(request.get('params') or [])
+        except RPCError as e:
+            response['error'] = {'code': e.code, 'message': e.message}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            response['error'] = {'code': -32602, 'message': f"Invalid params: {e}"}
+        if 'error' in response:
+            self.count(chain, method, errors=1)
+        return response
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        chain = request.match_info['chain']
+        if chain not in self.fixtures:
+            return web.json_response({'error': f"unknown chain {chain}"}, status=404)
+
+        body = await request.read()
+        payload = json.loads(body)
+        batch = payload if isinstance(payload, list) else [payload]
+        faults = self.faults[chain]
+        method = batch[0].get('method') if batch else None
+        self.count(chain, method, requests=1, bytes_in=len(body))
+
+        if not faults.take_token():
+            self.count(chain, method, rate_limited=1)
+            return web.json_response(
+                {'jsonrpc': '2.0', 'id': batch[0].get('id'), 'error': {'code': 429, 'message': 'Too Many Requests'}},
+                status=429, headers={'Retry-After': '1'}
+            )
+
+        delay = faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        injected = faults.inject_error(method)
+        if injected == 'http':
+            self.count(chain, method, injected_errors=1)
+            return web.Response(status=503, text='Service Unavailable (injected)')
+
+        responses = []
+        for item in batch:
+            if injected == 'rpc':
+                self.count(chain, item.get('method'), injected_errors=1)
+                responses.append({'jsonrpc': '2.0', 'id': item.get('id'), 'error': {'code': -32603, 'message': 'Internal error (injected)'}})
+            else:
+                responses.append(self.dispatch(chain, item))
+
+        out = json.dumps(responses if isinstance(payload, list) else responses[0]).encode()
+        self.count(chain, method, bytes_out=len(out))
+        return web.Response(body=out, content_type='application/json')
+
+    async def push_logs(self, chain: str, ws: web.WebSocketResponse, subscription: str, query: Dict):
+        """eth_subscribe('logs'): send every matching log of each block as the (live) head reaches it."""
+        fixture = self.fixtures[chain]
+        last = fixture.tip()
+        while not ws.closed:
+            tip = fixture.tip()
+            if tip > last:
+                for log in fixture.get_logs(last + 1, tip, query.get('address'), query.get('topics')):
+                    self.count(chain, 'eth_subscription', notifications=1)
+                    await ws.send_json({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                                        'params': {'subscription': subscription, 'result': log}})
+                last = tip
+            await asyncio.sleep(0.05)
+
+    async def push_events(self, chain: str, ws: web.WebSocketResponse, subscription: str, event_filter: Dict):
+        """suix_subscribeEvent: send every matching event as the (live) fixture reveals it."""
+        fixture = self.fixtures[chain]
+        sent = len(fixture.visible_events())
+        while not ws.closed:
+            events = fixture.visible_events()
+            for event in events[sent:]:
+                if fixture._event_matches(event, event_filter):
+                    self.count(chain, 'suix_subscribeEvent', notifications=1)
+                    await ws.send_json({'jsonrpc': '2.0', 'method': 'suix_subscribeEvent',
+                                        'params': {'subscription': subscription, 'result': event}})
+            sent = len(events)
+            await asyncio.sleep(0.05)
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        """WebSocket JSON-RPC on the chain's route: eth_subscribe('logs') (EVM), suix_subscribeEvent (Sui)
+        and every regular method."""
+        chain = request.match_info['chain']
+        if chain not in self.fixtures:
+            return web.json_response({'error': f"unknown chain {chain}"}, status=404)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        faults = self.faults[chain]
+        subscriptions = {}
+        dropper = None
+        if faults.ws_drop:
+            dropper = asyncio.get_running_loop().call_later(faults.ws_drop, lambda: asyncio.ensure_future(ws.close()))
+        try:
+            async for message in ws:
+                if message.type != web.WSMsgType.TEXT:
+                    break
+                item = json.loads(message.data)
+                method, params = item.get('method'), item.get('params') or []
+                self.count(chain, method, requests=1, bytes_in=len(message.data))
+                if method == 'eth_subscribe' and isinstance(self.fixtures[chain], EVMFixture):
+                    if params[0] != 'logs':
+                        await ws.send_json({'jsonrpc': '2.0', 'id': item.get('id'),
+                                            'error': {'code': -32602, 'message': f"unsupported subscription {params[0]}"}})
+                        continue
+                    subscription = hex(random.getrandbits(64))
+                    subscriptions[subscription] = asyncio.ensure_future(
+                        self.push_logs(chain, ws, subscription, params[1] if len(params) > 1 else {}))
+                    await ws.send_json({'jsonrpc': '2.0', 'id': item.get('id'), 'result': subscription})
+                elif method == 'suix_subscribeEvent' and isinstance(self.fixtures[chain], SuiFixture):
+                    subscription = random.getrandbits(53)
+                    subscriptions[subscription] = asyncio.ensure_future(
+                        self.push_events(chain, ws, subscription, params[0] if params else {}))
+                    await ws.send_json({'jsonrpc': '2.0', 'id': item.get('id'), 'result': subscription})
+                elif method in ('eth_unsubscribe', 'suix_unsubscribeEvent'):
+                    task = subscriptions.pop(params[0], None)
+                    if task is not None:
+                        task.cancel()
+                    await ws.send_json({'jsonrpc': '2.0', 'id': item.get('id'), 'result': task is not None})
+                else:
+                    await ws.send_json(self.dispatch(chain, item))
+        finally:
+            if dropper is not None:
+                dropper.cancel()
+            for task in subscriptions.values():
+                task.cancel()
+        return ws
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'uptime': time.time() - self.started_at,
+            'methods': {key: dict(counter) for key, counter in sorted(self.stats.items())}
+        })
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        return web.json_response({'ok': True})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_post('/stats/reset', self.handle_reset)
+        app.router.add_post('/{chain}', self.handle_rpc)
+        app.router.add_get('/{chain}', self.handle_ws)
+        return app
+
+
+def registry_overrides(base_url: str, chains) -> Dict[str, Dict]:
+    """Registry JSON pointing every chain at the stand-in (for orchestrator.py --registry)."""
+    overrides = {}
+    for chain in chains:
+        overrides[chain] = {'rpc_url': f"{base_url}/{chain}"}
+        if CHAINS[chain]['kind'] == 'evm':
+            # WebSocket (eth_subscribe) on the same route
+            overrides[chain]['ws_url'] = f"ws://{base_url.split('://', 1)[1]}/{chain}"
+    return overrides
+
+def main():
+    parser = argparse.ArgumentParser(description='Local JSON-RPC stand-in that replays recorded chain fixtures')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--fixtures', help='directory of <chain>.json fixture files')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra uniform random latency, seconds')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests/second per chain before 429s (0: off)')
+    parser.add_argument('--burst', type=int, help='token bucket size for --rate-limit')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failed on purpose')
+    parser.add_argument('--error-methods', help='comma separated methods eligible for --error-rate (default: all)')
+    parser.add_argument('--faults', help='JSON file with per-chain overrides, e.g. {"sui": {"latency": 0.2}}')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--ws-drop', type=float, default=0.0, help='close WebSockets this many seconds after they connect (0: never)')
+    parser.add_argument('--live-from', type=int, metavar='N',
+                        help='start EVM heads N blocks back (Sui: hide the newest N events) and advance them (for live modes)')
+    parser.add_argument('--block-time', type=float, default=2.0, help='seconds per block (Sui: per event) with --live-from')
+    parser.add_argument('--write-registry', help='write a registry override file pointing every chain here')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    faults = Faults(args.latency, args.jitter, args.rate_limit, args.burst, args.error_rate,
+                    args.error_methods.split(',') if args.error_methods else None, args.seed, args.ws_drop)
+    chain_faults = {}
+    if args.faults:
+        with open(args.faults) as f:
+            chain_faults = json.load(f)
+    if args.live_from is not None:
+        for fixture in fixtures.values():
+            if isinstance(fixture, (EVMFixture, SuiFixture)):
+                fixture.go_live(args.live_from, args.block_time)
+    server = StandInServer(fixtures, faults, chain_faults)
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.write_registry:
+        with open(args.write_registry, 'w') as f:
+            json.dump(registry_overrides(base_url, [chain for chain in fixtures if chain in CHAINS]), f, indent=2)
+        print(f"Registry overrides written to {args.write_registry}")
+
+    for name, fixture in fixtures.items():
+        print(f"  {base_url}/{name} ({type(fixture).__name__})")
+    web.run_app(server.app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import aiohttp
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.cursors import load_resume_point
+from common.profiling import add_profile_arguments, profiling
+from common.registry import load_scanner_module
+from common.sinks import CSVSink
+from common.transport import close_transport
+
+transfers_in = load_scanner_module('sui', 'transfers_in')
+transfers_out = load_scanner_module('sui', 'transfers_out')
+
+# direction -> (querier class, generator method, csv fields, default output)
+DIRECTIONS = {
+    'in': (transfers_in.SuiCCTPEventQuerier, 'iter_cctp_transfers', transfers_in.CSV_FIELDS, 'sui_transfers_in_backfill.csv'),
+    'out': (transfers_out.SuiCCTPBurnQuerier, 'iter_cctp_burns', transfers_out.CSV_FIELDS, 'sui_transfers_out_backfill.csv'),
+}
+
+def plan_partitions(start_ms: int, end_ms: int, partitions: int) -> List[Tuple[int, int]]:
+    """Split [start_ms, end_ms) into contiguous, non-overlapping time ranges."""
+    if end_ms <= start_ms:
+        return []
+    partitions = max(1, min(partitions, end_ms - start_ms))
+    step = (end_ms - start_ms) / partitions
+    bounds = [start_ms + round(i * step) for i in range(partitions)] + [end_ms]
+    return [(bounds[i], bounds[i + 1]) for i in range(partitions)]
+
+async def get_checkpoint_timestamp(querier, checkpoint: int, session: Optional[aiohttp.ClientSession] = None) -> int:
+    result = await querier.make_rpc_call(session, 'sui_getCheckpoint', [str(checkpoint)])
+    return int(result['timestampMs'])
+
+async def checkpoint_range_to_time(querier, start_checkpoint: int, end_checkpoint: int) -> Tuple[int, int]:
+    start_ms = await get_checkpoint_timestamp(querier, start_checkpoint)
+    # +1 so events in the end checkpoint itself fall inside the half-open range
+    end_ms = await get_checkpoint_timestamp(querier, end_checkpoint) + 1
+    return start_ms, end_ms
+
+async def scan_partition(querier, method: str, time_range: Tuple[int, int], part_file: str,
+                         semaphore: asyncio.Semaphore, resume: bool = False) -> int:
+    count = 0
+    async with semaphore:
+        print(f"Scanning partition {os.path.basename(part_file)}: {time_range[0]} - {time_range[1]}")
+        cursor_file = f"{part_file}.cursor" if resume else None
+        _, offset = load_resume_point(cursor_file)
+        with open(part_file, 'a' if resume else 'w') as f:
+            if offset is not None:
+                # Rows written after the partition's last saved cursor are fetched again
+                f.truncate(offset)
+                f.seek(offset)
+            # Each partition walks oldest-first with its own cursor, so its rows are already ordered.
+            # A page that can't be fetched fails the backfill instead of leaving the partition short
+            rows = getattr(querier, method)(cursor_file=cursor_file, time_range=time_range, descending=False,
+                                            tell=f.tell, strict=True)
+            async for row in rows:
+                f.write(json.dumps(row) + '\n')
+                f.flush()
+                count += 1
+    return count
+
+async def backfill(direction: str, start_ms: int, end_ms: int, output_file: Optional[str] = None,
+                   partitions: int = 16, concurrency: int = 8, request_delay: float = 0.0,
+                   resume: bool = False) -> int:
+    querier_class, method, fields, default_output = DIRECTIONS[direction]
+    output_file = output_file or default_output
+    querier = querier_class()
+    querier.request_delay = request_delay
+    querier.page_delay = 0
+
+    ranges = plan_partitions(start_ms, end_ms, partitions)
+    part_files = [f"{output_file}.part{i:04d}.jsonl" for i in range(len(ranges))]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    counts = await asyncio.gather(*(
+        scan_partition(querier, method, time_range, part_file, semaphore, resume)
+        for time_range, part_file in zip(ranges, part_files)
+    ))
+    print(f"Scanned {len(ranges)} partitions: {sum(counts)} events")
+
+    # Partitions are disjoint and each is time ordered, so concatenating them in plan order
+    # gives a deterministic oldest-first output without a global sort
+    with CSVSink(output_file, fields) as sink:
+        for part_file in part_files:
+            with open(part_file) as f:
+                for line in f:
+                    sink.write(json.loads(line))
+        total = sink.rows_written
+
+    for part_file in part_files:
+        for path in (part_file, f"{part_file}.cursor"):
+            if os.path.exists(path):
+                os.remove(path)
+    return total
+
+def parse_time(value: str) -> int:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+async def main():
+    parser = argparse.ArgumentParser(description='Partitioned parallel backfill of Sui CCTP events')
+    parser.add_argument('--direction', choices=sorted(DIRECTIONS), default='in')
+    parser.add_argument('--start', help='ISO start time (UTC if no offset)')
+    parser.add_argument('--end', help='ISO end time, exclusive (default: now)')
+    parser.add_argument('--start-checkpoint', type=int)
+    parser.add_argument('--end-checkpoint', type=int)
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--request-delay', type=float, default=0.0)
+    parser.add_argument('--output')
+    parser.add_argument('--resume', action='store_true', help='continue each partition from its saved cursor')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.start_checkpoint is not None:
+        if args.end_checkpoint is None:
+            parser.error('--end-checkpoint is required with --start-checkpoint')
+        start_ms, end_ms = await checkpoint_range_to_time(DIRECTIONS[args.direction][0](), args.start_checkpoint, args.end_checkpoint)
+    elif args.start:
+        start_ms = parse_time(args.start)
+        end_ms = parse_time(args.end) if args.end else int(datetime.now(timezone.utc).timestamp() * 1000)
+    else:
+        parser.error('either --start or --start-checkpoint is required')
+
+    try:
+        with profiling(args.output or DIRECTIONS[args.direction][3], args.profile, args.profile_top):
+            total = await backfill(args.direction, start_ms, end_ms, args.output, args.partitions,
+                                   args.concurrency, args.request_delay, args.resume)
+    finally:
+        await close_transport()
+    print(f"\nBackfill complete! Wrote {total} rows")
+
+if __name__ == "__main__":
+    asyncio.run(main())
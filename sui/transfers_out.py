@@ -1,11 +1,25 @@
 import aiohttp
+import argparse
 import asyncio
 import json
-import csv
+import os
 import random
-from typing import List, Dict, Any, Optional
+import sys
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.caches import LRUCache
+from common.cursors import load_cursor, load_resume_point, save_cursor, save_resume_point
+from common.metrics import get_metrics
+from common.profiling import add_profile_arguments, profiling
+from common.providers import RPCHTTPError, get_pool, post_json
+from common.sinks import CSVSink, ExternalSorter
+from common.subscriptions import MAX_RECONNECT_DELAY, RECONNECT_DELAY, SUBSCRIBED, SuiEventSubscription
+from common.tracing import span
+from common.transport import close_transport
+
 DOMAIN_TO_CHAIN = {
     0: 'ethereum',
     1: 'avalanche',
@@ -21,13 +35,19 @@ DOMAIN_TO_CHAIN = {
 class SuiCCTPBurnQuerier:
     def __init__(self):
         self.rpc_endpoint = "https://fullnode.mainnet.sui.io:443"
+        self.ws_endpoint = "wss://fullnode.mainnet.sui.io:443"
         self.package_id = "0x2aa6c5d56376c371f88a6cc42e852824994993cb9bab8d3e6450cbe3cb32b94e"
         self.request_delay = 0.2
+        self.page_delay = 1
         self.max_retries = 5
         self.page_size = 100
         self.module_name = "deposit_for_burn"
         self.event_name = "DepositForBurn"
         
+    @property
+    def event_type(self) -> str:
+        return f"{self.package_id}::{self.module_name}::{self.event_name}"
+
     def get_retry_delay(self, attempt: int, status_code: int) -> float:
         base_delay = 1
         max_delay = 32
@@ -50,24 +70,24 @@ class SuiCCTPBurnQuerier:
         
         for attempt in range(self.max_retries):
             try:
-                async with session.post(self.rpc_endpoint, headers=headers, json=payload, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if 'error' in result:
-                            if 'rate limit' in str(result['error']).lower():
-                                delay = self.get_retry_delay(attempt, 429)
-                                await asyncio.sleep(delay)
-                                continue
-                            raise Exception(f"RPC error: {result['error']}")
-                        return result['result']
-                    
-                    if response.status in [429, 500, 502, 503, 504]:
-                        delay = self.get_retry_delay(attempt, response.status)
-                        print(f"Request failed with status {response.status}. Retrying in {delay:.2f} seconds...")
+                # rpc_endpoint may be a list of fullnodes; the pool fails over and hedges between them
+                pool = get_pool(self.rpc_endpoint, timeout=30)
+                if attempt:
+                    get_metrics().inc('cctp_rpc_retries_total', chain=pool.chain, method=method, reason='backoff')
+                result = await post_json(session, pool, payload, headers)
+                if 'error' in result:
+                    if 'rate limit' in str(result['error']).lower():
+                        delay = self.get_retry_delay(attempt, 429)
                         await asyncio.sleep(delay)
                         continue
-                    
-                    raise Exception(f"RPC call failed with status code: {response.status}")
+                    raise Exception(f"RPC error: {result['error']}")
+                return result['result']
+                
+            except RPCHTTPError as e:
+                delay = self.get_retry_delay(attempt, e.status)
+                print(f"Request failed with status {e.status}. Retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+                continue
                     
             except Exception as e:
                 delay = self.get_retry_delay(attempt, 0)
@@ -111,18 +131,24 @@ class SuiCCTPBurnQuerier:
     async def query_events(
         self,
         session: aiohttp.ClientSession,
-        cursor: Optional[Dict] = None
+        cursor: Optional[Dict] = None,
+        time_range: Optional[Tuple[int, int]] = None,
+        descending: bool = True
     ) -> Dict:
-        module_and_event = f"{self.package_id}::{self.module_name}::{self.event_name}"
         event_filter = {
-            "MoveEventType": module_and_event
+            "MoveEventType": self.event_type
         }
+        if time_range:
+            # Fullnodes reject compound (All/Any) filters, so a time window is queried alone
+            # and events of other types are skipped by the caller
+            start_ms, end_ms = time_range
+            event_filter = {"TimeRange": {"startTime": str(start_ms), "endTime": str(end_ms)}}
         
         query_params = [
             event_filter,
             cursor,
             self.page_size,
-            True  # descending
+            descending
         ]
         
         return await self.make_rpc_call(session, 'suix_queryEvents', query_params)
@@ -153,89 +179,264 @@ class SuiCCTPBurnQuerier:
 
         return burn_data
 
-    async def query_cctp_burns(self, limit: Optional[int] = None, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
-        async with aiohttp.ClientSession() as session:
-            all_burns = []
-            cursor = None
-            page = 1
+    async def fetch_burn(self, session: Optional[aiohttp.ClientSession], event: Dict) -> Optional[Dict[str, Any]]:
+        tx_digest = event.get('id', {}).get('txDigest')
+        if not tx_digest:
+            print(f"Could not find transaction digest in event")
+            return None
+
+        with span('get_transaction', 'sui', tx=tx_digest):
+            tx = await self.get_transaction(session, tx_digest)
+        with span('get_checkpoint', 'sui', tx=tx_digest):
+            checkpoint = await self.get_checkpoint_for_tx(session, tx_digest)
+
+        with span('decode', 'sui', tx=tx_digest):
+            burn = self.process_event_and_tx(event, tx, checkpoint)
+
+        print(f"Processed burn: {burn['digest']} - Amount: {burn['usdc_amount']} USDC to {burn['destination_chain']} at checkpoint {checkpoint}")
+        return burn
+
+    async def iter_cctp_burns(
+        self,
+        limit: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        cursor_file: Optional[str] = None,
+        time_range: Optional[Tuple[int, int]] = None,
+        descending: bool = True,
+        session: Optional[aiohttp.ClientSession] = None,
+        tell: Optional[Callable[[], int]] = None,
+        strict: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Pages come back newest-first by default, so burns are yielded in descending checkpoint order.
+        # With a cursor file, the cursor is saved once each burn has been consumed, with tell() (the
+        # output offset after it), so a resume can cut off rows written after the last save.
+        # Without a session, requests use the shared per-host sessions from common.transport.
+        # A page that can't be fetched ends the scan; with strict, it raises instead
+        cursor, _ = load_resume_point(cursor_file)
+        page = 1
+        yielded = 0
+        
+        while True:
+            try:
+                print(f"\nFetching page {page} of events...")
+                with span('query_events', 'sui', page=page):
+                    result = await self.query_events(session, cursor, time_range, descending)
+            except Exception as e:
+                print(f"Error fetching page {page}: {e}")
+                if strict:
+                    raise
+                break
+            
+            events = result.get('data', [])
+            if not events:
+                print("No more events found.")
+                break
+            
+            print(f"Processing {len(events)} events from page {page}")
             
-            while True:
+            past_range = False
+            for event in events:
+                # A TimeRange query returns every event type; also guards against endpoints ignoring the window
+                if time_range:
+                    if event.get('type') != self.event_type:
+                        continue
+                    timestamp_ms = int(event.get('timestampMs', 0))
+                    if not time_range[0] <= timestamp_ms < time_range[1]:
+                        # Pages are time ordered, so once we leave the range in scan direction we are done
+                        past_range = timestamp_ms < time_range[0] if descending else timestamp_ms >= time_range[1]
+                        if past_range:
+                            break
+                        continue
+                
                 try:
-                    print(f"\nFetching page {page} of events...")
-                    result = await self.query_events(session, cursor)
-                    
-                    events = result.get('data', [])
-                    if not events:
-                        print("No more events found.")
-                        break
-                    
-                    print(f"Processing {len(events)} events from page {page}")
-                    
-                    for event in events:
+                    burn = await self.fetch_burn(session, event)
+                except Exception as e:
+                    print(f"Error processing event: {e}")
+                    continue
+                if burn is None:
+                    continue
+                
+                yield burn
+                yielded += 1
+                if cursor_file:
+                    save_resume_point(cursor_file, event['id'], tell() if tell else None)
+                if limit and yielded >= limit:
+                    return
+            
+            cursor = result.get('nextCursor')
+            if cursor_file and cursor:
+                save_resume_point(cursor_file, cursor, tell() if tell else None)
+
+            if max_pages and page >= max_pages:
+                print(f"Reached maximum page limit of {max_pages}")
+                break
+            
+            if past_range or not cursor or not result.get('hasNextPage', True):
+                print("No more pages available.")
+                break
+            
+            page += 1
+            await asyncio.sleep(self.page_delay)
+
+    async def catch_up(self, session: Optional[aiohttp.ClientSession], cursor: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Every event after `cursor`, oldest-first. A failed query is retried with backoff rather than
+        # given up on, so a transient error can't end live mode; events pushed meanwhile wait in the queue.
+        delay = RECONNECT_DELAY
+        while True:
+            events = []
+            page_cursor = cursor
+            try:
+                while True:
+                    with span('query_events', 'sui', live=True):
+                        result = await self.query_events(session, page_cursor, None, False)
+                    events.extend(result.get('data', []))
+                    page_cursor = result.get('nextCursor')
+                    if not page_cursor or not result.get('hasNextPage'):
+                        return events
+            except Exception as e:
+                print(f"Error catching up from cursor {cursor}: {e}. Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def iter_live_burns(
+        self,
+        cursor_file: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Live mode: burns are yielded oldest-first as their events are pushed over suix_subscribeEvent,
+        # until cancelled. The cursor (the last event handled) is saved once each burn is consumed;
+        # without one the stream starts after the newest event. After every (re)subscription the events
+        # emitted since the cursor are fetched with suix_queryEvents first, so a dropped socket loses nothing.
+        cursor = load_cursor(cursor_file)
+        if cursor is None:
+            newest = await self.query_events(session, None, None, descending=True)
+            cursor = newest['data'][0]['id'] if newest.get('data') else None
+        seen = LRUCache(10000)
+        subscription = SuiEventSubscription(self.ws_endpoint, {"MoveEventType": self.event_type})
+
+        try:
+            async for pushed in subscription.events():
+                if pushed is SUBSCRIBED:
+                    if cursor is None:
+                        continue  # no event at all yet when the stream started
+                    events = await self.catch_up(session, cursor)
+                    if events:
+                        print(f"Caught up {len(events)} events since the last cursor")
+                else:
+                    events = [pushed]
+
+                for event in events:
+                    key = (event['id']['txDigest'], event['id']['eventSeq'])
+                    if key in seen:
+                        continue
+                    seen.put(key, True)
+                    # The cursor only moves past an event once it is handled, so a failed fetch is
+                    # retried with backoff instead of being skipped
+                    delay = RECONNECT_DELAY
+                    while True:
                         try:
-                            tx_digest = event.get('id', {}).get('txDigest')
-                            if not tx_digest:
-                                print(f"Could not find transaction digest in event")
-                                continue
-                                
-                            tx = await self.get_transaction(session, tx_digest)
-                            checkpoint = await self.get_checkpoint_for_tx(session, tx_digest)
-                            
-                            burn = self.process_event_and_tx(event, tx, checkpoint)
-                            all_burns.append(burn)
-                            print(f"Processed burn: {burn['digest']} - Amount: {burn['usdc_amount']} USDC to {burn['destination_chain']} at checkpoint {checkpoint}")
+                            burn = await self.fetch_burn(session, event)
+                            break
                         except Exception as e:
-                            print(f"Error processing event: {e}")
-                    
-                    if limit and len(all_burns) >= limit:
-                        all_burns = all_burns[:limit]
-                        break
+                            print(f"Error processing event {event['id']['txDigest']}: {e}. Retrying in {delay:.1f} seconds...")
+                            await asyncio.sleep(delay)
+                            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                    if burn is not None:
+                        yield burn
+                    cursor = event['id']
+                    if cursor_file:
+                        save_cursor(cursor_file, cursor)
+        finally:
+            await subscription.close()
 
-                    if max_pages and page >= max_pages:
-                        print(f"Reached maximum page limit of {max_pages}")
-                        break
-                    
-                    cursor = result.get('nextCursor')
-                    if not cursor:
-                        print("No more pages available.")
-                        break
-                    
-                    page += 1
-                    await asyncio.sleep(1)
-                    
-                except Exception as e:
-                    print(f"Error fetching page {page}: {e}")
-                    break
-            
-            return all_burns
+    async def query_cctp_burns(self, limit: Optional[int] = None, max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [burn async for burn in self.iter_cctp_burns(limit=limit, max_pages=max_pages)]
+
+CSV_FIELDS = ['digest', 'checkpoint', 'checkpoint_timestamp', 'nonce', 'sender', 
+              'destination_chain', 'usdc_amount', 'mint_recipient', 'destination_caller']
+
+async def write_cctp_burns(
+    querier: SuiCCTPBurnQuerier,
+    csv_filename: str,
+    max_pages: Optional[int] = None,
+    sort: bool = False,
+    resume: bool = False
+) -> int:
+    if sort and resume:
+        raise ValueError("resuming appends burns as they arrive, it can't be combined with sorting")
+    cursor_file = f"{csv_filename}.cursor" if resume else None
+    
+    with CSVSink(csv_filename, CSV_FIELDS, append=resume) as sink:
+        if not sort:
+            _, offset = load_resume_point(cursor_file)
+            if offset is not None:
+                # Rows written after the last saved cursor are fetched again
+                sink.truncate(offset)
+            async for burn in querier.iter_cctp_burns(max_pages=max_pages, cursor_file=cursor_file, tell=sink.tell):
+                sink.write(burn)
+            return sink.rows_written
+        
+        # Oldest-first output needs a full reordering; spill sorted runs instead of holding every row
+        burns = querier.iter_cctp_burns(max_pages=max_pages)
+        sorter = ExternalSorter(key=lambda x: int(x['checkpoint']))
+        async for burn in burns:
+            sorter.add(burn)
+        for burn in sorter:
+            sink.write(burn)
+        return sink.rows_written
+
+async def write_live_burns(querier: SuiCCTPBurnQuerier, csv_filename: str, duration: Optional[float] = None) -> int:
+    # Appends as burns arrive; the live cursor lets a restart pick up where the file ends
+    cursor_file = f"{csv_filename}.live.cursor"
+    with CSVSink(csv_filename, CSV_FIELDS, append=True) as sink:
+        async def follow():
+            async for burn in querier.iter_live_burns(cursor_file=cursor_file):
+                sink.write(burn)
+        try:
+            await asyncio.wait_for(follow(), duration)
+        except asyncio.TimeoutError:
+            pass
+        return sink.rows_written
 
 async def main():
+    parser = argparse.ArgumentParser(description='Query CCTP burns on Sui')
+    parser.add_argument('--max-pages', type=int, default=2)
+    parser.add_argument('--sort', action='store_true', help='write rows oldest-first (external merge sort)')
+    parser.add_argument('--resume', action='store_true', help='append to the CSV and continue from the saved cursor')
+    parser.add_argument('--live', action='store_true', help='follow new burns as they are emitted (suix_subscribeEvent) instead')
+    parser.add_argument('--duration', type=float, help='with --live, stop after this many seconds')
+    parser.add_argument('--rpc-url', help='Sui JSON-RPC endpoint (default: the public fullnode)')
+    parser.add_argument('--ws-url', help='Sui WebSocket endpoint for --live (default: the public fullnode)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
     querier = SuiCCTPBurnQuerier()
+    querier.rpc_endpoint = args.rpc_url or querier.rpc_endpoint
+    querier.ws_endpoint = args.ws_url or querier.ws_endpoint
+    csv_filename = 'sui_transfers_out.csv'
     
     try:
+        if args.live:
+            print(f"Following new CCTP burns live into {csv_filename}...")
+            count = await write_live_burns(querier, csv_filename, args.duration)
+            print(f"\nLive mode stopped after {count} CCTP burns")
+            return
+
         print("Starting query for CCTP burns...")
-        burns = await querier.query_cctp_burns(limit=None, max_pages=2)  # Only fetch 2 pages
+        with profiling(csv_filename, args.profile, args.profile_top):
+            count = await write_cctp_burns(querier, csv_filename, max_pages=args.max_pages, sort=args.sort, resume=args.resume)
         
-        if not burns:
+        if not count:
             print("No burns found!")
             return
-            
-        csv_filename = 'sui_transfers_out.csv'
-        csv_fields = ['digest', 'checkpoint', 'checkpoint_timestamp', 'nonce', 'sender', 
-                     'destination_chain', 'usdc_amount', 'mint_recipient', 'destination_caller']
-        
-        with open(csv_filename, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=csv_fields)
-            writer.writeheader()
-            for burn in sorted(burns, key=lambda x: int(x['checkpoint'])):
-                csv_row = {field: burn[field] for field in csv_fields}
-                writer.writerow(csv_row)
         
-        print(f"\nQuery complete! Found {len(burns)} total CCTP burns")
+        print(f"\nQuery complete! Found {count} total CCTP burns")
         print(f"Results saved to {csv_filename}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        await close_transport()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+
+from common.caches import LRUCache
+from common.planner import parse_columns, plan_for
+from common.registry import load_registry, load_scanner_module
+from common.reorg import DEFAULT_WINDOW
+from common.sinks import CSVSink, JSONLSink
+from common.subscriptions import LogSubscription
+from common.tail import Tail
+from common.transport import close_transport
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Follow the head of an EVM chain and write CCTP transfers as they land')
+    parser.add_argument('--chain', required=True)
+    parser.add_argument('--direction', choices=['in', 'out'], required=True)
+    parser.add_argument('--confirmations', type=int, help="blocks before a row is final (default: the chain's registry value)")
+    parser.add_argument('--provisional', action='store_true', help='also write rows of unconfirmed blocks at once, flagged provisional')
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between head polls')
+    parser.add_argument('--ws', action='store_true',
+                        help="write provisional rows as the node pushes their logs (eth_subscribe on the chain's ws_url); implies --provisional")
+    parser.add_argument('--reorg-window', type=int, default=DEFAULT_WINDOW,
+                        help='recent block hashes kept to detect reorgs and roll their rows back (0: off)')
+    parser.add_argument('--start', type=int, help='first block when there is no cursor yet (default: the current head)')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds (default: run until interrupted)')
+    parser.add_argument('--output', help='.csv or .jsonl (default: <chain>_transfers_<direction>_tail.jsonl)')
+    parser.add_argument('--registry')
+    parser.add_argument('--receipts', action='store_true', help='fetch receipts for inbound rows (complexity, minted amount)')
+    parser.add_argument('--columns', help='comma separated output columns; RPC calls no column needs are skipped')
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    if args.chain not in registry or registry[args.chain]['kind'] != 'evm':
+        parser.error(f"not an EVM chain: {args.chain}")
+    config = registry[args.chain]
+    if args.receipts:
+        config['receipts'] = True
+    if args.columns:
+        config['columns'] = parse_columns(args.columns)
+    module = load_scanner_module(config['package'], f"transfers_{args.direction}")
+    w3 = module.setup_web3_provider(config['rpc_url'])
+    subscription = None
+    if args.ws:
+        if not config.get('ws_url'):
+            parser.error(f"no ws_url for {args.chain} (set it in --registry or CCTP_WS_{args.chain.upper()})")
+        if args.direction == 'in':
+            address, topic = module.MESSAGE_TRANSMITTER, module.MESSAGE_RECEIVED_EVENT
+        else:
+            address, topic = module.CIRCLE_TOKEN_MESSENGER, module.MESSAGE_SENT_EVENT
+        subscription = LogSubscription(config['ws_url'], w3, address, [topic], chunk_size=config['chunk_size'], chain=args.chain)
+    confirmations = args.confirmations if args.confirmations is not None else config['confirmations']
+
+    output_file = args.output or f"{args.chain}_transfers_{args.direction}_tail.jsonl"
+    # The cursor holds the first block not yet written as confirmed; rerunning resumes there
+    cursor_file = f"{output_file}.cursor"
+    resume = os.path.exists(cursor_file)
+    tail = Tail(module, args.direction, w3, None, confirmations, args.interval, args.provisional or args.ws,
+                config['chunk_size'], cursor_file, plan_for(module, args.direction, config), LRUCache(10000),
+                args.chain, args.reorg_window, subscription)
+    if output_file.endswith('.jsonl'):
+        tail.sink = JSONLSink(output_file, append=resume)
+    else:
+        tail.sink = CSVSink(output_file, tail.header, append=resume)
+
+    print(f"Tailing {args.chain}/{args.direction} at {confirmations} confirmations"
+          f"{' with pushed provisional rows' if args.ws else ' with provisional rows' if args.provisional else ''} into {output_file}")
+    try:
+        await tail.run(args.start, args.duration)
+    finally:
+        tail.sink.close()
+        await close_transport()
+        print(f"Tail stopped at block {tail.next_block}: {tail.rows} rows in {tail.polls} polls, {tail.rolled_back} reorgs rolled back")
+        if subscription is not None:
+            print(f"Log subscription: {subscription.stats()}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
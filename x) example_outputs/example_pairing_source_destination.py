@@ -1,14 +1,25 @@
 # Run to see examples of burn > mint pairs
 
 import asyncio
+import os
+import sys
 from web3 import AsyncWeb3
 from web3.middleware import async_geth_poa_middleware
 from datetime import datetime
-import aiohttp
 import json
 
-def setup_web3_provider(url):
-    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.addresses import address_cache_stats, checksum_address
+from common.message import parse_burn_message, parse_deposit_for_burn, parse_message_received
+from common.multicall import get_token_info as fetch_token_info, multicall_stats, prefetch_token_info
+from common.profiling import profile_flag, profiling
+from common.providers import PooledAsyncHTTPProvider, post_json
+from common.transport import close_transport, get_transport
+
+def setup_web3_provider(urls):
+    # `urls` may be a single endpoint or a list to fail over / hedge between
+    w3 = AsyncWeb3(PooledAsyncHTTPProvider(urls))
     w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
     return w3
 
@@ -56,32 +67,13 @@ CHAIN_TO_W3 = {
 MESSAGE_SENT_EVENT = '0x2fa9ca894982930190727e75500a97d8dc500233a5065e0f3126c48fbe0343c0'
 MESSAGE_RECEIVED_EVENT = '0x58200b4c34ae05ee816d710053fff3fb75af4395915d3d2a771b24aa10e3cc5d'
 
-ERC20_ABI = [
-    {"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},
-    {"inputs":[],"name":"symbol","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"}
-]
-
 async def get_token_info(w3, token_address):
-    token_contract = w3.eth.contract(address=token_address, abi=ERC20_ABI)
-    decimals = await token_contract.functions.decimals().call()
-    symbol = await token_contract.functions.symbol().call()
-    return decimals, symbol
+    # Batched through Multicall3 and cached per token (see common/multicall.py)
+    return await fetch_token_info(w3, 'ethereum', token_address)
 
 def decode_uint256(hex_data):
     return int.from_bytes(hex_data, byteorder='big')
 
-def decode_address(hex_data):
-    if isinstance(hex_data, str):
-        # Remove all '0x' prefixes and take last 40 chars
-        clean_hex = hex_data.replace('0x', '')
-        return AsyncWeb3.to_checksum_address('0x' + clean_hex[-40:])
-    else:
-        # If it's bytes, convert to hex string
-        hex_str = hex_data.hex()
-        if hex_str.startswith('0x'):
-            hex_str = hex_str[2:]
-        return AsyncWeb3.to_checksum_address('0x' + hex_str[-40:])
-
 async def analyze_transaction_type(w3, tx_hash, target_address):
     receipt = await w3.eth.get_transaction_receipt(tx_hash)
     tx = await w3.eth.get_transaction(tx_hash)
@@ -99,17 +91,10 @@ async def analyze_transaction_type(w3, tx_hash, target_address):
         'first_contract': receipt['logs'][0]['address'] if receipt['logs'] else None
     }
 
-def decode_message_body(message_body):
-    if isinstance(message_body, str):
-        hex_str = message_body[message_body.find('000000000000000000000000'):]
-    else:
-        hex_data = message_body.hex()
-        hex_str = hex_data[hex_data.find('000000000000000000000000'):]
-    
-    token = decode_address(bytes.fromhex(hex_str[0:64]))
-    recipient = decode_address(bytes.fromhex(hex_str[64:128]))
-    amount = int(hex_str[128:192], 16)
-    return token, recipient, amount
+def decode_message_body(data):
+    # MessageReceived log data -> burn token, mint recipient and amount of its BurnMessage
+    burn = parse_burn_message(parse_message_received(data).body)
+    return checksum_address(burn.burn_token), checksum_address(burn.mint_recipient), burn.amount
 
 async def find_matching_logs(w3, chain_name, transmitter, nonce, start_block, end_block):
     try:
@@ -131,74 +116,71 @@ async def find_matching_logs(w3, chain_name, transmitter, nonce, start_block, en
 
 async def find_solana_destination_tx(nonce, after_timestamp):
     """Search for CCTP message on Solana chain"""
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Convert nonce to string as that's how it appears in Solana logs
-            nonce_str = str(nonce)
+    try:
+        # Convert nonce to string as that's how it appears in Solana logs
+        nonce_str = str(nonce)
+        
+        # Search for signatures by address (limited to recent transactions)
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getSignaturesForAddress",
+            "params": [
+                MESSAGE_TRANSMITTERS['solana'],
+                {"limit": 100}
+            ]
+        }
+        
+        result = await post_json(None, SOLANA_RPC_URL, payload)
+        
+        if 'result' not in result:
+            return None
             
-            # Search for signatures by address (limited to recent transactions)
-            payload = {
+        for tx_info in result['result']:
+            # Get transaction details
+            tx_payload = {
                 "jsonrpc": "2.0",
                 "id": 1,
-                "method": "getSignaturesForAddress",
+                "method": "getTransaction",
                 "params": [
-                    MESSAGE_TRANSMITTERS['solana'],
-                    {"limit": 100}
+                    tx_info['signature'],
+                    {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}
                 ]
             }
             
-            async with session.post(SOLANA_RPC_URL, json=payload) as response:
-                result = await response.json()
+            tx_result = await post_json(None, SOLANA_RPC_URL, tx_payload)
+            
+            if 'result' not in tx_result or not tx_result['result']:
+                continue
                 
-                if 'result' not in result:
-                    return None
-                    
-                for tx_info in result['result']:
-                    # Get transaction details
-                    tx_payload = {
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "getTransaction",
-                        "params": [
-                            tx_info['signature'],
-                            {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}
-                        ]
-                    }
-                    
-                    async with session.post(SOLANA_RPC_URL, json=tx_payload) as tx_response:
-                        tx_result = await tx_response.json()
-                        
-                        if 'result' not in tx_result or not tx_result['result']:
+            tx_data = tx_result['result']
+            
+            # Check inner instructions for the nonce
+            for inner_instruction in tx_data.get('meta', {}).get('innerInstructions', []):
+                for instruction in inner_instruction.get('instructions', []):
+                    if 'data' in instruction and isinstance(instruction['data'], str):
+                        try:
+                            # Parse the instruction data
+                            data = json.loads(instruction['data'])
+                            if (isinstance(data, dict) and 
+                                'nonce' in data and 
+                                'data' in data['nonce'] and 
+                                str(data['nonce']['data']) == nonce_str):
+                                
+                                # Return formatted response
+                                return {
+                                    'blockNumber': tx_data['slot'],
+                                    'transactionHash': tx_info['signature'],
+                                    'blockTime': tx_data['blockTime'],
+                                    'from': tx_data['transaction']['message']['accountKeys'][0],
+                                    'data': instruction['data']
+                                }
+                        except json.JSONDecodeError:
                             continue
-                            
-                        tx_data = tx_result['result']
-                        
-                        # Check inner instructions for the nonce
-                        for inner_instruction in tx_data.get('meta', {}).get('innerInstructions', []):
-                            for instruction in inner_instruction.get('instructions', []):
-                                if 'data' in instruction and isinstance(instruction['data'], str):
-                                    try:
-                                        # Parse the instruction data
-                                        data = json.loads(instruction['data'])
-                                        if (isinstance(data, dict) and 
-                                            'nonce' in data and 
-                                            'data' in data['nonce'] and 
-                                            str(data['nonce']['data']) == nonce_str):
-                                            
-                                            # Return formatted response
-                                            return {
-                                                'blockNumber': tx_data['slot'],
-                                                'transactionHash': tx_info['signature'],
-                                                'blockTime': tx_data['blockTime'],
-                                                'from': tx_data['transaction']['message']['accountKeys'][0],
-                                                'data': instruction['data']
-                                            }
-                                    except json.JSONDecodeError:
-                                        continue
-                        
-        except Exception as e:
-            print(f"Error querying Solana chain: {str(e)}")
-            return None
+            
+    except Exception as e:
+        print(f"Error querying Solana chain: {str(e)}")
+        return None
     
     return None
 
@@ -244,6 +226,9 @@ async def get_cctp_transfers(start_block, end_block):
         'toBlock': end_block,
         'topics': [MESSAGE_SENT_EVENT]
     })
+
+    # Token metadata for the whole page in one aggregate3 call
+    await prefetch_token_info(w3_eth, 'ethereum', {checksum_address(log['topics'][2]) for log in logs})
     
     for log in logs:
         try:
@@ -252,16 +237,15 @@ async def get_cctp_transfers(start_block, end_block):
             tx_analysis = await analyze_transaction_type(w3_eth, log['transactionHash'], CIRCLE_TOKEN_MESSENGER)
             
             # Convert topics to proper format
-            nonce = int(log['topics'][1].hex(), 16)
-            topic2_hex = log['topics'][2].hex()
-            burn_token = AsyncWeb3.to_checksum_address('0x' + topic2_hex[-40:])
+            nonce = decode_uint256(log['topics'][1])
+            burn_token = checksum_address(log['topics'][2])
             
             decimals, symbol = await get_token_info(w3_eth, burn_token)
             
-            raw_data = log['data']
-            amount = decode_uint256(raw_data[0:32])
-            mint_recipient = decode_address(raw_data[32:64])
-            destination_domain = decode_uint256(raw_data[64:96])
+            deposit = parse_deposit_for_burn(log['data'])
+            amount = deposit.amount
+            mint_recipient = checksum_address(deposit.mint_recipient)
+            destination_domain = deposit.destination_domain
             destination_chain = DOMAIN_TO_CHAIN.get(destination_domain)
             
             print(f'\nCCTP Transfer #{nonce}')
@@ -321,9 +305,18 @@ async def get_cctp_transfers(start_block, end_block):
             continue
 
 async def main():
-    end_block = await w3_eth.eth.block_number
-    start_block = end_block - 1000
-    await get_cctp_transfers(start_block, end_block)
+    try:
+        end_block = await w3_eth.eth.block_number
+        start_block = end_block - 1000
+        await get_cctp_transfers(start_block, end_block)
+    finally:
+        # All seven chains share keep-alive connections through one transport
+        print(f"HTTP transport: {json.dumps(get_transport().stats(), indent=2)}")
+        print(f"Checksum address cache: {address_cache_stats()}")
+        print(f"Multicall: {multicall_stats()}")
+        await close_transport()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Output is printed, so the profile goes next to the script's name in the working directory
+    with profiling('example_pairing_source_destination', profile_flag()):
+        asyncio.run(main())
\ No newline at end of file